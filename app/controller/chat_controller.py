@@ -1,9 +1,14 @@
-from typing import List
+import os
+from typing import Iterator, List, Optional, Tuple
 from langsmith import traceable
 import logging
-from app.model.vectorstore_model import search_vectorstore
-from app.service.langstream_service import run_traced_claude_task
-from app.model.embedding_model import get_embedding
+from app.service.retrieval_service import SearchFilters, hybrid_search
+from app.service.langstream_service import (
+    CacheablePrompt, Prompt, run_traced_claude_task, stream_traced_claude_task
+)
+from app.service.answer_cache_service import answer_cache, collection_version
+from app.service.context_service import CONTEXT_CANDIDATE_MULTIPLIER, build_context
+from app.service.telecom_analytics_service import answer_analytics
 
 # Configure logging
 logging.basicConfig(
@@ -12,33 +17,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@traceable(name="Chat Agent")
-def answer_query(query: str, top_k: int = 5) -> str:
-    try:
-        print("inside chat controller")
-        logger.info("inside chat controller")
-        # Step 1: Generate Titan embedding for the user query
-        query_embedding = get_embedding(query)
-
-        # Step 2: Search ChromaDB for similar documents
-        search_results = search_vectorstore(query_embedding, top_k=top_k)
-
-        matched_docs: List[str] = search_results.get("documents", [[]])[0]
-        metadatas: List[dict] = search_results.get("metadatas", [[]])[0]
-
-        if not matched_docs:
-            return "⚠️ No relevant documents found to answer the query."
-
-        # Step 3: Combine context + tags from metadata
-        context_blocks = []
-        for idx, doc in enumerate(matched_docs):
-            tag = f"(Document Type: {metadatas[idx].get('type', 'Unknown')}, Source: {metadatas[idx].get('s3_path', 'N/A')})"
-            context_blocks.append(f"{tag}\n{doc.strip()}")
+# doc_types the Chat Agent searches by default (comma-separated; empty searches everything)
+CHAT_SEARCH_SCOPE = SearchFilters.scope(os.getenv("CHAT_SEARCH_SCOPE", ""))
 
-        context = "\n\n---\n\n".join(context_blocks)
-
-        # Step 4: Compose Claude prompt
-        prompt = f"""
+# Static instructions, sent first and marked as a prompt-cache checkpoint
+CHAT_PROMPT_PREFIX = """
 You are an AI assistant for the AP Police AI Platform, designed to process and query police-related documents stored in a vector store. The documents include:
 
 1. **members_info.json**: Contains user details with fields: mem_id, grp_id, Sub_Division, Circle, Rank, Officer_Name, Mobile_no.
@@ -90,7 +73,10 @@ Your task is to respond to queries about users and groups based on the provided
 - Current date and time: 11:45 AM IST, Saturday, June 28, 2025.
 ---
 
-📄 Document Context:
+"""
+
+# Per-request part, filled with the packed context and the question
+CHAT_PROMPT_SUFFIX = """📄 Document Context:
 {context}
 
 ❓ Question:
@@ -101,8 +87,72 @@ Your task is to respond to queries about users and groups based on the provided
 💬 Final Answer:
 """
 
+def _prepare_prompt(query: str, top_k: int) -> Tuple[Optional[str], Prompt, List[str], str]:
+    """
+    Retrieve context and build the prompt; returns (ready answer, "", [], version)
+    or (None, prompt, chunk_ids, version), version being the collection version
+    read before retrieval (the answer is cached under it).
+    """
+    print("inside chat controller")
+    logger.info("inside chat controller")
+    version = collection_version()
+    # Step 0: Questions that name the call records (CDR, IPDR, tower ids) are answered from the CDR/IPDR store
+    analytics_answer = answer_analytics(query)
+    if analytics_answer is not None:
+        return analytics_answer, "", [], version
+
+    # Step 1-2: Hybrid BM25 + vector search (identifier-only queries skip the embedding)
+    search_results = hybrid_search(query, top_k=top_k * CONTEXT_CANDIDATE_MULTIPLIER, with_embeddings=True,
+                                   scope=CHAT_SEARCH_SCOPE)
+
+    matched_docs: List[str] = search_results.get("documents", [[]])[0]
+
+    if not matched_docs:
+        return "⚠️ No relevant documents found to answer the query.", "", [], version
+
+    # Step 3: Drop near-duplicates, diversify (MMR) and trim to the agent's token budget
+    packed = build_context(search_results, "Chat Agent", top_k=top_k)
+    context = packed.text
+
+    # Same question over the same packed chunks: reuse the answer
+    chunk_ids: List[str] = packed.chunk_ids
+    cached_answer = answer_cache.get("Chat Agent", query, chunk_ids)
+    if cached_answer is not None:
+        return cached_answer, "", [], version
+
+    # Step 4: Compose Claude prompt
+    prompt = CacheablePrompt(CHAT_PROMPT_PREFIX, CHAT_PROMPT_SUFFIX.format(context=context, query=query))
+    return None, prompt, chunk_ids, version
+
+
+@traceable(name="Chat Agent")
+def answer_query(query: str, top_k: int = 5) -> str:
+    try:
+        answer, prompt, chunk_ids, version = _prepare_prompt(query, top_k)
+        if answer is not None:
+            return answer
+
         # Step 5: Get answer from Claude with LangSmith trace
-        return run_traced_claude_task(prompt, agent_name="Chat Agent")
+        answer = run_traced_claude_task(prompt, agent_name="Chat Agent")
+        answer_cache.put("Chat Agent", query, chunk_ids, answer, version=version)
+        return answer
 
     except Exception as e:
         return f"❌ Error during query processing: {type(e).__name__} - {e}"
+
+
+def answer_query_stream(query: str, top_k: int = 5) -> Iterator[str]:
+    """Same as answer_query, but yields the answer as Claude generates it."""
+    try:
+        answer, prompt, chunk_ids, version = _prepare_prompt(query, top_k)
+        if answer is not None:
+            yield answer
+            return
+
+        yield from stream_traced_claude_task(
+            prompt, agent_name="Chat Agent",
+            on_complete=lambda text: answer_cache.put("Chat Agent", query, chunk_ids, text, version=version),
+        )
+
+    except Exception as e:
+        yield f"❌ Error during query processing: {type(e).__name__} - {e}"
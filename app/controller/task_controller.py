@@ -1,41 +1,31 @@
-from typing import List
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
 from langsmith import traceable
 
-from app.model.vectorstore_model import search_vectorstore
-from app.service.langstream_service import run_traced_claude_task
-from app.model.embedding_model import get_embedding
+from app.model import task_index_model
 
-@traceable(name="Task Agent")
-def task_query(query: str, top_k: int = 5) -> str:
-    try:
-        # Step 1: Generate Titan embedding for the user query
-        query_embedding = get_embedding(query)
-
-        # Step 2: Search ChromaDB for similar documents
-        search_results = search_vectorstore(query_embedding, top_k=top_k)
-
-        matched_docs: List[str] = search_results.get("documents", [[]])[0]
-        metadatas: List[dict] = search_results.get("metadatas", [[]])[0]
+from app.service.retrieval_service import SearchFilters, hybrid_search
+from app.service.langstream_service import (
+    CacheablePrompt, Prompt, run_traced_claude_task, stream_traced_claude_task
+)
+from app.service.answer_cache_service import answer_cache, collection_version
+from app.service.context_service import CONTEXT_CANDIDATE_MULTIPLIER, build_context
 
-        if not matched_docs:
-            return "⚠️ No relevant results found to answer the query."
+# doc_types the Task Agent searches by default: tasks are assigned in the chat exports
+TASK_SEARCH_SCOPE = SearchFilters.scope(os.getenv("TASK_SEARCH_SCOPE", "chat"))
 
-        # Step 3: Combine context + tags from metadata
-        context_blocks = []
-        for idx, doc in enumerate(matched_docs):
-            tag = f"(Document Type: {metadatas[idx].get('type', 'Unknown')}, Source: {metadatas[idx].get('s3_path', 'N/A')})"
-            context_blocks.append(f"{tag}\n{doc.strip()}")
-
-        context = "\n\n---\n\n".join(context_blocks)
-
-        # Step 4: Compose Claude prompt
-        prompt = f"""
+# Static instructions, sent first and marked as a prompt-cache checkpoint
+TASK_PROMPT_PREFIX = """
 You are an AI assistant analyzing AP Police whatsapp chat datasets.
 The chats contains task that a senior officer assigns to junior officer. Extract those tasks from the chats(e.g: Situation reports from all circles must be submitted by 11:00 AM,evacuation drill to start in VZM, Confirm PC deployment near Zone-2).
 When extracting task extarct which user assigned the task to whom.
 ---
 
-📄 Document Context:
+"""
+
+# Per-request part, filled with the packed context and the question
+TASK_PROMPT_SUFFIX = """📄 Document Context:
 {context}
 
 ❓ Question:
@@ -46,8 +36,134 @@ When extracting task extarct which user assigned the task to whom.
 💬 Final Answer:
 """
 
+# Query words that say "tasks" rather than what the tasks are about
+QUERY_STOPWORDS = {
+    "task", "tasks", "assigned", "assign", "assigns", "assignment", "assignments", "given", "gave", "give",
+    "list", "show", "what", "which", "were", "was", "are", "all", "the", "and", "for", "from", "with", "any",
+    "did", "does", "who", "whom", "whose", "by", "to", "of", "in", "on", "me", "tell", "find", "get", "there",
+    "have", "has", "been", "officer", "officers", "chat", "chats", "pending", "please", "circle", "circles",
+}
+
+
+def _mentioned(query: str, values: List[str], partial: bool = True) -> List[str]:
+    """Index values named in the query, in full or (partial) by a distinctive word ("Ramesh" for "SI Ramesh")."""
+    lowered = query.lower()
+    words = set(re.findall(r"\w+", lowered))
+    found = []
+    for value in values:
+        value_words = [w for w in re.findall(r"\w+", value.lower())
+                       if len(w) >= 4 and w not in QUERY_STOPWORDS] if partial else []
+        if re.search(rf"\b{re.escape(value.lower())}\b", lowered) or any(w in words for w in value_words):
+            found.append(value)
+    return found
+
+
+def _direction(query: str, name: str) -> str:
+    """'assigner' for "by/from Ramesh", 'assignee' for "to/for Ramesh", else 'either'."""
+    lowered = query.lower()
+    for word in [w for w in re.findall(r"\w+", name.lower()) if len(w) >= 4] or [name.lower()]:
+        if re.search(rf"\b(?:by|from)\s+(?:\w+\s+)?{re.escape(word)}\b", lowered):
+            return "assigner"
+        if re.search(rf"\b(?:to|for)\s+(?:\w+\s+)?{re.escape(word)}\b", lowered):
+            return "assignee"
+    return "either"
+
+
+def format_tasks(tasks: List[Dict]) -> str:
+    lines = [f"Found {len(tasks)} task(s) in the chat task index:", ""]
+    for task in tasks:
+        details = [f"deadline: {task['deadline']}" if task.get("deadline") else None,
+                   f"circle: {task['circle']}" if task.get("circle") else None,
+                   task.get("message_time"), task.get("source_files")]
+        lines.append(f"- **{task.get('assigner') or 'Unknown'}** → **{task.get('assignee') or 'Unknown'}**: "
+                     f"{task['task']}" + (f" ({', '.join(d for d in details if d)})" if any(details) else ""))
+        if task.get("source_message"):
+            lines.append(f"  > {task['source_message']}")
+    return "\n".join(lines)
+
+
+def answer_from_index(query: str) -> Optional[str]:
+    """Filter the ingest-time task index by the people, circles and keywords in the query; no LLM call."""
+    if not task_index_model.has_tasks():
+        return None
+    people = sorted(set(task_index_model.distinct_values("assigner")) | set(task_index_model.distinct_values("assignee")))
+    filters: Dict[str, List[str]] = {"assigners": [], "assignees": [], "people": []}
+    for name in _mentioned(query, people):
+        filters[{"assigner": "assigners", "assignee": "assignees", "either": "people"}[_direction(query, name)]].append(name)
+    circles = _mentioned(query, task_index_model.distinct_values("circle"), partial=False)
+
+    keywords = []
+    if not any(filters.values()) and not circles:
+        keywords = [w for w in re.findall(r"\w+", query.lower()) if len(w) >= 3 and w not in QUERY_STOPWORDS]
+    tasks = task_index_model.search_tasks(circles=circles, keywords=keywords, **filters)
+    return format_tasks(tasks) if tasks else None
+
+
+def _prepare_prompt(query: str, top_k: int) -> Tuple[Optional[str], Prompt, List[str], str]:
+    """
+    Retrieve context and build the prompt; returns (ready answer, "", [], version)
+    or (None, prompt, chunk_ids, version), version being the collection version
+    read before retrieval (the answer is cached under it).
+    """
+    version = collection_version()
+    # Step 0: Tasks extracted at ingest are filtered directly
+    indexed_answer = answer_from_index(query)
+    if indexed_answer is not None:
+        return indexed_answer, "", [], version
+
+    # Nothing indexed or nothing matched: fall back to retrieval + LLM
+    # Step 1-2: Hybrid BM25 + vector search (identifier-only queries skip the embedding)
+    search_results = hybrid_search(query, top_k=top_k * CONTEXT_CANDIDATE_MULTIPLIER, with_embeddings=True,
+                                   scope=TASK_SEARCH_SCOPE)
+
+    matched_docs: List[str] = search_results.get("documents", [[]])[0]
+
+    if not matched_docs:
+        return "⚠️ No relevant results found to answer the query.", "", [], version
+
+    # Step 3: Drop near-duplicates, diversify (MMR) and trim to the agent's token budget
+    packed = build_context(search_results, "Task Agent", top_k=top_k)
+    context = packed.text
+
+    # Same question over the same packed chunks: reuse the answer
+    chunk_ids: List[str] = packed.chunk_ids
+    cached_answer = answer_cache.get("Task Agent", query, chunk_ids)
+    if cached_answer is not None:
+        return cached_answer, "", [], version
+
+    # Step 4: Compose Claude prompt
+    prompt = CacheablePrompt(TASK_PROMPT_PREFIX, TASK_PROMPT_SUFFIX.format(context=context, query=query))
+    return None, prompt, chunk_ids, version
+
+
+@traceable(name="Task Agent")
+def task_query(query: str, top_k: int = 5) -> str:
+    try:
+        answer, prompt, chunk_ids, version = _prepare_prompt(query, top_k)
+        if answer is not None:
+            return answer
+
         # Step 5: Get answer from Claude with LangSmith trace
-        return run_traced_claude_task(prompt, agent_name="Task Agent")
+        answer = run_traced_claude_task(prompt, agent_name="Task Agent")
+        answer_cache.put("Task Agent", query, chunk_ids, answer, version=version)
+        return answer
 
     except Exception as e:
         return f"❌ Error during query processing: {type(e).__name__} - {e}"
+
+
+def task_query_stream(query: str, top_k: int = 5) -> Iterator[str]:
+    """Same as task_query, but yields the answer as Claude generates it."""
+    try:
+        answer, prompt, chunk_ids, version = _prepare_prompt(query, top_k)
+        if answer is not None:
+            yield answer
+            return
+
+        yield from stream_traced_claude_task(
+            prompt, agent_name="Task Agent",
+            on_complete=lambda text: answer_cache.put("Task Agent", query, chunk_ids, text, version=version),
+        )
+
+    except Exception as e:
+        yield f"❌ Error during query processing: {type(e).__name__} - {e}"
@@ -1,10 +1,16 @@
-from typing import List
+import os
+import json
+from typing import Iterator, List, Optional, Tuple
 from langsmith import traceable
 import logging
 
-from app.model.vectorstore_model import search_vectorstore
-from app.service.langstream_service import run_traced_claude_task
-from app.model.embedding_model import get_embedding
+from app.service.retrieval_service import SearchFilters, hybrid_search
+from app.service.langstream_service import (
+    CacheablePrompt, Prompt, run_traced_claude_task, stream_traced_claude_task
+)
+from app.service.answer_cache_service import answer_cache, collection_version
+from app.service.context_service import CONTEXT_CANDIDATE_MULTIPLIER, build_context
+from app.model.roster_model import roster
 
 # Configure logging
 logging.basicConfig(
@@ -13,33 +19,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@traceable(name="User Agent")
-def user_query(query: str, top_k: int = 5) -> str:
-    try:
-        logger.info("Inside the user agent")
-        # Step 1: Generate Titan embedding for the user query
-        query_embedding = get_embedding(query)
-
-        # Step 2: Search ChromaDB for similar documents
-        search_results = search_vectorstore(query_embedding, top_k=top_k)
-
-        matched_docs: List[str] = search_results.get("documents", [[]])[0]
-        metadatas: List[dict] = search_results.get("metadatas", [[]])[0]
-
-        if not matched_docs:
-            return "⚠️ No relevant documents found to answer the query."
-
-        # Step 3: Combine context + tags from metadata
-        context_blocks = []
-        for idx, doc in enumerate(matched_docs):
-            tag = f"(Document Type: {metadatas[idx].get('type', 'Unknown')}, Source: {metadatas[idx].get('s3_path', 'N/A')})"
-            context_blocks.append(f"{tag}\n{doc.strip()}")
+# doc_types the User Agent searches by default: the roster JSONs
+USER_SEARCH_SCOPE = SearchFilters.scope(os.getenv("USER_SEARCH_SCOPE", "roster"))
 
-        context = "\n\n---\n\n".join(context_blocks)
-        logger.info("Context sent to LLM:\n%s", context)
-
-        # Step 4: Compose Claude prompt
-        prompt = f'''
+# Static instructions, sent first and marked as a prompt-cache checkpoint
+USER_PROMPT_PREFIX = '''
 You are an AI assistant for the AP Police AI Platform, designed to process and query police-related documents stored in a vector store. The documents include:
 
 1. **members_info.json**: Contains user details with fields: mem_id, grp_id, Sub_Division, Circle, Rank, Officer_Name, Mobile_no.
@@ -90,7 +74,10 @@ Your task is to respond to queries about users and groups based on the provided
 - Context includes vector store search results with chunks of relevant documents.
 - Current date and time: 11:45 AM IST, Saturday, June 28, 2025.
 
-**Document Context**:
+'''
+
+# Per-request part, filled with the packed context and the question
+USER_PROMPT_SUFFIX = '''**Document Context**:
 {context}
 
 **Query**:
@@ -100,10 +87,96 @@ Your task is to respond to queries about users and groups based on the provided
 Return the response as a JSON string in the format:
 '''
 
-        
+ROSTER_PHRASE_PREFIX = '''
+You are an AI assistant for the AP Police AI Platform. Answer the query in plain language using only the roster records below. Do not add officers, groups or fields that are not in the records.
+'''
+
+ROSTER_PHRASE_SUFFIX = '''
+**Roster Records**:
+{records}
+
+**Query**:
+{query}
+'''
+
+def roster_phrase_prompt(query: str, result: dict) -> CacheablePrompt:
+    """Prompt Claude to phrase an already-computed roster answer; no joins left to the LLM."""
+    focus = {key: result[key] for key in ("specific_group_users", "matched_users") if key in result}
+    return CacheablePrompt(ROSTER_PHRASE_PREFIX, ROSTER_PHRASE_SUFFIX.format(
+        records=json.dumps(focus, indent=2, default=str), query=query))
+
+def _prepare_prompt(query: str, top_k: int, phrase: bool) -> Tuple[Optional[str], Prompt, List[str], str, str]:
+    """
+    Returns (ready answer, "", [], "", version) or (None, prompt, chunk_ids,
+    answer cache extra, version), version being the collection version read
+    before the lookup (the answer is cached under it).
+    """
+    logger.info("Inside the user agent")
+    version = collection_version()
+    # Step 0: Group and user lookups are answered from the indexed roster tables
+    if roster.loaded:
+        result = roster.answer(query)
+        if not phrase:
+            return f"```json\n{json.dumps(result, indent=2, default=str)}\n```", "", [], "", version
+        cached_answer = answer_cache.get("User Agent", query, [], extra="roster-phrase")
+        if cached_answer is not None:
+            return cached_answer, "", [], "", version
+        return None, roster_phrase_prompt(query, result), [], "roster-phrase", version
+
+    # Roster files not ingested yet: fall back to retrieval + LLM
+    # Step 1-2: Hybrid BM25 + vector search (identifier-only queries skip the embedding)
+    search_results = hybrid_search(query, top_k=top_k * CONTEXT_CANDIDATE_MULTIPLIER, with_embeddings=True,
+                                   scope=USER_SEARCH_SCOPE)
+
+    matched_docs: List[str] = search_results.get("documents", [[]])[0]
+
+    if not matched_docs:
+        return "⚠️ No relevant documents found to answer the query.", "", [], "", version
+
+    # Step 3: Drop near-duplicates, diversify (MMR) and trim to the agent's token budget
+    packed = build_context(search_results, "User Agent", top_k=top_k)
+    context = packed.text
+
+    # Same question over the same packed chunks: reuse the answer
+    chunk_ids: List[str] = packed.chunk_ids
+    cached_answer = answer_cache.get("User Agent", query, chunk_ids)
+    if cached_answer is not None:
+        return cached_answer, "", [], "", version
+    logger.info("Context sent to LLM:\n%s", context)
+
+    # Step 4: Compose Claude prompt
+    prompt = CacheablePrompt(USER_PROMPT_PREFIX, USER_PROMPT_SUFFIX.format(context=context, query=query))
+    return None, prompt, chunk_ids, "", version
+
+@traceable(name="User Agent")
+def user_query(query: str, top_k: int = 5, phrase: bool = False) -> str:
+    try:
+        answer, prompt, chunk_ids, extra, version = _prepare_prompt(query, top_k, phrase)
+        if answer is not None:
+            return answer
+
         # Step 5: Get answer from Claude with LangSmith trace
-        print("\n\n response from llm:", run_traced_claude_task(prompt, agent_name="User Agent"))
-        return run_traced_claude_task(prompt, agent_name="User Agent")
+        answer = run_traced_claude_task(prompt, agent_name="User Agent")
+        print("\n\n response from llm:", answer)
+        answer_cache.put("User Agent", query, chunk_ids, answer, extra=extra, version=version)
+        return answer
 
     except Exception as e:
         return f"❌ Error during query processing: {type(e).__name__} - {e}"
+
+
+def user_query_stream(query: str, top_k: int = 5, phrase: bool = False) -> Iterator[str]:
+    """Same as user_query, but yields the answer as Claude generates it."""
+    try:
+        answer, prompt, chunk_ids, extra, version = _prepare_prompt(query, top_k, phrase)
+        if answer is not None:
+            yield answer
+            return
+
+        yield from stream_traced_claude_task(
+            prompt, agent_name="User Agent",
+            on_complete=lambda text: answer_cache.put("User Agent", query, chunk_ids, text, extra=extra, version=version),
+        )
+
+    except Exception as e:
+        yield f"❌ Error during query processing: {type(e).__name__} - {e}"
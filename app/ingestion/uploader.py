@@ -1,10 +1,160 @@
-import boto3
+import os
+import hashlib
+import logging
+import threading
 from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+BUCKET = os.getenv("S3_BUCKET", "ap-hackathon-us4")
+MB = 1024 * 1024
+# Multipart: parts of S3_PART_SIZE_MB, up to S3_UPLOAD_CONCURRENCY in flight per file
+S3_PART_SIZE_MB = int(os.getenv("S3_PART_SIZE_MB", "8"))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "8"))
+# Files uploaded in parallel by upload_many
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "4"))
+STAGING_FOLDER = "staging"
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Shared S3 client, created on first use (boto3 clients are thread-safe)."""
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                _s3 = boto3.client("s3", config=Config(
+                    max_pool_connections=max(S3_UPLOAD_CONCURRENCY * S3_UPLOAD_WORKERS, 10),
+                    retries={"max_attempts": 5, "mode": "adaptive"},
+                ))
+    return _s3
+
+
+def set_s3_client(client):
+    """Use another client, e.g. one pointed at moto or a local S3 stand-in."""
+    global _s3
+    _s3 = client
+
+
+def transfer_config(part_size_mb: int = S3_PART_SIZE_MB, concurrency: int = S3_UPLOAD_CONCURRENCY,
+                    threshold_mb: int = S3_MULTIPART_THRESHOLD_MB) -> TransferConfig:
+    return TransferConfig(multipart_threshold=threshold_mb * MB, multipart_chunksize=part_size_mb * MB,
+                          max_concurrency=concurrency, use_threads=concurrency > 1)
+
+
+class HashingReader:
+    """
+    Wraps a file object and hashes what the upload reads from it. It has no
+    seek, so s3transfer reads parts strictly in order and the digest is the
+    hash of the whole content once the upload finishes.
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._digest.update(data)
+        self.size += len(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def content_key(content_hash: str, filename: str, folder: str = "uploads") -> str:
+    """Same bytes, same key: {folder}/{sha256}{extension}."""
+    return f"{folder}/{content_hash}{os.path.splitext(filename)[1].lower()}"
+
+
+def object_exists(key: str, bucket: str = BUCKET, client=None) -> bool:
+    try:
+        (client or get_s3_client()).head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+
+def _upload(file: Union[str, BinaryIO], filename: str, folder: str, content_hash: Optional[str],
+            bucket: str, client, config: TransferConfig) -> Dict:
+    client = client or get_s3_client()
+    extra = {"Metadata": {"original-name": filename.encode("ascii", "replace").decode()}}
+
+    # Hash known up front (e.g. from the ingestion manifest): HEAD, then upload only if missing
+    if content_hash:
+        key = content_key(content_hash, filename, folder)
+        if object_exists(key, bucket, client):
+            return {"filename": filename, "s3_path": f"s3://{bucket}/{key}", "content_hash": content_hash,
+                    "uploaded": False}
+        if isinstance(file, str):
+            client.upload_file(file, bucket, key, ExtraArgs=extra, Config=config)
+        else:
+            client.upload_fileobj(file, bucket, key, ExtraArgs=extra, Config=config)
+        return {"filename": filename, "s3_path": f"s3://{bucket}/{key}", "content_hash": content_hash,
+                "uploaded": True}
+
+    # Otherwise hash while uploading to a staging key, then move it under its content key
+    staging_key = f"{STAGING_FOLDER}/{uuid4()}"
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            reader = HashingReader(f)
+            client.upload_fileobj(reader, bucket, staging_key, ExtraArgs=extra, Config=config)
+    else:
+        reader = HashingReader(file)
+        client.upload_fileobj(reader, bucket, staging_key, ExtraArgs=extra, Config=config)
+    content_hash = reader.hexdigest()
+    key = content_key(content_hash, filename, folder)
+    try:
+        duplicate = object_exists(key, bucket, client)
+        if not duplicate:
+            client.copy({"Bucket": bucket, "Key": staging_key}, bucket, key, Config=config)
+    finally:
+        client.delete_object(Bucket=bucket, Key=staging_key)
+    return {"filename": filename, "s3_path": f"s3://{bucket}/{key}", "content_hash": content_hash,
+            "uploaded": not duplicate}
+
+
+def upload_file_to_s3(file, folder="uploads", content_hash: Optional[str] = None, bucket: str = BUCKET,
+                      client=None, config: Optional[TransferConfig] = None) -> str:
+    """
+    Upload a file object (with .name) or a path under a content-hash key and
+    return its s3:// path. Content already in the bucket is not stored again.
+    """
+    filename = os.path.basename(file if isinstance(file, str) else getattr(file, "name", "upload"))
+    return _upload(file, filename, folder, content_hash, bucket, client, config or transfer_config())["s3_path"]
+
+
+def upload_many(files: List[Tuple[str, Optional[str]]], folder: str = "uploads", bucket: str = BUCKET,
+                client=None, config: Optional[TransferConfig] = None, workers: int = S3_UPLOAD_WORKERS) -> List[Dict]:
+    """
+    Upload (path, content_hash or None) pairs, `workers` files at a time.
+    Returns one dict per file: filename, s3_path, content_hash, uploaded
+    (False for duplicates) or error.
+    """
+    config = config or transfer_config()
 
-s3 = boto3.client("s3")
-BUCKET = "ap-hackathon-us4"
+    def run(item):
+        path, content_hash = item
+        filename = os.path.basename(path)
+        try:
+            return _upload(path, filename, folder, content_hash, bucket, client, config)
+        except Exception as e:
+            logger.error(f"S3 upload of {filename} failed: {e}")
+            return {"filename": filename, "error": str(e)}
 
-def upload_file_to_s3(file, folder="uploads"):
-    key = f"{folder}/{uuid4()}_{file.name}"
-    s3.upload_fileobj(file, BUCKET, key)
-    return f"s3://{BUCKET}/{key}"
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="s3-upload") as pool:
+        return list(pool.map(run, files))
@@ -2,11 +2,15 @@ import os
 import sys
 import json
 import re
+import time
+import uuid
 import shutil
 import logging
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,181 +25,153 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # App imports
 from app.ingestion.uploader import upload_file_to_s3
-from app.model.metadata_model import save_metadata
-from app.model.text_extractor_model import extract_pdf_text, extract_word_text, extract_excel_text
-from app.model.embedding_model import get_embedding
-from app.model.vectorstore_model import add_to_vectorstore
+from app.model.metadata_model import get_metadata_store
+from app.model.embedding_cache_model import get_embedding_cache
+from app.model.embedding_model import EMBEDDING_SOURCE_ID
+from app.model import manifest_model
+from app.model.vectorstore_model import (
+    log_stored_documents, backfill_lexical_index, backfill_doc_types, migrate_legacy_collection
+)
+from app.model import vectorstore_model
+from app.model import lexical_index_model, task_index_model, telecom_store_model
+from app.model.roster_model import load_roster_dir
 from app.model.graph_model import init_graph
-from app.service.langstream_service import run_traced_claude_task
-from app.controller.chat_controller import answer_query
-from app.controller.task_controller import task_query
-from app.controller.user_controller import user_query
+from app.service.langstream_service import run_traced_claude_task, get_llm_stats
+from app.service.answer_cache_service import answer_cache
+from app.service.agent_pool_service import agent_pool, AgentPoolBusy
+from app.service.context_service import get_context_stats
+from app.service.ingestion_service import (
+    SUPPORTED_EXTENSIONS, DATASET_DIR, enqueue_job, upload_path, resume_pending_jobs, retry_task_extractions,
+    get_job_status
+)
+from app.controller.chat_controller import answer_query, answer_query_stream
+from app.controller.task_controller import task_query, task_query_stream
+from app.controller.user_controller import user_query, user_query_stream
 
 # Initialize FastAPI app
 app = FastAPI(title="AP Police AI Platform", description="API for processing police documents and querying data")
 
-# Define dataset directory
-DATASET_DIR = "dataset"
-
 # Ensure dataset directory exists
 os.makedirs(DATASET_DIR, exist_ok=True)
 
-# Mock llm_utils for vector store and embedding (replace with actual implementation)
-class LLMUtils:
-    def __init__(self):
-        # Initialize vector store (replace with actual vector store initialization)
-        self.vector_store = {}  # Placeholder for vector store
-    def get_embedding(self, text):
-        # Replace with actual embedding logic from get_embedding
-        return get_embedding(text)
-    def add_to_vectorstore(self, doc_id, embedding, metadata, document_text):
-        # Replace with actual add_to_vectorstore logic
-        add_to_vectorstore(doc_id, embedding, metadata, document_text)
-        self.vector_store[doc_id] = {"embedding": embedding, "metadata": metadata, "text": document_text}
-
-llm_utils = LLMUtils()
-
-def extract_json_text(file_bytes):
-    """Extract text from JSON file bytes."""
-    try:
-        data = json.loads(file_bytes.decode('utf-8'))
-        return json.dumps(data, indent=2)  # Convert JSON to string
-    except Exception as e:
-        logger.error(f"Error extracting JSON text: {str(e)}")
-        return ""
+def save_upload(file_path, file_bytes):
+    """Write uploaded bytes to disk (runs off the event loop)."""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as buffer:
+        buffer.write(file_bytes)
 
-def extract_txt_text(file_path):
-    """Extract text from text file."""
+async def sse_events(chunks, started: float):
+    """
+    Wrap answer chunks as server-sent events; the closing "done" event
+    reports time to first token and total time as seen by the client.
+    """
+    first_token_ms = None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        logger.error(f"Error extracting text from {file_path}: {str(e)}")
-        return ""
-
-def chunk_text(text, max_tokens=8192, overlap=100):
-    """Split text into chunks within the token limit with overlap."""
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    token_estimate = 0  # Simplified token counting (adjust based on model)
-
-    for word in words:
-        # Estimate tokens (rough: 1 word ≈ 1.3 tokens, adjust for your model)
-        token_estimate += len(word) / 4 + 1
-        if token_estimate > max_tokens - overlap:
-            chunks.append(" ".join(current_chunk))
-            # Keep some overlap for context
-            current_chunk = current_chunk[-int(overlap/1.3):]
-            token_estimate = sum(len(w) / 4 + 1 for w in current_chunk)
-        current_chunk.append(word)
-    
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    
-    return chunks
-
-@app.post("/upload")
+        async for chunk in chunks:
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+            yield f"data: {json.dumps({'token': chunk})}\n\n"
+    finally:
+        # Hand the agent pool slot back even when the client disconnects mid-stream
+        await chunks.aclose()
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    yield f"event: done\ndata: {json.dumps({'ttft_ms': first_token_ms, 'total_ms': total_ms})}\n\n"
+
+def stream_response(chunks, started: float) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(chunks, started),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also covers a response that is never iterated; closing twice is a no-op
+        background=BackgroundTask(chunks.aclose),
+    )
+
+def agent_busy(error: AgentPoolBusy) -> HTTPException:
+    """503 with a retry hint when the agent pool is saturated."""
+    logger.warning(f"Rejecting agent request: {error}")
+    return HTTPException(status_code=503, detail=f"Server busy: {error}", headers={"Retry-After": "1"})
+
+@app.on_event("startup")
+async def resume_ingestion():
+    await run_in_threadpool(backfill_lexical_index)
+    await run_in_threadpool(backfill_doc_types)
+    await run_in_threadpool(migrate_legacy_collection)
+    await run_in_threadpool(load_roster_dir, DATASET_DIR)
+    resumed = await run_in_threadpool(resume_pending_jobs)
+    if resumed:
+        logger.info(f"Resumed {resumed} pending ingestion files")
+    # Chat chunks whose task extraction failed; their files won't be re-ingested
+    retry_task_extractions()
+
+@app.post("/upload", status_code=202)
 async def upload_files(
     files: List[UploadFile] = File(...),
 ):
-    """Upload and process files, skipping already processed files."""
-    uploaded_files = []
+    """Save files and queue them for background processing; returns a job id."""
+    queued_files = []
+    skipped_files = []
     failed_files = []
-    
+    seen = set()
+    # Each request saves under its own directory; ingestion moves files into DATASET_DIR when done
+    upload_id = uuid.uuid4().hex
+
     for file in files:
-        file_path = os.path.join(DATASET_DIR, file.filename)
+        file_path = upload_path(upload_id, file.filename)
         try:
-            # Check if file is already in vector store
-            if file.filename in llm_utils.vector_store:
-                logger.info(f"File {file.filename} already processed, skipping")
-                uploaded_files.append(file.filename)
+            # Both parts would be saved to the same path and the job can hold a filename once
+            if file.filename in seen:
+                logger.warning(f"Duplicate file in upload: {file.filename}")
+                failed_files.append({"filename": file.filename, "error": "Duplicate filename in this upload"})
                 continue
+            seen.add(file.filename)
 
-            # Save file to disk
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            logger.info(f"Uploaded file: {file_path}")
-
-            # Read file bytes for processing
-            file.file.seek(0)
-            file_bytes = await file.read()
-
-            # Extract text based on file type
-            text = ""
-            if file.filename.endswith(".json"):
-                text = extract_json_text(file_bytes)
-            elif file.filename.endswith(".txt"):
-                text = extract_txt_text(file_path)
-            elif file.filename.endswith(".pdf"):
-                text = extract_pdf_text(file_path)
-            elif file.filename.endswith(".docx"):
-                text = extract_word_text(file_path)
-            elif file.filename.endswith(".xlsx"):
-                text = extract_excel_text(file_path)
-            else:
+            if not file.filename.endswith(SUPPORTED_EXTENSIONS):
                 logger.warning(f"Unsupported file type: {file.filename}")
                 failed_files.append({"filename": file.filename, "error": "Unsupported file type"})
                 continue
 
-            if not text:
-                logger.warning(f"No text extracted from {file.filename}")
-                failed_files.append({"filename": file.filename, "error": "No text extracted"})
+            # Skip files whose content was already ingested with the current embedding model
+            file_bytes = await file.read()
+            content_hash = manifest_model.hash_bytes(file_bytes)
+            if await run_in_threadpool(manifest_model.is_unchanged, file.filename, content_hash, EMBEDDING_SOURCE_ID):
+                logger.info(f"File {file.filename} already processed, skipping")
+                skipped_files.append(file.filename)
                 continue
 
-            # # Generate embedding and add to vector store
-            # embedding = llm_utils.get_embedding(text)
-            # llm_utils.add_to_vectorstore(
-            #     doc_id=file.filename,
-            #     embedding=embedding,
-            #     metadata={"type": "document", "path": file_path},
-            #     document_text=text
-            # )
-            # uploaded_files.append(file.filename)
-            # logger.info(f"Processed and added {file.filename} to vector store")
-            # Chunk text if necessary
-            chunks = chunk_text(text, max_tokens=8192, overlap=100)
-            for i, chunk in enumerate(chunks):
-                try:
-                    # Generate embedding for each chunk
-                    embedding = llm_utils.get_embedding(chunk)
-                    doc_id = f"{file.filename}_chunk_{i}"
-                    llm_utils.add_to_vectorstore(
-                        doc_id=doc_id,
-                        embedding=embedding,
-                        metadata={
-                            "type": "document",
-                            "path": file_path,
-                            "original_file": file.filename,
-                            "chunk_index": i,
-                            "total_chunks": len(chunks)
-                        },
-                        document_text=chunk
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to process chunk {i} of {file.filename}: {str(e)}")
-                    failed_files.append({"filename": f"{file.filename}_chunk_{i}", "error": str(e)})
-                    continue
-
-            uploaded_files.append(file.filename)
-            logger.info(f"Processed and added {file.filename} to vector store")
+            # Save file to disk so a restarted worker can resume from it
+            await run_in_threadpool(save_upload, file_path, file_bytes)
+            logger.info(f"Uploaded file: {file_path}")
+            queued_files.append((file.filename, file_path))
 
         except Exception as e:
-            logger.error(f"Failed to process {file.filename}: {str(e)}")
+            logger.error(f"Failed to save {file.filename}: {str(e)}")
             failed_files.append({"filename": file.filename, "error": str(e)})
             continue
 
-    if not uploaded_files:
+    if not queued_files and not skipped_files:
         return JSONResponse(
             status_code=400,
-            content={"status": "error", "message": "No files processed successfully", "failed_files": failed_files}
+            content={"status": "error", "message": "No files accepted for processing", "failed_files": failed_files}
         )
 
-    response = {"status": "success", "uploaded_files": uploaded_files}
+    response = {"status": "queued" if queued_files else "skipped", "job_id": None, "queued_files": [name for name, _ in queued_files]}
+    if queued_files:
+        response["job_id"] = await run_in_threadpool(enqueue_job, queued_files)
+    if skipped_files:
+        response["skipped_files"] = skipped_files
     if failed_files:
         response["failed_files"] = failed_files
-    return JSONResponse(content=response)
+    return JSONResponse(status_code=202, content=response)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Endpoint to report per-file and per-chunk ingestion progress.
+    """
+    job = await run_in_threadpool(get_job_status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content=job)
 
 @app.post("/query")
 async def query_data(query: str = Form(...)):
@@ -203,33 +179,146 @@ async def query_data(query: str = Form(...)):
     Endpoint to query processed documents.
     """
     try:
-        response = answer_query(query)
+        response = await agent_pool.run(answer_query, query)
         return JSONResponse(content={"status": "success", "response": response})
+    except AgentPoolBusy as e:
+        raise agent_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {type(e).__name__}: {str(e)}")
 
+@app.post("/query/stream")
+async def query_data_stream(query: str = Form(...)):
+    """
+    Streaming variant of /query: answer tokens as server-sent events.
+    """
+    started = time.perf_counter()
+    try:
+        chunks = agent_pool.stream(answer_query_stream, query)
+    except AgentPoolBusy as e:
+        raise agent_busy(e)
+    return stream_response(chunks, started)
+
 @app.post("/task")
 async def query_task(query: str = Form(...)):
     """
     Endpoint to query processed documents.
     """
     try:
-        response = task_query(query)
+        response = await agent_pool.run(task_query, query)
         return JSONResponse(content={"status": "success", "response": response})
+    except AgentPoolBusy as e:
+        raise agent_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {type(e).__name__}: {str(e)}")
-    
+
+@app.post("/task/stream")
+async def query_task_stream(query: str = Form(...)):
+    """
+    Streaming variant of /task: answer tokens as server-sent events.
+    """
+    started = time.perf_counter()
+    try:
+        chunks = agent_pool.stream(task_query_stream, query)
+    except AgentPoolBusy as e:
+        raise agent_busy(e)
+    return stream_response(chunks, started)
+
 @app.post("/users")
-async def query_user(query: str = Form(...)):
+async def query_user(query: str = Form(...), phrase: bool = Form(False)):
     """
-    Endpoint to query users.
+    Endpoint to query users. Lookups come from the roster tables; set
+    phrase=true to have the LLM word the answer.
     """
     try:
-        response = user_query(query)
+        response = await agent_pool.run(user_query, query, phrase=phrase)
         return JSONResponse(content={"status": "success", "response": response})
+    except AgentPoolBusy as e:
+        raise agent_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {type(e).__name__}: {str(e)}")
 
+@app.post("/users/stream")
+async def query_user_stream(query: str = Form(...), phrase: bool = Form(False)):
+    """
+    Streaming variant of /users: answer tokens as server-sent events.
+    """
+    started = time.perf_counter()
+    try:
+        chunks = agent_pool.stream(user_query_stream, query, phrase=phrase)
+    except AgentPoolBusy as e:
+        raise agent_busy(e)
+    return stream_response(chunks, started)
+
+@app.get("/documents")
+async def list_documents(limit: int = 100, offset: int = 0):
+    """
+    Diagnostics endpoint to page through stored chunk ids and metadata.
+    """
+    docs = await run_in_threadpool(log_stored_documents, limit=limit, offset=offset)
+    return JSONResponse(content={"ids": docs.get("ids", []), "metadatas": docs.get("metadatas", [])})
+
+@app.get("/analytics/contacts")
+async def analytics_contacts(number: str, limit: int = 10):
+    """
+    Most frequent CDR contacts of a number.
+    """
+    rows = await run_in_threadpool(telecom_store_model.contact_frequency, number, limit)
+    return JSONResponse(content={"number": number, "contacts": rows})
+
+@app.get("/analytics/towers")
+async def analytics_towers(tower_id: Optional[str] = None):
+    """
+    Calls per tower, or for one tower.
+    """
+    rows = await run_in_threadpool(telecom_store_model.tower_calls, tower_id)
+    return JSONResponse(content={"tower_id": tower_id, "towers": rows})
+
+@app.get("/analytics/timeline")
+async def analytics_timeline(number: str):
+    """
+    Towers a number's calls went through, in time order.
+    """
+    rows = await run_in_threadpool(telecom_store_model.tower_timeline, number)
+    return JSONResponse(content={"number": number, "timeline": rows})
+
+@app.get("/analytics/sessions")
+async def analytics_sessions(number: str):
+    """
+    IPDR data sessions of a subscriber per APN.
+    """
+    rows = await run_in_threadpool(telecom_store_model.subscriber_sessions, number)
+    return JSONResponse(content={"number": number, "sessions": rows})
+
+@app.get("/analytics/overlap")
+async def analytics_overlap(number: Optional[str] = None, min_overlap_s: int = 0, limit: int = 50):
+    """
+    Subscriber pairs with IPDR sessions open at the same time.
+    """
+    rows = await run_in_threadpool(telecom_store_model.session_overlap, number, min_overlap_s, limit)
+    return JSONResponse(content={"number": number, "overlaps": rows})
+
+def collect_metrics():
+    """Every store's counters; several query SQLite, DuckDB or Chroma, so this runs off the event loop."""
+    return {
+        "embedding_cache": get_embedding_cache().get_stats(),
+        "vectorstore": vectorstore_model.get_stats(),
+        "lexical_index": lexical_index_model.get_stats(),
+        "task_index": task_index_model.get_stats(),
+        "telecom_store": telecom_store_model.get_stats(),
+        "metadata": get_metadata_store().get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "llm": get_llm_stats(),
+        "context": get_context_stats(),
+        "agent_pool": agent_pool.get_stats(),
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Endpoint to expose cache and pipeline counters.
+    """
+    return JSONResponse(content=await run_in_threadpool(collect_metrics))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,166 @@
+import os
+import re
+import math
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple
+
+# Hard input limits (tokens) of the embedding models we can point at
+EMBEDDING_MODEL_TOKEN_LIMITS = {
+    "amazon.titan-embed-text-v1": 8192,
+    "amazon.titan-embed-text-v2:0": 8192,
+    "amazon.titan-embed-g1-text-02": 8192,
+    "cohere.embed-english-v3": 512,
+    "cohere.embed-multilingual-v3": 512,
+}
+DEFAULT_TOKEN_LIMIT = 512
+
+# Retrieval works better on small chunks than on ones near the model limit
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+# Safety margin on the character-based estimate above. Hand-picked, not fitted: no Titan tokenizer or
+# inputTextTokenCount readings were available; adjust it once real counts have been compared
+TOKENIZER_CALIBRATION = float(os.getenv("TOKENIZER_CALIBRATION", "1.1"))
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+PARAGRAPH_BOUNDARY = re.compile(r"\n\s*\n")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Calibrated BPE-style estimate: letters ~4 chars/token, digits ~3
+    chars/token, every other symbol one token.
+    """
+    total = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        if piece[0].isdigit():
+            total += math.ceil(len(piece) / 3)
+        elif piece[0].isalpha():
+            total += math.ceil(len(piece) / 4)
+        else:
+            total += 1
+    return math.ceil(total * TOKENIZER_CALIBRATION)
+
+
+def token_limit_for(model_id: str) -> int:
+    return EMBEDDING_MODEL_TOKEN_LIMITS.get(model_id, DEFAULT_TOKEN_LIMIT)
+
+
+def chunk_budget(model_id: str, target_tokens: int = None) -> int:
+    """Target chunk size, never above 90% of the model's input limit."""
+    target = target_tokens or CHUNK_TARGET_TOKENS
+    return max(1, min(target, int(token_limit_for(model_id) * 0.9)))
+
+
+def _split_words(text: str, max_tokens: int) -> Iterator[str]:
+    words, used = [], 0
+    for word in text.split():
+        cost = count_tokens(word)
+        if words and used + cost > max_tokens:
+            yield " ".join(words)
+            words, used = [], 0
+        words.append(word)
+        used += cost
+    if words:
+        yield " ".join(words)
+
+
+def iter_units(text: str, mode: str, max_tokens: int) -> Iterator[Tuple[str, int, str]]:
+    """
+    Yield (unit, tokens, separator) boundaries for packing.
+    mode="text": paragraphs, split into sentences (then words) when too large.
+    mode="lines": one unit per line (CSV rows, JSON lines, chat messages).
+    """
+    if mode == "lines":
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            tokens = count_tokens(line)
+            if tokens <= max_tokens:
+                yield line, tokens, "\n"
+            else:
+                for piece in _split_words(line, max_tokens):
+                    yield piece, count_tokens(piece), "\n"
+        return
+
+    for paragraph in PARAGRAPH_BOUNDARY.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            yield paragraph, tokens, "\n\n"
+            continue
+        separator = "\n\n"
+        for sentence in SENTENCE_BOUNDARY.split(paragraph):
+            sentence_tokens = count_tokens(sentence)
+            pieces = [(sentence, sentence_tokens)] if sentence_tokens <= max_tokens else \
+                [(piece, count_tokens(piece)) for piece in _split_words(sentence, max_tokens)]
+            for piece, piece_tokens in pieces:
+                yield piece, piece_tokens, separator
+                separator = " "
+
+
+def pack_units(units: Iterable[Tuple[str, int, str]], max_tokens: int, overlap_tokens: int,
+               header: str = "") -> Iterator[str]:
+    """
+    Greedily pack units into chunks of at most max_tokens, carrying up to
+    overlap_tokens of trailing units into the next chunk. Each unit is
+    pushed and popped once with a running token sum, so this is O(n).
+    """
+    header_tokens = count_tokens(header) if header else 0
+    budget = max(1, max_tokens - header_tokens)
+    window: deque = deque()
+    used = 0
+    fresh = False  # window holds units not yet emitted
+
+    def emit():
+        parts = [window[0][0]] + [sep + unit for unit, _, sep in list(window)[1:]]
+        body = "".join(parts)
+        return f"{header}\n{body}" if header else body
+
+    for unit, tokens, sep in units:
+        if window and used + tokens > budget:
+            if fresh:
+                yield emit()
+                fresh = False
+            while window and (used > overlap_tokens or used + tokens > budget):
+                used -= window.popleft()[1]
+        window.append((unit, tokens, sep))
+        used += tokens
+        fresh = True
+    if window and fresh:
+        yield emit()
+
+
+def chunk_document(text: str, model_id: str, mode: str = "text", target_tokens: int = None,
+                   overlap_tokens: int = None, header_row: bool = False) -> List[str]:
+    """
+    Split text on sentence/paragraph (mode="text") or line (mode="lines")
+    boundaries into chunks sized for the embedding model. With header_row,
+    the first line (e.g. a CSV header) is repeated at the top of each chunk.
+    """
+    max_tokens = chunk_budget(model_id, target_tokens)
+    overlap = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap = min(overlap, max_tokens // 2)
+
+    header = ""
+    if header_row:
+        header, _, text = text.partition("\n")
+        if count_tokens(header) > max_tokens // 2:
+            header, text = "", f"{header}\n{text}"
+    unit_budget = max_tokens - (count_tokens(header) if header else 0)
+    return list(pack_units(iter_units(text, mode, unit_budget), max_tokens, overlap, header=header))
+
+
+def chunk_stream(texts: Iterable[str], model_id: str, mode: str = "text", target_tokens: int = None,
+                 overlap_tokens: int = None) -> Iterator[str]:
+    """
+    chunk_document over a stream of texts (e.g. PDF pages) packed as one
+    document; each chunk is yielded as soon as it is full.
+    """
+    max_tokens = chunk_budget(model_id, target_tokens)
+    overlap = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap = min(overlap, max_tokens // 2)
+    units = (unit for text in texts for unit in iter_units(text, mode, max_tokens))
+    yield from pack_units(units, max_tokens, overlap)
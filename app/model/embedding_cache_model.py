@@ -0,0 +1,164 @@
+import os
+import time
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.model.local_store_model import connect
+
+# In-memory LRU entries and on-disk row cap
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "4096"))
+EMBEDDING_CACHE_DISK_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_ITEMS", "200000"))
+# Memory-tier hits are written back to the disk row's last_access in batches of this size
+EMBEDDING_CACHE_TOUCH_BATCH = int(os.getenv("EMBEDDING_CACHE_TOUCH_BATCH", "256"))
+
+# Vectors are stored as float32, the precision Titan returns; bumped from 0 (float64 rows)
+SCHEMA_VERSION = 1
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, model_id: str) -> str:
+    return hashlib.sha256(f"{model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: a bounded in-memory LRU in front of a
+    size-capped SQLite table. Keys are sha256(model_id + normalized text).
+    """
+
+    def __init__(self, db_name: str = "embedding_cache.sqlite3",
+                 memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+                 disk_items: int = EMBEDDING_CACHE_DISK_ITEMS):
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn = connect(db_name)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model_id TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Older rows hold float64 blobs; it's a cache, so drop them rather than convert
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                      "memory_evictions": 0, "disk_evictions": 0}
+
+    def _remember(self, key: str, embedding: List[float]):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def _write_touched(self):
+        """Persist last_access of memory-tier hits, so disk eviction sees which rows are hot."""
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                   [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            disk_keys = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self._touched[key] = time.time()
+                    self.stats["memory_hits"] += 1
+                else:
+                    disk_keys.append(key)
+
+            if disk_keys:
+                placeholders = ",".join("?" * len(disk_keys))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", disk_keys
+                ).fetchall()
+                for key, blob in rows:
+                    embedding = array("f", blob).tolist()
+                    found[key] = embedding
+                    self._remember(key, embedding)
+                    self._touched[key] = time.time()
+                self.stats["disk_hits"] += len(rows)
+                self.stats["misses"] += len(disk_keys) - len(rows)
+            if len(self._touched) >= EMBEDDING_CACHE_TOUCH_BATCH or (disk_keys and self._touched):
+                self._write_touched()
+                self._conn.commit()
+        return found
+
+    def put_many(self, model_id: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, embedding in items.items():
+                self._remember(key, embedding)
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model_id, embedding, last_access) VALUES (?, ?, ?, ?)",
+                [(key, model_id, array("f", embedding).tobytes(), now) for key, embedding in items.items()],
+            )
+            if self._conn.total_changes == before:
+                self._conn.commit()
+                return
+            # Other worker processes insert and evict too: recount (served by the last_access index)
+            self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = self._disk_count - self.disk_items
+            if overflow > 0:
+                # Let eviction see the recent memory-tier hits
+                self._write_touched()
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                self._disk_count -= overflow
+                self.stats["disk_evictions"] += overflow
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": self._disk_count,
+                "memory_capacity": self.memory_items,
+                "disk_capacity": self.disk_items,
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
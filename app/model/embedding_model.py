@@ -1,20 +1,101 @@
 # app/embedding/titan_embedder.py
-import boto3
+import os
 import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 
-def get_embedding(text: str) -> list[float]:
-    bedrock = boto3.client("bedrock-runtime")
+import boto3
+from botocore.config import Config
+
+from app.model.embedding_cache_model import cache_key, get_embedding_cache
+from app.model.provider_model import EMBEDDING_PROVIDER, HashEmbedder
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v1"
+# Vector size each supported model returns; vector stores validate against it
+EMBEDDING_DIMENSIONS = {
+    "amazon.titan-embed-text-v1": 1536,
+    "amazon.titan-embed-text-v2:0": 1024,
+    "amazon.titan-embed-image-v1": 1024,
+    "cohere.embed-english-v3": 1024,
+    "cohere.embed-multilingual-v3": 1024,
+}
+EMBEDDING_DIM = EMBEDDING_DIMENSIONS.get(EMBEDDING_MODEL_ID)
+
+if EMBEDDING_PROVIDER not in ("bedrock", "hash"):
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {EMBEDDING_PROVIDER}")
+_hash_embedder = HashEmbedder(EMBEDDING_DIM) if EMBEDDING_PROVIDER == "hash" else None
+# Recorded with cached and ingested embeddings, so hash vectors are never reused as Titan's
+EMBEDDING_SOURCE_ID = _hash_embedder.model_id if _hash_embedder else EMBEDDING_MODEL_ID
+
+# Upper bound on in-flight Bedrock embedding calls per process
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+_bedrock = None
+_bedrock_lock = threading.Lock()
+# Shared by every caller (ingest workers, queries), so the bound holds per process, not per batch
+_in_flight = threading.BoundedSemaphore(EMBEDDING_CONCURRENCY)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class EmbeddingResult:
+    index: int
+    embedding: Optional[List[float]] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def get_bedrock_client():
+    """Return the shared bedrock-runtime client (boto3 clients are thread-safe)."""
+    global _bedrock
+    if _bedrock is None:
+        with _bedrock_lock:
+            if _bedrock is None:
+                _bedrock = boto3.client(
+                    "bedrock-runtime",
+                    config=Config(
+                        max_pool_connections=max(EMBEDDING_CONCURRENCY, 10),
+                        retries={"max_attempts": 5, "mode": "adaptive"},
+                    ),
+                )
+    return _bedrock
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY, thread_name_prefix="embed")
+    return _executor
 
-    # Debug: Confirm text type before API call
-    print("TEXT TYPE:", type(text))         # should be <class 'str'>
-    print("TEXT PREVIEW:", text[:100])      # first 100 chars
+
+def _invoke_embedding(text: str) -> List[float]:
+    logger.debug("Embedding text (%d chars): %s", len(text), text[:100])
+    with _in_flight:
+        return _call_embedding_model(text)
+
+
+def _call_embedding_model(text: str) -> List[float]:
+    if _hash_embedder:
+        return _hash_embedder.embed(text)
 
     payload = {
         "inputText": text  # Titan requires a plain string
     }
 
-    response = bedrock.invoke_model(
-        modelId="amazon.titan-embed-text-v1",
+    response = get_bedrock_client().invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
         contentType="application/json",
         accept="application/json",
         body=json.dumps(payload)
@@ -22,3 +103,67 @@ def get_embedding(text: str) -> list[float]:
 
     result = json.loads(response["body"].read())
     return result["embedding"]
+
+
+def _embed_item(index: int, text: str) -> EmbeddingResult:
+    try:
+        if not isinstance(text, str):
+            raise TypeError(f"expected str, got {type(text).__name__}")
+        return EmbeddingResult(index=index, embedding=_invoke_embedding(text))
+    except Exception as e:
+        logger.error(f"Embedding failed for item {index}: {type(e).__name__} - {e}")
+        return EmbeddingResult(index=index, error=f"{type(e).__name__}: {e}")
+
+
+def _embed_concurrently(texts: List[str], max_workers: Optional[int] = None) -> List[EmbeddingResult]:
+    workers = min(max_workers or EMBEDDING_CONCURRENCY, len(texts))
+    if workers <= 1:
+        return [_embed_item(i, text) for i, text in enumerate(texts)]
+
+    # Concurrent batches share the pool; _in_flight also covers single texts embedded inline
+    return list(_get_executor().map(_embed_item, range(len(texts)), texts))
+
+
+def get_embeddings(texts: List[str], max_workers: Optional[int] = None) -> List[EmbeddingResult]:
+    """
+    Embed a batch of texts concurrently over the pooled Bedrock client.
+    Results come back in input order; a failed item carries its error
+    instead of aborting the rest of the batch. Cached texts skip Bedrock.
+    EMBEDDING_PROVIDER=hash embeds locally instead.
+    """
+    if not texts:
+        return []
+    if not EMBEDDING_CACHE_ENABLED:
+        return _embed_concurrently(texts, max_workers)
+
+    cache = get_embedding_cache()
+    # Non-string inputs get a unique key so they fail per item without touching the cache
+    keys = [cache_key(text, EMBEDDING_SOURCE_ID) if isinstance(text, str) else f"invalid:{i}"
+            for i, text in enumerate(texts)]
+    cached = cache.get_many([key for key in keys if not key.startswith("invalid:")])
+
+    # Embed each distinct missing text once, even if it repeats in the batch
+    pending = {}
+    for i, key in enumerate(keys):
+        if key not in cached and key not in pending:
+            pending[key] = texts[i]
+    fresh = dict(zip(pending, _embed_concurrently(list(pending.values()), max_workers)))
+    cache.put_many(EMBEDDING_SOURCE_ID, {
+        key: result.embedding for key, result in fresh.items()
+        if result.ok and not key.startswith("invalid:")
+    })
+
+    results = []
+    for i, key in enumerate(keys):
+        if key in cached:
+            results.append(EmbeddingResult(index=i, embedding=cached[key]))
+        else:
+            results.append(EmbeddingResult(index=i, embedding=fresh[key].embedding, error=fresh[key].error))
+    return results
+
+
+def get_embedding(text: str) -> list[float]:
+    result = get_embeddings([text])[0]
+    if not result.ok:
+        raise RuntimeError(f"Embedding failed: {result.error}")
+    return result.embedding
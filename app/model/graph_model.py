@@ -1,25 +1,92 @@
+import os
+import re
+import logging
+from typing import Dict, List
+
 from neo4j import GraphDatabase
 
+logger = logging.getLogger(__name__)
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://127.0.0.1:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+# Rows sent per UNWIND statement (one transaction each)
+GRAPH_BATCH_SIZE = int(os.getenv("GRAPH_BATCH_SIZE", "1000"))
+
+# Relationship types can't be query parameters, so only these names are spliced into Cypher
+RELATIONSHIP_PATTERN = re.compile(r"^[A-Z][A-Z0-9_]{0,63}$")
+
 # driver = GraphDatabase.driver("neo4j://127.0.0.1:7687", auth=("neo4j", "password"))
-driver = GraphDatabase.driver("bolt://127.0.0.1:7687", auth=("neo4j", "password"))
+driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+_constraints_ready = False
+
+
+def relationship_type(rel: str):
+    """'reports to' -> 'REPORTS_TO'; None when the name can't be made a safe type."""
+    name = re.sub(r"[^A-Za-z0-9]+", "_", str(rel)).strip("_").upper()
+    return name if RELATIONSHIP_PATTERN.match(name) else None
+
 
+def ensure_constraints(session):
+    """Unique Entity.name, so MERGE/MATCH on name use the index instead of a label scan."""
+    global _constraints_ready
+    if not _constraints_ready:
+        session.run("CREATE CONSTRAINT entity_name_unique IF NOT EXISTS "
+                    "FOR (e:Entity) REQUIRE e.name IS UNIQUE").consume()
+        _constraints_ready = True
 
-def create_relationship(tx, head, rel, tail):
+
+def merge_entities(tx, names: List[str]):
+    tx.run("UNWIND $names AS name MERGE (:Entity {name: name})", names=names).consume()
+
+
+def merge_relationships(tx, rel: str, rows: List[Dict[str, str]]):
     tx.run(
         """
-        MERGE (a:Entity {name: $head})
-        MERGE (b:Entity {name: $tail})
-        MERGE (a)-[r:%s]->(b)
-        """ % rel.upper(),
-        head=head,
-        tail=tail
-    )
-
-def init_graph(edge_list: list[list[str]]):
+        UNWIND $rows AS row
+        MATCH (a:Entity {name: row.head})
+        MATCH (b:Entity {name: row.tail})
+        MERGE (a)-[r:`%s`]->(b)
+        """ % rel,
+        rows=rows,
+    ).consume()
+
+
+def group_triples(edge_list: list[list[str]]):
+    """Deduplicated {relationship type: [{head, tail}]} plus the number of triples rejected."""
+    by_type: Dict[str, Dict[tuple, Dict[str, str]]] = {}
+    skipped = 0
+    for relation in edge_list:
+        if len(relation) < 3 or not relation[0] or not relation[2]:
+            skipped += 1
+            continue
+        rel = relationship_type(relation[1])
+        if rel is None:
+            logger.warning(f"Skipping triple with invalid relationship name: {relation[1]!r}")
+            skipped += 1
+            continue
+        head, tail = str(relation[0]), str(relation[2])
+        by_type.setdefault(rel, {})[(head, tail)] = {"head": head, "tail": tail}
+    return {rel: list(rows.values()) for rel, rows in by_type.items()}, skipped
+
+
+def init_graph(edge_list: list[list[str]], batch_size: int = GRAPH_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Write (head, relationship, tail) triples: entities first, then one
+    parameterized UNWIND per relationship type and batch.
+    """
+    grouped, skipped = group_triples(edge_list)
+    names = sorted({name for rows in grouped.values() for row in rows for name in (row["head"], row["tail"])})
+    written = 0
     with driver.session() as session:
-        for relation in edge_list:
-            if len(relation) >= 3:
-                head = relation[0]
-                rel = relation[1]
-                tail = relation[2]
-                session.write_transaction(create_relationship, head, rel, tail)
+        ensure_constraints(session)
+        for start in range(0, len(names), batch_size):
+            session.execute_write(merge_entities, names[start:start + batch_size])
+        for rel, rows in grouped.items():
+            for start in range(0, len(rows), batch_size):
+                session.execute_write(merge_relationships, rel, rows[start:start + batch_size])
+                written += len(rows[start:start + batch_size])
+    logger.info(f"Graph: {written} relationships of {len(grouped)} types over {len(names)} entities "
+                f"({skipped} triples skipped)")
+    return {"triples": len(edge_list), "written": written, "skipped": skipped,
+            "entities": len(names), "relationship_types": len(grouped)}
@@ -0,0 +1,236 @@
+import re
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.model.local_store_model import connect
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps identifiers whole: grp001, mem_id, +91-9876543210, twr003, zone-2
+TOKEN_PATTERN = re.compile(r"\+?[a-z0-9_]+(?:[\-./:][a-z0-9_]+)*")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "at", "for", "from", "by", "with",
+    "is", "are", "was", "were", "be", "it", "this", "that", "as", "all", "get", "me", "show",
+    "list", "find", "who", "what", "which", "whom", "give", "please",
+}
+
+_lock = threading.Lock()
+_conn = connect("lexical_index.sqlite3")
+_conn.executescript(
+    """
+    CREATE TABLE IF NOT EXISTS lex_docs (
+        doc_id TEXT PRIMARY KEY,
+        length INTEGER NOT NULL,
+        original_file TEXT,
+        type TEXT,
+        doc_type TEXT,
+        senders TEXT,
+        start_ts INTEGER,
+        end_ts INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS lex_postings (
+        term TEXT NOT NULL,
+        doc_id TEXT NOT NULL,
+        tf INTEGER NOT NULL,
+        PRIMARY KEY (term, doc_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_lex_postings_doc ON lex_postings(doc_id);
+    """
+)
+# Filter columns added after the first release: bring older index files up to date
+FILTER_COLUMNS = {"doc_type": "TEXT", "senders": "TEXT", "start_ts": "INTEGER", "end_ts": "INTEGER"}
+_existing = {row[1] for row in _conn.execute("PRAGMA table_info(lex_docs)")}
+for _column, _kind in FILTER_COLUMNS.items():
+    if _column not in _existing:
+        _conn.execute(f"ALTER TABLE lex_docs ADD COLUMN {_column} {_kind}")
+_conn.execute("CREATE INDEX IF NOT EXISTS idx_lex_docs_doc_type ON lex_docs(doc_type)")
+_conn.commit()
+
+# Chunks per chat sender, for spotting sender names in every hybrid query. Kept up to date by
+# this process's writes; reloaded when PRAGMA data_version shows another process wrote
+_senders: Optional[Counter] = None
+_senders_version: Optional[int] = None
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound identifiers also index their parts and digits-only form."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.lstrip("+")
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if re.search(r"[\-./:]", token):
+            terms.extend(part for part in re.split(r"[\-./:]", token)
+                         if len(part) >= 3 and part not in STOPWORDS)
+            digits = re.sub(r"\D", "", token)
+            if len(digits) >= 6:  # phone numbers written with separators
+                terms.append(digits)
+        if token.isdigit() and len(token) > 10:
+            terms.append(token[-10:])  # national number without country code
+    return terms
+
+
+def _sender_names(senders: Optional[str]) -> List[str]:
+    """The column holds a comma-joined list per chunk."""
+    return [name.strip() for name in (senders or "").split(",") if name.strip()]
+
+
+def _count_senders(values: List[Optional[str]], sign: int = 1):
+    if _senders is None:
+        return
+    for senders in values:
+        for name in _sender_names(senders):
+            _senders[name] += sign
+            if _senders[name] <= 0:
+                del _senders[name]
+
+
+def _forget_senders(doc_ids: List[str]) -> Set[str]:
+    """Uncount the senders of these chunks; returns the ids that were indexed."""
+    if _senders is None:
+        return set()
+    placeholders = ",".join("?" * len(doc_ids))
+    rows = _conn.execute(f"SELECT doc_id, senders FROM lex_docs WHERE doc_id IN ({placeholders})", doc_ids).fetchall()
+    _count_senders([senders for _, senders in rows], -1)
+    return {doc_id for doc_id, _ in rows}
+
+
+def _remove(doc_ids: List[str]):
+    _forget_senders(doc_ids)
+    placeholders = ",".join("?" * len(doc_ids))
+    _conn.execute(f"DELETE FROM lex_postings WHERE doc_id IN ({placeholders})", doc_ids)
+    _conn.execute(f"DELETE FROM lex_docs WHERE doc_id IN ({placeholders})", doc_ids)
+
+
+def index_documents(ids: List[str], documents: List[str], metadatas: List[Dict]):
+    """(Re)index chunks; existing postings for the same ids are replaced."""
+    if not ids:
+        return
+    with _lock:
+        _remove(ids)
+        doc_rows, posting_rows = [], []
+        for doc_id, text, metadata in zip(ids, documents, metadatas):
+            counts = Counter(tokenize(text or ""))
+            doc_rows.append((doc_id, sum(counts.values()), metadata.get("original_file"), metadata.get("type"),
+                             *(metadata.get(column) for column in FILTER_COLUMNS)))
+            posting_rows.extend((term, doc_id, tf) for term, tf in counts.items())
+        _conn.executemany(
+            "INSERT INTO lex_docs (doc_id, length, original_file, type, doc_type, senders, start_ts, end_ts) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", doc_rows)
+        _conn.executemany("INSERT INTO lex_postings VALUES (?, ?, ?)", posting_rows)
+        _conn.commit()
+        _count_senders([metadata.get("senders") for metadata in metadatas])
+
+
+def update_filter_fields(ids: List[str], metadatas: List[Dict]):
+    """Refresh the filter columns of already indexed chunks without re-tokenizing them."""
+    if not ids:
+        return
+    with _lock:
+        indexed = _forget_senders(ids)
+        _conn.executemany(
+            "UPDATE lex_docs SET doc_type = ?, senders = ?, start_ts = ?, end_ts = ? WHERE doc_id = ?",
+            [(*(metadata.get(column) for column in FILTER_COLUMNS), doc_id) for doc_id, metadata in zip(ids, metadatas)],
+        )
+        _conn.commit()
+        _count_senders([metadata.get("senders") for doc_id, metadata in zip(ids, metadatas) if doc_id in indexed])
+
+
+def _reload_senders():
+    global _senders, _senders_version
+    _senders_version = _conn.execute("PRAGMA data_version").fetchone()[0]
+    _senders = Counter()
+    for senders, chunks in _conn.execute(
+            "SELECT senders, COUNT(*) FROM lex_docs WHERE senders IS NOT NULL GROUP BY senders"):
+        for name in _sender_names(senders):
+            _senders[name] += chunks
+
+
+def distinct_senders() -> List[str]:
+    """Every chat sender seen in the index."""
+    with _lock:
+        if _senders is None or _conn.execute("PRAGMA data_version").fetchone()[0] != _senders_version:
+            _reload_senders()
+        return sorted(_senders)
+
+
+def _filter_clause(doc_types=None, files=None, senders=None, start_ts=None, end_ts=None,
+                   contains=None) -> Tuple[str, List]:
+    """SQL conditions on lex_docs d matching the Chroma where/where_document filters."""
+    clauses, params = [], []
+    if doc_types:
+        clauses.append(f"d.doc_type IN ({','.join('?' * len(doc_types))})")
+        params.extend(doc_types)
+    if files:
+        clauses.append(f"d.original_file IN ({','.join('?' * len(files))})")
+        params.extend(files)
+    if senders:
+        clauses.append("(" + " OR ".join("(', ' || d.senders || ',') LIKE ?" for _ in senders) + ")")
+        params.extend(f"%, {sender},%" for sender in senders)
+    # A chunk matches a time range when its messages overlap it
+    if start_ts is not None:
+        clauses.append("d.end_ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        clauses.append("d.start_ts <= ?")
+        params.append(end_ts)
+    for text in contains or []:
+        for term in dict.fromkeys(tokenize(text)):
+            clauses.append("d.doc_id IN (SELECT doc_id FROM lex_postings WHERE term = ?)")
+            params.append(term)
+    return " AND ".join(clauses), params
+
+
+def delete_documents(ids: List[str]):
+    if not ids:
+        return
+    with _lock:
+        _remove(ids)
+        _conn.commit()
+
+
+def search(query: str, top_k: int = 5, **filters) -> List[Tuple[str, float]]:
+    """
+    BM25 over the persisted inverted index; returns [(doc_id, score)] best
+    first. Keyword filters (doc_types, files, senders, start_ts, end_ts,
+    contains) restrict the chunks scored; corpus statistics stay global.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    where, filter_params = _filter_clause(**filters)
+    with _lock:
+        total_docs, avg_length = _conn.execute("SELECT COUNT(*), AVG(length) FROM lex_docs").fetchone()
+        if not total_docs:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        document_frequency = dict(_conn.execute(
+            f"SELECT term, COUNT(*) FROM lex_postings WHERE term IN ({placeholders}) GROUP BY term", terms
+        ).fetchall())
+        rows = _conn.execute(
+            f"SELECT p.term, p.doc_id, p.tf, d.length FROM lex_postings p "
+            f"JOIN lex_docs d ON d.doc_id = p.doc_id WHERE p.term IN ({placeholders})"
+            + (f" AND {where}" if where else ""), terms + filter_params
+        ).fetchall()
+
+    avg_length = avg_length or 1.0
+    scores: Dict[str, float] = {}
+    for term, doc_id, tf, length in rows:
+        df = document_frequency[term]
+        idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+        norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def get_stats() -> Dict[str, Optional[float]]:
+    # No distinct-term count: it scans every posting, and /metrics is polled
+    with _lock:
+        docs, avg_length = _conn.execute("SELECT COUNT(*), AVG(length) FROM lex_docs").fetchone()
+        untyped = _conn.execute("SELECT COUNT(*) FROM lex_docs WHERE doc_type IS NULL").fetchone()[0]
+    return {"documents": docs, "avg_length": avg_length, "untyped": untyped}
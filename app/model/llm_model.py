@@ -1,7 +1,14 @@
 import boto3
 import json
 
+from langchain_core.messages import HumanMessage
+
+from app.model.provider_model import CHAT_PROVIDER, get_scripted_chat_model
+
 def run_claude_task(prompt: str) -> str:
+    if CHAT_PROVIDER == "scripted":
+        return get_scripted_chat_model().invoke([HumanMessage(content=prompt)]).content
+
     client = boto3.client("bedrock-runtime", region_name="us-east-1")
     model_id = "anthropic.claude-3-5-sonnet-20240620-v1:0"
 
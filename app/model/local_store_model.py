@@ -0,0 +1,19 @@
+import os
+import sqlite3
+
+# Local on-disk state (caches, manifests, indexes) lives next to chroma_db
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_DATA_DIR = os.path.abspath(os.getenv("LOCAL_DATA_DIR", os.path.join(BASE_DIR, "../../local_data")))
+
+
+def local_path(name: str) -> str:
+    os.makedirs(LOCAL_DATA_DIR, exist_ok=True)
+    return os.path.join(LOCAL_DATA_DIR, name)
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """Open a SQLite database under LOCAL_DATA_DIR, shareable across threads."""
+    conn = sqlite3.connect(local_path(name), check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,77 @@
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+from app.model.local_store_model import connect
+
+_lock = threading.Lock()
+_conn = connect("ingestion_manifest.sqlite3")
+_conn.execute(
+    """
+    CREATE TABLE IF NOT EXISTS ingested_files (
+        filename TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        embedding_model TEXT NOT NULL,
+        chunk_ids TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """
+)
+_conn.execute("CREATE INDEX IF NOT EXISTS idx_ingested_files_hash ON ingested_files(content_hash)")
+_conn.commit()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_entry(filename: str) -> Optional[Dict]:
+    with _lock:
+        row = _conn.execute(
+            "SELECT filename, content_hash, embedding_model, chunk_ids, updated_at "
+            "FROM ingested_files WHERE filename = ?", (filename,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "filename": row[0],
+        "content_hash": row[1],
+        "embedding_model": row[2],
+        "chunk_ids": json.loads(row[3]),
+        "updated_at": row[4],
+    }
+
+
+def find_by_hash(content_hash: str) -> List[str]:
+    """Filenames whose last successful ingest had this content hash."""
+    with _lock:
+        return [row[0] for row in _conn.execute(
+            "SELECT filename FROM ingested_files WHERE content_hash = ?", (content_hash,))]
+
+
+def is_unchanged(filename: str, content_hash: str, embedding_model: str) -> bool:
+    with _lock:
+        row = _conn.execute(
+            "SELECT 1 FROM ingested_files WHERE filename = ? AND content_hash = ? AND embedding_model = ?",
+            (filename, content_hash, embedding_model),
+        ).fetchone()
+    return row is not None
+
+
+def record_file(filename: str, content_hash: str, embedding_model: str, chunk_ids: List[str]):
+    with _lock:
+        _conn.execute(
+            "INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?)",
+            (filename, content_hash, embedding_model, json.dumps(chunk_ids), time.time()),
+        )
+        _conn.commit()
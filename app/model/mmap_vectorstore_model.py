@@ -0,0 +1,521 @@
+import os
+import re
+import json
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.model.local_store_model import connect, local_path
+from app.model.vectorstore_model import VectorStoreBackend, query_result
+
+logger = logging.getLogger(__name__)
+
+# Storage type of the embedding matrix: float16 halves float32's footprint, int8 quarters
+# it (plus one float32 scale per row); float32 keeps vectors exact
+VECTORSTORE_DTYPE = os.getenv("VECTORSTORE_DTYPE", "float16").lower()
+# Rows scored per block in exact search; small enough for each block's float32 copy to stay in cache
+VECTORSTORE_BLOCK_ROWS = int(os.getenv("VECTORSTORE_BLOCK_ROWS", "2048"))
+# IVF: rows are grouped into this many lists once the store holds IVF_MIN_ROWS chunks
+# (0 always searches exactly); a query scores only the rows of its IVF_PROBES nearest lists
+VECTORSTORE_IVF_LISTS = int(os.getenv("VECTORSTORE_IVF_LISTS", "0"))
+VECTORSTORE_IVF_PROBES = int(os.getenv("VECTORSTORE_IVF_PROBES", "8"))
+VECTORSTORE_IVF_MIN_ROWS = int(os.getenv("VECTORSTORE_IVF_MIN_ROWS", "100000"))
+# Filters matching more than this fraction of the rows are applied as a mask over the
+# IVF/block scan instead of gathering and scoring every match
+VECTORSTORE_FILTER_SCAN_FRACTION = float(os.getenv("VECTORSTORE_FILTER_SCAN_FRACTION", "0.25"))
+IVF_TRAIN_ROWS_PER_LIST = 64
+IVF_TRAIN_ITERATIONS = 10
+# Matrix files grow by at least this many rows at a time
+GROWTH_ROWS = 4096
+# Bound on SQLite host parameters per statement
+SQL_BATCH = 900
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+WHERE_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+METADATA_KEY = re.compile(r"^\w+$")
+
+
+def _field(key: str) -> str:
+    if not METADATA_KEY.match(key):
+        raise ValueError(f"Unsupported metadata key in filter: {key!r}")
+    # Same expression as the indexes below, so SQLite can use them
+    return f"json_extract(metadata, '$.{key}')"
+
+
+def where_sql(where: Dict) -> Tuple[str, List]:
+    """Chroma where filter -> SQL condition over the JSON metadata column."""
+    clauses, params = [], []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_sql(condition) for condition in value]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params.extend(param for _, part in parts for param in part)
+            continue
+        operators = value if isinstance(value, dict) else {"$eq": value}
+        for operator, operand in operators.items():
+            if operator in ("$in", "$nin"):
+                negate = "NOT " if operator == "$nin" else ""
+                clauses.append(f"{_field(key)} {negate}IN ({','.join('?' * len(operand))})")
+                params.extend(operand)
+            elif operator in WHERE_OPERATORS:
+                clauses.append(f"{_field(key)} {WHERE_OPERATORS[operator]} ?")
+                params.append(operand)
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+    return " AND ".join(clauses) or "1", params
+
+
+def document_sql(where_document: Dict) -> Tuple[str, List]:
+    """Chroma where_document filter -> SQL condition; $contains is case-sensitive, as in Chroma."""
+    clauses, params = [], []
+    for key, value in where_document.items():
+        if key in ("$and", "$or"):
+            parts = [document_sql(condition) for condition in value]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params.extend(param for _, part in parts for param in part)
+        elif key == "$contains":
+            clauses.append("instr(document, ?) > 0")
+            params.append(value)
+        elif key == "$not_contains":
+            clauses.append("instr(document, ?) = 0")
+            params.append(value)
+        else:
+            raise ValueError(f"Unsupported where_document operator: {key}")
+    return " AND ".join(clauses) or "1", params
+
+
+class MmapVectorStore(VectorStoreBackend):
+    """
+    Embeddings in a memory-mapped NumPy matrix (float16 or int8 with a
+    per-row scale) next to a SQLite table of ids, text and metadata.
+    The files are mapped shared, so uvicorn workers reading the same store
+    share page-cache pages and start without loading anything. Search is
+    exact over blocks of rows, or over the nearest IVF lists once trained.
+    """
+
+    name = "mmap"
+
+    def __init__(self, dim: int, dtype: str = VECTORSTORE_DTYPE, directory: Optional[str] = None,
+                 ivf_lists: int = VECTORSTORE_IVF_LISTS, ivf_probes: int = VECTORSTORE_IVF_PROBES,
+                 ivf_min_rows: int = VECTORSTORE_IVF_MIN_ROWS):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported VECTORSTORE_DTYPE: {dtype} (expected one of {', '.join(DTYPES)})")
+        if not dim:
+            raise ValueError("The mmap vector store needs the embedding dimension of the model")
+        self.dim, self.dtype = dim, dtype
+        self.ivf_lists, self.ivf_probes, self.ivf_min_rows = ivf_lists, ivf_probes, ivf_min_rows
+        self.directory = directory or local_path("vectors")
+        os.makedirs(self.directory, exist_ok=True)
+        print(f"📂 Vector matrix will be stored at: {self.directory}")
+
+        # Re-entrant: writers hold it across _refresh, which reads store_info
+        self._lock = threading.RLock()
+        self._conn = connect(os.path.join(self.directory, "chunks.sqlite3"))
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_doc_type ON chunks(json_extract(metadata, '$.doc_type'));
+            CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks(json_extract(metadata, '$.original_file'));
+            CREATE TABLE IF NOT EXISTS store_info (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        info = dict(self._conn.execute("SELECT key, value FROM store_info"))
+        if info and (int(info["dim"]) != dim or info["dtype"] != dtype):
+            raise ValueError(f"Vector store in {self.directory} holds {info['dim']}-dim {info['dtype']} vectors; "
+                             f"configured for {dim}-dim {dtype}. Re-ingest into a new directory to change either.")
+        self._conn.executemany("INSERT OR IGNORE INTO store_info VALUES (?, ?)", [("dim", str(dim)), ("dtype", dtype)])
+        self._conn.commit()
+
+        self._capacity = 0
+        # Rows ever allocated; the files past it are growth padding and never scanned
+        self._used = 0
+        self._maps: Dict[str, np.memmap] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._centroids_mtime = None
+        self._remap()
+
+    # --- files -------------------------------------------------------------
+
+    def _files(self) -> Dict[str, Tuple[str, type, tuple]]:
+        """name -> (path, dtype, row shape) of every per-row array."""
+        files = {
+            "vectors": (os.path.join(self.directory, f"vectors.{self.dtype}"), DTYPES[self.dtype], (self.dim,)),
+            # Squared norms of the stored (dequantized) vectors, for ||q||^2 - 2 q.x + ||x||^2
+            "norms": (os.path.join(self.directory, "norms.float32"), np.float32, ()),
+            "live": (os.path.join(self.directory, "live.uint8"), np.uint8, ()),
+            # 1-based IVF list of each row, 0 while unassigned
+            "lists": (os.path.join(self.directory, "lists.int32"), np.int32, ()),
+        }
+        if self.dtype == "int8":
+            files["scales"] = (os.path.join(self.directory, "scales.float32"), np.float32, ())
+        return files
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(DTYPES[self.dtype]).itemsize
+
+    def _remap(self):
+        path = self._files()["vectors"][0]
+        capacity = os.path.getsize(path) // self._row_bytes() if os.path.exists(path) else 0
+        self._maps = {}
+        if capacity:
+            for name, (file_path, dtype, shape) in self._files().items():
+                self._maps[name] = np.memmap(file_path, dtype=dtype, mode="r+", shape=(capacity, *shape))
+        self._capacity = capacity
+
+    def _refresh(self):
+        """Pick up writes, growth and IVF training done by another worker process."""
+        path = self._files()["vectors"][0]
+        if os.path.exists(path) and os.path.getsize(path) != self._capacity * self._row_bytes():
+            self._remap()
+        with self._lock:
+            # Stores written before used_rows was recorded fall back to the highest row
+            used = self._conn.execute(
+                "SELECT COALESCE((SELECT CAST(value AS INTEGER) FROM store_info WHERE key = 'used_rows'), "
+                "(SELECT COALESCE(MAX(row), -1) + 1 FROM chunks))").fetchone()[0]
+        self._used = min(used, self._capacity)
+        centroids_path = os.path.join(self.directory, "centroids.npy")
+        mtime = os.path.getmtime(centroids_path) if os.path.exists(centroids_path) else None
+        if mtime != self._centroids_mtime:
+            self._centroids = np.load(centroids_path) if mtime else None
+            self._centroids_mtime = mtime
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, GROWTH_ROWS)
+        self._flush()
+        # Per-row arrays first, the matrix last: its size is what readers take as the capacity
+        for name, (path, dtype, shape) in sorted(self._files().items(), key=lambda item: item[0] == "vectors"):
+            with open(path, "ab") as f:
+                f.truncate(capacity * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+        self._remap()
+
+    def _flush(self):
+        for array in self._maps.values():
+            array.flush()
+
+    # --- encoding ----------------------------------------------------------
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """(stored rows, squared norms of what the rows decode to, int8 scales)."""
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            stored = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            decoded = stored.astype(np.float32) * scales[:, None]
+            return stored, (decoded ** 2).sum(axis=1), scales.astype(np.float32)
+        stored = vectors.astype(DTYPES[self.dtype])
+        return stored, (stored.astype(np.float32) ** 2).sum(axis=1), None
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(self._maps["vectors"][rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors *= self._maps["scales"][rows][:, None]
+        return vectors
+
+    def _as_matrix(self, embeddings) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings, got shape {vectors.shape}")
+        return vectors
+
+    # --- writes ------------------------------------------------------------
+
+    def _rows_for(self, ids: List[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(ids), SQL_BATCH):
+            batch = ids[start:start + SQL_BATCH]
+            rows.update(self._conn.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch).fetchall())
+        return rows
+
+    def _free_rows(self, limit: int) -> List[int]:
+        """Up to `limit` rows freed by delete, lowest first; upsert reuses them before growing."""
+        if not limit or not self._used:
+            return []
+        free = []
+        dead = np.flatnonzero(self._maps["live"][:self._used] == 0)
+        for start in range(0, len(dead), SQL_BATCH):
+            batch = dead[start:start + SQL_BATCH].tolist()
+            taken = {row for (row,) in self._conn.execute(
+                f"SELECT row FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch)}
+            free.extend(row for row in batch if row not in taken)
+            if len(free) >= limit:
+                break
+        return free[:limit]
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict], documents: List[str]):
+        vectors = self._as_matrix(embeddings)
+        with self._lock:
+            # IMMEDIATE: one writer across processes allocates rows and grows the files at a time
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                existing = self._rows_for(ids)
+                next_row = max(self._used, self._conn.execute(
+                    "SELECT COALESCE(MAX(row), -1) + 1 FROM chunks").fetchone()[0])
+                free = iter(self._free_rows(len({doc_id for doc_id in ids if doc_id not in existing})))
+                rows = []
+                for doc_id, metadata, document in zip(ids, metadatas, documents):
+                    row = existing.get(doc_id)
+                    if row is None:
+                        row = next(free, None)
+                        if row is None:
+                            row, next_row = next_row, next_row + 1
+                        existing[doc_id] = row
+                    rows.append(row)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(row, doc_id, document, json.dumps(metadata))
+                     for row, doc_id, metadata, document in zip(rows, ids, metadatas, documents)])
+
+                rows = np.asarray(rows, dtype=np.int64)
+                self._ensure_capacity(int(rows.max()) + 1)
+                stored, norms, scales = self._encode(vectors)
+                self._maps["vectors"][rows] = stored
+                self._maps["norms"][rows] = norms
+                if scales is not None:
+                    self._maps["scales"][rows] = scales
+                self._maps["lists"][rows] = self._assign(vectors) if self._centroids is not None else 0
+                self._maps["live"][rows] = 1
+                self._flush()
+                self._used = max(self._used, int(rows.max()) + 1)
+                self._conn.execute("INSERT OR REPLACE INTO store_info VALUES ('used_rows', ?)", (str(self._used),))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        self._maybe_train()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            # IMMEDIATE: upsert in another process must not reuse a row until its chunk is gone
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = list(self._rows_for(ids).values())
+                if not rows:
+                    self._conn.rollback()
+                    return
+                self._refresh()
+                self._maps["live"][rows] = 0
+                self._flush()
+                for start in range(0, len(rows), SQL_BATCH):
+                    batch = rows[start:start + SQL_BATCH]
+                    self._conn.execute(f"DELETE FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        with self._lock:
+            self._conn.executemany("UPDATE chunks SET metadata = ? WHERE id = ?",
+                                   [(json.dumps(metadata), doc_id) for doc_id, metadata in zip(ids, metadatas)])
+            self._conn.commit()
+
+    # --- IVF ---------------------------------------------------------------
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """1-based nearest centroid of each vector."""
+        centroids = self._centroids
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * vectors @ centroids.T
+        return distances.argmin(axis=1).astype(np.int32) + 1
+
+    def _maybe_train(self):
+        if not self.ivf_lists:
+            return
+        live = self.count()
+        trained = int(dict(self._conn.execute("SELECT key, value FROM store_info")).get("ivf_rows", 0))
+        # Train once the store is big enough, and again each time it has doubled since
+        if live >= self.ivf_min_rows and (not trained or live >= 2 * trained):
+            self.train_ivf()
+
+    def train_ivf(self, seed: int = 0) -> int:
+        """k-means over a sample of live rows, then assign every row to its nearest list."""
+        with self._lock:
+            self._refresh()
+            live_rows = np.flatnonzero(self._maps["live"][:self._used]) if self._used else np.array([])
+            lists = min(self.ivf_lists, len(live_rows))
+            if not lists:
+                return 0
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(live_rows, min(len(live_rows), lists * IVF_TRAIN_ROWS_PER_LIST), replace=False))
+            points = self._decode(sample)
+            centroids = points[rng.choice(len(points), lists, replace=False)].copy()
+            for _ in range(IVF_TRAIN_ITERATIONS):
+                nearest = ((centroids ** 2).sum(axis=1)[None, :] - 2 * points @ centroids.T).argmin(axis=1)
+                for index in range(lists):
+                    members = points[nearest == index]
+                    if len(members):
+                        centroids[index] = members.mean(axis=0)
+            self._centroids = centroids.astype(np.float32)
+            for start in range(0, len(live_rows), VECTORSTORE_BLOCK_ROWS):
+                block = live_rows[start:start + VECTORSTORE_BLOCK_ROWS]
+                self._maps["lists"][block] = self._assign(self._decode(block))
+            self._flush()
+            path = os.path.join(self.directory, "centroids.npy")
+            np.save(path + ".tmp.npy", self._centroids)
+            os.replace(path + ".tmp.npy", path)
+            self._centroids_mtime = os.path.getmtime(path)
+            self._conn.execute("INSERT OR REPLACE INTO store_info VALUES ('ivf_rows', ?)", (str(len(live_rows)),))
+            self._conn.commit()
+        logger.info(f"Trained {lists} IVF lists over {len(live_rows)} vectors")
+        return lists
+
+    # --- search ------------------------------------------------------------
+
+    def _candidates(self, query: np.ndarray, where: Optional[Dict],
+                    where_document: Optional[Dict]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        (rows worth scoring, or None for all rows; mask of rows the filter
+        allows, or None for all). A selective filter's matches are scored
+        exactly; a broad one (e.g. doc_type=chat) is a mask over the IVF
+        lists or the block scan, since gathering most of the store row by
+        row costs more than scanning it.
+        """
+        used = self._used
+        allowed = None
+        if where or where_document:
+            conditions, params = [], []
+            for sql, values in ([where_sql(where)] if where else []) + ([document_sql(where_document)]
+                                                                        if where_document else []):
+                conditions.append(sql)
+                params.extend(values)
+            with self._lock:
+                rows = self._conn.execute(f"SELECT row FROM chunks WHERE {' AND '.join(conditions)}", params).fetchall()
+            matches = np.fromiter((row for (row,) in rows), dtype=np.int64, count=len(rows))
+            # Rows written after this query's _refresh are past `used`
+            matches = matches[matches < used]
+            if len(matches) <= VECTORSTORE_FILTER_SCAN_FRACTION * used:
+                return np.sort(matches), None
+            allowed = np.zeros(used, dtype=bool)
+            allowed[matches] = True
+        if self._centroids is None:
+            return None, allowed
+        distances = (self._centroids ** 2).sum(axis=1) - 2 * self._centroids @ query
+        probed = np.zeros(len(self._centroids) + 1, dtype=bool)
+        probed[np.argsort(distances)[:self.ivf_probes] + 1] = True
+        # Rows written before training or by a worker that hasn't seen the centroids yet are always scored
+        probed[0] = True
+        scored = probed[self._maps["lists"][:used]] & (self._maps["live"][:used] != 0)
+        return np.flatnonzero(scored if allowed is None else scored & allowed), None
+
+    def _score(self, rows, query: np.ndarray) -> np.ndarray:
+        """Squared L2 distances of the given rows (slice or index array); dead rows get inf."""
+        stored = self._maps["vectors"][rows]
+        dots = stored.astype(np.float32) @ query
+        if self.dtype == "int8":
+            dots *= self._maps["scales"][rows]
+        distances = self._maps["norms"][rows] - 2 * dots + float(query @ query)
+        distances[self._maps["live"][rows] == 0] = np.inf
+        return distances
+
+    def query(self, embedding: List[float], top_k: int, include_embeddings: bool = False,
+              where: Optional[Dict] = None, where_document: Optional[Dict] = None) -> Dict:
+        query = self._as_matrix([embedding])[0]
+        self._refresh()
+        if not self._used or top_k <= 0:
+            return query_result([], include_embeddings)
+        candidates, allowed = self._candidates(query, where, where_document)
+
+        best_rows, best_distances = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if candidates is not None:
+            total = len(candidates)
+        else:
+            # The mask is sized to the rows seen when it was built
+            total = self._used if allowed is None else len(allowed)
+        for start in range(0, total, VECTORSTORE_BLOCK_ROWS):
+            if candidates is None:
+                rows = np.arange(start, min(start + VECTORSTORE_BLOCK_ROWS, total))
+                distances = self._score(slice(start, start + len(rows)), query)
+                if allowed is not None:
+                    distances[~allowed[start:start + len(rows)]] = np.inf
+            else:
+                rows = candidates[start:start + VECTORSTORE_BLOCK_ROWS]
+                distances = self._score(rows, query)
+            if len(distances) > top_k:
+                keep = np.argpartition(distances, top_k)[:top_k]
+                rows, distances = rows[keep], distances[keep]
+            best_rows = np.concatenate([best_rows, rows])
+            best_distances = np.concatenate([best_distances, distances])
+        order = np.argsort(best_distances, kind="stable")[:top_k]
+        order = order[np.isfinite(best_distances[order])]
+        rows, distances = best_rows[order], best_distances[order]
+
+        found = self._fetch_rows(rows.tolist())
+        embeddings = self._decode(rows) if include_embeddings and len(rows) else [None] * len(rows)
+        hits = [(float(distance), *found[int(row)], embedding)
+                for row, distance, embedding in zip(rows, distances, embeddings) if int(row) in found]
+        return query_result(hits, include_embeddings)
+
+    # --- reads -------------------------------------------------------------
+
+    def _fetch_rows(self, rows: List[int]) -> Dict[int, tuple]:
+        """row -> (id, document, metadata)."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(rows), SQL_BATCH):
+                batch = rows[start:start + SQL_BATCH]
+                for row, doc_id, document, metadata in self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(batch))})",
+                        batch):
+                    found[row] = (doc_id, document, json.loads(metadata))
+        return found
+
+    def get(self, ids: List[str], include_embeddings: bool = False) -> Dict:
+        with self._lock:
+            rows = self._rows_for(ids)
+        found = self._fetch_rows(list(rows.values()))
+        ordered = [doc_id for doc_id in ids if doc_id in rows and rows[doc_id] in found]
+        self._refresh()
+        embeddings = (list(self._decode(np.asarray([rows[doc_id] for doc_id in ordered], dtype=np.int64)))
+                      if include_embeddings and ordered else [None] * len(ordered))
+        return {
+            "ids": ordered,
+            "documents": [found[rows[doc_id]][1] for doc_id in ordered],
+            "metadatas": [found[rows[doc_id]][2] for doc_id in ordered],
+            "embeddings": embeddings,
+        }
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def iter_pages(self, page_size: int = 1000, include_documents: bool = False) -> Iterator[Dict]:
+        last = -1
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT row, id, document, metadata FROM chunks WHERE row > ? ORDER BY row LIMIT ?",
+                    (last, page_size)).fetchall()
+            if not page:
+                return
+            last = page[-1][0]
+            result = {"ids": [r[1] for r in page], "metadatas": [json.loads(r[3]) for r in page]}
+            if include_documents:
+                result["documents"] = [r[2] for r in page]
+            yield result
+
+    def get_stats(self) -> Dict:
+        self._refresh()
+        size = sum(os.path.getsize(path) for path, _, _ in self._files().values() if os.path.exists(path))
+        return {
+            "backend": self.name,
+            "chunks": self.count(),
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "used_rows": self._used,
+            "capacity_rows": self._capacity,
+            "bytes_on_disk": size,
+            "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+        }
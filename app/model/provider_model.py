@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import time
+import zlib
+import math
+import random
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app.model.chunker_model import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# "bedrock" calls Titan; "hash" embeds locally (deterministic, no network), for profiling and load tests
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "bedrock").lower()
+# Simulated round trip of each local embedding call, so embedding concurrency still matters
+HASH_EMBEDDING_LATENCY_MS = float(os.getenv("HASH_EMBEDDING_LATENCY_MS", "0"))
+
+# "bedrock" calls Claude; "scripted" answers locally from SCRIPTED_CHAT_RESPONSES
+CHAT_PROVIDER = os.getenv("CHAT_PROVIDER", "bedrock").lower()
+# JSON file: {"regex": "answer", ...} (first pattern found in the prompt wins) or ["answer", ...] (cycled)
+SCRIPTED_CHAT_RESPONSES = os.getenv("SCRIPTED_CHAT_RESPONSES")
+# Time to first token, output speed, share of calls that fail and what they fail with
+SCRIPTED_CHAT_LATENCY_MS = float(os.getenv("SCRIPTED_CHAT_LATENCY_MS", "0"))
+SCRIPTED_CHAT_TOKENS_PER_SECOND = float(os.getenv("SCRIPTED_CHAT_TOKENS_PER_SECOND", "0"))
+SCRIPTED_CHAT_ERROR_RATE = float(os.getenv("SCRIPTED_CHAT_ERROR_RATE", "0"))
+SCRIPTED_CHAT_ERROR = os.getenv("SCRIPTED_CHAT_ERROR", "ThrottlingException: Too many requests (injected)")
+SCRIPTED_CHAT_SEED = int(os.getenv("SCRIPTED_CHAT_SEED", "0"))
+
+# Used when no script is configured or no pattern matches: extraction prompts get an empty task list
+DEFAULT_SCRIPT = {r"JSON array": "[]"}
+DEFAULT_ANSWER = "Scripted answer: no Bedrock call was made for this prompt."
+WORD = re.compile(r"\w+")
+
+
+class HashEmbedder:
+    """
+    Deterministic stand-in for the embedding model: signed feature hashing
+    of a text's words and word pairs into `dim` buckets, L2-normalized.
+    Texts sharing words land near each other, so retrieval still behaves
+    plausibly, and the same text always gets the same vector.
+    """
+
+    def __init__(self, dim: int, latency_ms: float = HASH_EMBEDDING_LATENCY_MS):
+        if not dim:
+            raise ValueError("The hash embedder needs the dimension of the embedding model it stands in for")
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.model_id = f"hash-{dim}"
+
+    def embed(self, text: str) -> List[float]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        words = WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])] or [text]
+        vector = [0.0] * self.dim
+        for feature in features:
+            # crc32 rather than hash(): str hashes are salted per process
+            digest = zlib.crc32(feature.encode("utf-8"))
+            vector[digest % self.dim] += -1.0 if digest & 0x80000000 else 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+
+class ScriptedChatError(RuntimeError):
+    """An injected provider failure."""
+
+
+def _prompt_text(messages) -> str:
+    parts = []
+    for message in messages:
+        content = getattr(message, "content", message)
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+    return "\n".join(parts)
+
+
+def load_script(path: Optional[str]):
+    if not path:
+        return DEFAULT_SCRIPT
+    with open(path, encoding="utf-8") as f:
+        script = json.load(f)
+    if not isinstance(script, (dict, list)) or not script:
+        raise ValueError(f"{path}: expected a non-empty JSON object or list of answers")
+    return script
+
+
+class ScriptedChatModel:
+    """
+    Stand-in for ChatBedrock (the invoke/stream calls langstream_service
+    makes): answers from a script after a configurable time to first token,
+    streams at a fixed token rate, and fails a share of calls on purpose.
+    Token usage is reported like Bedrock's, from count_tokens estimates.
+    """
+
+    def __init__(self, model_id: str = "scripted", script=None,
+                 latency_ms: float = SCRIPTED_CHAT_LATENCY_MS,
+                 tokens_per_second: float = SCRIPTED_CHAT_TOKENS_PER_SECOND,
+                 error_rate: float = SCRIPTED_CHAT_ERROR_RATE, error: str = SCRIPTED_CHAT_ERROR,
+                 seed: int = SCRIPTED_CHAT_SEED):
+        self.model_id = model_id
+        self.script = script if script is not None else load_script(SCRIPTED_CHAT_RESPONSES)
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error = error
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._turn = 0
+        self.calls = 0
+        self.failures = 0
+
+    def respond(self, prompt: str) -> str:
+        """The scripted answer for a prompt."""
+        if isinstance(self.script, list):
+            with self._lock:
+                answer, self._turn = self.script[self._turn % len(self.script)], self._turn + 1
+            return answer
+        for pattern, answer in self.script.items():
+            if re.search(pattern, prompt):
+                return answer
+        return DEFAULT_ANSWER
+
+    def _start(self, messages) -> tuple:
+        """Count the call, maybe fail it, wait out the time to first token; returns (prompt, answer)."""
+        with self._lock:
+            self.calls += 1
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.failures += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if failed:
+            raise ScriptedChatError(self.error)
+        prompt = _prompt_text(messages)
+        return prompt, self.respond(prompt)
+
+    def _usage(self, prompt: str, answer: str) -> Dict[str, int]:
+        input_tokens, output_tokens = count_tokens(prompt), count_tokens(answer)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _pace(self, text: str):
+        if self.tokens_per_second:
+            time.sleep(count_tokens(text) / self.tokens_per_second)
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        prompt, answer = self._start(messages)
+        self._pace(answer)
+        return AIMessage(content=answer, usage_metadata=self._usage(prompt, answer))
+
+    def stream(self, messages, **kwargs) -> Iterator[AIMessageChunk]:
+        prompt, answer = self._start(messages)
+        pieces = re.findall(r"\S+\s*|\s+", answer) or [""]
+        for index, piece in enumerate(pieces):
+            self._pace(piece)
+            last = index == len(pieces) - 1
+            # Usage arrives with the final chunk, as Bedrock's message_stop does
+            yield AIMessageChunk(content=piece, usage_metadata=self._usage(prompt, answer) if last else None)
+
+
+_scripted_chat_model: Optional[ScriptedChatModel] = None
+_scripted_lock = threading.Lock()
+
+
+def get_scripted_chat_model() -> ScriptedChatModel:
+    """The process-wide scripted model, so every caller shares one script, error stream and call count."""
+    global _scripted_chat_model
+    if _scripted_chat_model is None:
+        with _scripted_lock:
+            if _scripted_chat_model is None:
+                _scripted_chat_model = ScriptedChatModel()
+    return _scripted_chat_model
+
+
+def create_chat_model(model_id: str, region_name: str, temperature: float, max_tokens: int):
+    """ChatBedrock, or the scripted stand-in when CHAT_PROVIDER=scripted."""
+    if CHAT_PROVIDER == "scripted":
+        logger.info(f"CHAT_PROVIDER=scripted: answering {model_id} prompts locally")
+        return get_scripted_chat_model()
+    if CHAT_PROVIDER != "bedrock":
+        raise ValueError(f"Unknown CHAT_PROVIDER: {CHAT_PROVIDER}")
+    from langchain_aws.chat_models import ChatBedrock
+
+    return ChatBedrock(model_id=model_id, region_name=region_name, temperature=temperature, max_tokens=max_tokens)
@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Roster files recognised at ingest and the table each one feeds
+ROSTER_FILES = {
+    "members_info.json": "members",
+    "group_info.json": "groups",
+    "hierarchy.json": "hierarchy",
+    "ranks.json": "ranks",
+}
+GROUP_ID_PATTERN = re.compile(r"\bGRP[\w\-]*\b", re.IGNORECASE)
+
+
+def _records(data) -> List[Dict]:
+    """Accept a list of rows, {"key": [rows]}, or {id: {row}} and return rows."""
+    if isinstance(data, list):
+        return [row for row in data if isinstance(row, dict)]
+    if isinstance(data, dict):
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if len(lists) == 1:
+            return _records(lists[0])
+        if all(isinstance(value, dict) for value in data.values()):
+            return list(data.values())
+        return [data]
+    return []
+
+
+def _norm(value) -> str:
+    return str(value).strip().lower() if value is not None else ""
+
+
+class RosterTables:
+    """
+    Indexed in-memory copies of the four roster files plus precomputed
+    joins (group details, rank level, reports-to name) per membership row.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.raw: Dict[str, List[Dict]] = {table: [] for table in ROSTER_FILES.values()}
+        self.users: List[Dict] = []
+        self.groups: Dict[str, Dict] = {}
+        self.users_by_group: Dict[str, List[Dict]] = {}
+        self.users_by_id: Dict[str, List[Dict]] = {}
+        self.users_by_name: Dict[str, List[Dict]] = {}
+        self.users_by_phone: Dict[str, List[Dict]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.raw["members"])
+
+    def load(self, filename: str, data):
+        table = ROSTER_FILES.get(os.path.basename(filename))
+        if table is None:
+            return
+        if table == "ranks" and isinstance(data, dict) and \
+                not any(isinstance(value, (list, dict)) for value in data.values()):
+            rows = [{"Rank": rank, "level": level} for rank, level in data.items()]  # {"SP": 1, ...}
+        else:
+            rows = _records(data)
+        with self._lock:
+            self.raw[table] = rows
+            self._rebuild()
+        logger.info(f"Loaded {len(self.raw[table])} rows from {filename} into roster table '{table}'")
+
+    def _rebuild(self):
+        groups = {_norm(g.get("grp_id")): g for g in self.raw["groups"] if g.get("grp_id")}
+        rank_level = {_norm(r.get("Rank")): r.get("level") for r in self.raw["ranks"]}
+        reports_to = {_norm(h.get("mem_id")): h.get("Reports_to") for h in self.raw["hierarchy"]}
+        names = {}
+        for member in self.raw["members"]:
+            names.setdefault(_norm(member.get("mem_id")), member.get("Officer_Name"))
+
+        users = []
+        for member in self.raw["members"]:
+            mem_key = _norm(member.get("mem_id"))
+            group = groups.get(_norm(member.get("grp_id")), {})
+            boss = reports_to.get(mem_key) or member.get("Reports_to")
+            users.append({
+                "user_id": member.get("mem_id"),
+                "name": member.get("Officer_Name"),
+                "role": member.get("Rank"),
+                "reports_to_id": boss,
+                "jurisdiction_type": member.get("Sub_Division"),
+                "jurisdiction_name": member.get("Circle"),
+                "phone_number": member.get("Mobile_no"),
+                "grp_id": member.get("grp_id"),
+                "group_name": group.get("gname"),
+                "group_purpose": group.get("purpose"),
+                "rank_level": rank_level.get(_norm(member.get("Rank"))),
+                "reports_to_name": names.get(_norm(boss)) if boss else None,
+            })
+
+        by_group, by_id, by_name, by_phone = {}, {}, {}, {}
+        for user in users:
+            by_group.setdefault(_norm(user["grp_id"]), []).append(user)
+            by_id.setdefault(_norm(user["user_id"]), []).append(user)
+            if user["name"]:
+                by_name.setdefault(_norm(user["name"]), []).append(user)
+            digits = re.sub(r"\D", "", str(user["phone_number"] or ""))
+            if digits:
+                by_phone.setdefault(digits[-10:], []).append(user)
+
+        self.users, self.groups = users, groups
+        self.users_by_group, self.users_by_id = by_group, by_id
+        self.users_by_name, self.users_by_phone = by_name, by_phone
+
+    def _group_entry(self, grp_key: str) -> Dict:
+        group = self.groups.get(grp_key, {})
+        return {
+            "grp_id": group.get("grp_id"),
+            "group_name": group.get("gname"),
+            "group_purpose": group.get("purpose"),
+            "users": self.users_by_group.get(grp_key, []),
+        }
+
+    def find_users(self, query: str) -> List[Dict]:
+        """Users named in the query by mem_id, officer name or phone number."""
+        text = _norm(query)
+        matches: List[Dict] = []
+        for token in re.findall(r"[\w\-]+", text):
+            matches.extend(self.users_by_id.get(token, []))
+        for name, users in self.users_by_name.items():
+            if name and name in text:
+                matches.extend(users)
+        for digits in re.findall(r"\d{10,}", re.sub(r"[\s\-]", "", text)):
+            matches.extend(self.users_by_phone.get(digits[-10:], []))
+        return list({id(user): user for user in matches}.values())
+
+    def answer(self, query: str) -> Dict:
+        """Build the /users response (all_users, groups_with_users, specific_group_users)."""
+        with self._lock:
+            response = {
+                "all_users": self.users,
+                "groups_with_users": [self._group_entry(key) for key in self.groups],
+            }
+            requested = list(dict.fromkeys(m.group(0) for m in GROUP_ID_PATTERN.finditer(query)))
+            specific = []
+            for grp_id in requested:
+                key = _norm(grp_id)
+                if key not in self.groups:
+                    specific.append({"grp_id": grp_id, "users": [],
+                                     "note": f"Group {grp_id} not found in group_info.json"})
+                    continue
+                entry = self._group_entry(key)
+                if not entry["users"]:
+                    entry["note"] = f"No users found for {entry['grp_id']} in members_info.json"
+                specific.append(entry)
+
+            matched_users = self.find_users(query)
+            if matched_users:
+                response["matched_users"] = matched_users
+            if requested:
+                response["specific_group_users"] = specific
+            elif matched_users:
+                response["specific_group_users"] = []
+            else:
+                response["specific_group_users"] = {
+                    "users": self.users,
+                    "note": "No specific group ID provided; returning users from all groups",
+                }
+            return response
+
+
+roster = RosterTables()
+
+
+def load_roster_file(file_path: str, filename: Optional[str] = None) -> bool:
+    """Load one roster JSON into the tables; returns False for non-roster files."""
+    filename = filename or os.path.basename(file_path)
+    if filename not in ROSTER_FILES:
+        return False
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            roster.load(filename, json.load(f))
+        return True
+    except Exception as e:
+        logger.error(f"Failed to load roster file {filename}: {str(e)}")
+        return False
+
+
+def load_roster_dir(directory: str) -> int:
+    """Load whichever roster files are present in a directory (e.g. at startup)."""
+    loaded = 0
+    for filename in ROSTER_FILES:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path) and load_roster_file(path, filename):
+            loaded += 1
+    return loaded
@@ -0,0 +1,229 @@
+import re
+import time
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.model.local_store_model import connect
+from app.model.provider_model import CHAT_PROVIDER
+
+# Bump when the extraction prompt changes so chunks get re-extracted
+EXTRACTOR_VERSION = "v1"
+# Part of every chunk hash, so scripted results are never reused as Bedrock's (Bedrock hashes keep their old value)
+EXTRACTION_SOURCE_ID = EXTRACTOR_VERSION if CHAT_PROVIDER == "bedrock" else f"{EXTRACTOR_VERSION}-{CHAT_PROVIDER}"
+
+TASK_FIELDS = ("assigner", "assignee", "task", "deadline", "circle", "source_message")
+
+_lock = threading.Lock()
+_conn = connect("task_index.sqlite3")
+# Linked-task flag and distinct assigners/assignees/circles, read on every /task query;
+# dropped on our own writes and reloaded when PRAGMA data_version shows another process wrote
+_vocabulary: Optional[Dict] = None
+_vocabulary_version: Optional[int] = None
+_conn.executescript(
+    """
+    CREATE TABLE IF NOT EXISTS task_extractions (
+        chunk_hash TEXT PRIMARY KEY,
+        task_count INTEGER NOT NULL,
+        extracted_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS task_chunks (
+        doc_id TEXT PRIMARY KEY,
+        chunk_hash TEXT NOT NULL,
+        original_file TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_task_chunks_hash ON task_chunks(chunk_hash);
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY,
+        chunk_hash TEXT NOT NULL,
+        assigner TEXT,
+        assignee TEXT,
+        task TEXT NOT NULL,
+        deadline TEXT,
+        circle TEXT,
+        source_message TEXT,
+        message_time TEXT,
+        message_ts INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_chunk ON tasks(chunk_hash);
+    CREATE INDEX IF NOT EXISTS idx_tasks_assigner ON tasks(assigner COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_tasks_assignee ON tasks(assignee COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_tasks_circle ON tasks(circle COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks(deadline);
+    CREATE INDEX IF NOT EXISTS idx_tasks_message_ts ON tasks(message_ts);
+    """
+)
+# Which extraction source a chunk was linked under; older index files get NULL and are re-linked once
+if "extractor" not in {row[1] for row in _conn.execute("PRAGMA table_info(task_chunks)")}:
+    _conn.execute("ALTER TABLE task_chunks ADD COLUMN extractor TEXT")
+_conn.commit()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(f"{EXTRACTION_SOURCE_ID}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def extracted_hashes(hashes: Iterable[str]) -> Set[str]:
+    """Which of these chunk hashes already have extraction results."""
+    hashes = list(hashes)
+    if not hashes:
+        return set()
+    placeholders = ",".join("?" * len(hashes))
+    with _lock:
+        rows = _conn.execute(
+            f"SELECT chunk_hash FROM task_extractions WHERE chunk_hash IN ({placeholders})", hashes
+        ).fetchall()
+    return {row[0] for row in rows}
+
+
+def link_chunks(links: List[Tuple[str, str, str]]):
+    """Point (doc_id, chunk_hash, original_file) at the extraction for that chunk text."""
+    global _vocabulary
+    with _lock:
+        _vocabulary = None
+        _conn.executemany("INSERT OR REPLACE INTO task_chunks VALUES (?, ?, ?, ?)",
+                          [(*link, EXTRACTION_SOURCE_ID) for link in links])
+        _conn.commit()
+
+
+def unextracted_chunks(after: str = "", limit: int = 200) -> List[Tuple[str, str]]:
+    """
+    (doc_id, original_file) of linked chunks with no extraction result, or
+    linked under another extraction source, in doc_id order after `after`.
+    """
+    with _lock:
+        return _conn.execute(
+            "SELECT c.doc_id, c.original_file FROM task_chunks c "
+            "WHERE c.doc_id > ? AND (c.extractor IS NOT ? "
+            "OR NOT EXISTS (SELECT 1 FROM task_extractions e WHERE e.chunk_hash = c.chunk_hash)) "
+            "ORDER BY c.doc_id LIMIT ?",
+            (after, EXTRACTION_SOURCE_ID, limit),
+        ).fetchall()
+
+
+def unlink_chunks(doc_ids: List[str]):
+    """Forget chunks removed from the vector store; their tasks drop out of searches."""
+    global _vocabulary
+    if not doc_ids:
+        return
+    placeholders = ",".join("?" * len(doc_ids))
+    with _lock:
+        _vocabulary = None
+        _conn.execute(f"DELETE FROM task_chunks WHERE doc_id IN ({placeholders})", doc_ids)
+        _conn.commit()
+
+
+def record_extraction(hash_: str, tasks: List[Dict]):
+    global _vocabulary
+    with _lock:
+        _vocabulary = None
+        _conn.execute("DELETE FROM tasks WHERE chunk_hash = ?", (hash_,))
+        _conn.executemany(
+            "INSERT INTO tasks (chunk_hash, assigner, assignee, task, deadline, circle, source_message, "
+            "message_time, message_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(hash_, *(task.get(field) for field in TASK_FIELDS), task.get("message_time"), task.get("message_ts"))
+             for task in tasks],
+        )
+        _conn.execute("INSERT OR REPLACE INTO task_extractions VALUES (?, ?, ?)", (hash_, len(tasks), time.time()))
+        _conn.commit()
+
+
+def _load_vocabulary() -> Dict:
+    vocabulary = {"has_tasks": _conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM tasks t JOIN task_chunks c ON c.chunk_hash = t.chunk_hash)").fetchone()[0]}
+    for column in ("assigner", "assignee", "circle"):
+        vocabulary[column] = [row[0] for row in _conn.execute(
+            f"SELECT DISTINCT t.{column} FROM tasks t JOIN task_chunks c ON c.chunk_hash = t.chunk_hash "
+            f"WHERE t.{column} IS NOT NULL AND t.{column} != ''")]
+    return vocabulary
+
+
+def _get_vocabulary() -> Dict:
+    global _vocabulary, _vocabulary_version
+    with _lock:
+        version = _conn.execute("PRAGMA data_version").fetchone()[0]
+        if _vocabulary is None or version != _vocabulary_version:
+            _vocabulary, _vocabulary_version = _load_vocabulary(), version
+        return _vocabulary
+
+
+def has_tasks() -> bool:
+    """Whether any chunk in the store has extracted tasks."""
+    return bool(_get_vocabulary()["has_tasks"])
+
+
+def distinct_values(column: str) -> List[str]:
+    """Known assigners/assignees/circles, for spotting them in a query."""
+    if column not in ("assigner", "assignee", "circle"):
+        raise ValueError(f"Unsupported column: {column}")
+    return list(_get_vocabulary()[column])
+
+
+def search_tasks(assigners: Optional[List[str]] = None, assignees: Optional[List[str]] = None,
+                 people: Optional[List[str]] = None, circles: Optional[List[str]] = None,
+                 keywords: Optional[List[str]] = None, limit: int = 200) -> List[Dict]:
+    """
+    Tasks from chunks currently in the store. Each filter list is OR-ed
+    within itself and AND-ed with the others; people match either side.
+    Keywords match whole words in the task or its message, and only the
+    tasks matching the most keywords are kept.
+    """
+    clauses, params = [], []
+
+    def any_of(column: str, values: List[str], op: str = "= ? COLLATE NOCASE"):
+        clauses.append("(" + " OR ".join(f"t.{column} {op}" for _ in values) + ")")
+        params.extend(values)
+
+    if assigners:
+        any_of("assigner", assigners)
+    if assignees:
+        any_of("assignee", assignees)
+    if people:
+        clauses.append("(" + " OR ".join("t.assigner = ? COLLATE NOCASE OR t.assignee = ? COLLATE NOCASE"
+                                         for _ in people) + ")")
+        params.extend(value for person in people for value in (person, person))
+    if circles:
+        any_of("circle", circles)
+    if keywords:
+        # Substring prefilter; whole words are checked below
+        clauses.append("(" + " OR ".join("t.task LIKE ? OR t.source_message LIKE ?" for _ in keywords) + ")")
+        params.extend(value for word in keywords for value in (f"%{word}%", f"%{word}%"))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with _lock:
+        rows = _conn.execute(
+            f"SELECT t.assigner, t.assignee, t.task, t.deadline, t.circle, t.source_message, t.message_time, "
+            f"group_concat(DISTINCT c.original_file) FROM tasks t "
+            f"JOIN task_chunks c ON c.chunk_hash = t.chunk_hash {where} "
+            f"GROUP BY t.id ORDER BY t.message_ts IS NULL, t.message_ts, t.id" + ("" if keywords else " LIMIT ?"),
+            params + ([] if keywords else [limit]),
+        ).fetchall()
+    if keywords:
+        rows = _best_keyword_matches(rows, keywords)[:limit]
+    # Overlapping chat windows extract the same message twice; keep one copy
+    seen, tasks = set(), []
+    for row in rows:
+        key = tuple((value or "").strip().lower() for value in row[:3])
+        if key in seen:
+            continue
+        seen.add(key)
+        tasks.append(dict(zip(TASK_FIELDS + ("message_time", "source_files"), row)))
+    return tasks
+
+
+def _best_keyword_matches(rows: List[Tuple], keywords: List[str]) -> List[Tuple]:
+    """Rows whose task or message contains the most keywords as whole words, in their original order."""
+    patterns = [re.compile(rf"\b{re.escape(word)}\b", re.IGNORECASE) for word in dict.fromkeys(keywords)]
+    scored = [(sum(bool(p.search(f"{row[2] or ''}\n{row[5] or ''}")) for p in patterns), row) for row in rows]
+    best = max((score for score, _ in scored), default=0)
+    return [row for score, row in scored if best and score == best]
+
+
+def get_stats() -> Dict[str, int]:
+    with _lock:
+        extracted = _conn.execute("SELECT COUNT(*) FROM task_extractions").fetchone()[0]
+        tasks = _conn.execute(
+            "SELECT COUNT(*) FROM tasks t WHERE EXISTS (SELECT 1 FROM task_chunks c WHERE c.chunk_hash = t.chunk_hash)"
+        ).fetchone()[0]
+        chunks = _conn.execute("SELECT COUNT(*) FROM task_chunks").fetchone()[0]
+    return {"chunks_extracted": extracted, "chunks_linked": chunks, "tasks": tasks}
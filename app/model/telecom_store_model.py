@@ -0,0 +1,233 @@
+import os
+import re
+import glob
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.model.local_store_model import local_path
+
+logger = logging.getLogger(__name__)
+
+# CDR / IPDR rows as Parquet, one file per source file, queried with DuckDB
+TELECOM_DIR = local_path("telecom")
+
+CDR_COLUMNS = {"callerid": "caller", "calleeid": "callee", "starttime": "start_time",
+               "endtime": "end_time", "towerid": "tower_id"}
+IPDR_COLUMNS = {"subscriberid": "subscriber", "sessionstart": "start_time", "sessionend": "end_time",
+                "bytestransferred": "bytes", "apn": "apn"}
+# One IPDR table row as text: "+91-7094293281 2025-06-20 09:26:13 2025-06-20 10:45:13 7511326 apn.data.net"
+IPDR_ROW = re.compile(r"^(?P<subscriber>\+?[\d\-]{10,})\s+(?P<start>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s+"
+                      r"(?P<end>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s+(?P<bytes>\d+)\s+(?P<apn>\S+)$")
+
+_lock = threading.Lock()
+_conn = duckdb.connect()
+
+
+def number_key(number) -> str:
+    """Last 10 digits, so "+91-9108261515", "919108261515" and "9108261515" match."""
+    return re.sub(r"\D", "", str(number or ""))[-10:]
+
+
+def _key_column(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.replace(r"\D", "", regex=True).str[-10:]
+
+
+def _dataset(kind: str) -> str:
+    return os.path.join(TELECOM_DIR, kind, "*.parquet")
+
+
+def _has_rows(kind: str) -> bool:
+    return bool(glob.glob(_dataset(kind)))
+
+
+def _write(kind: str, filename: str, df: pd.DataFrame):
+    """Replace the rows previously loaded from this source file."""
+    directory = os.path.join(TELECOM_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    df["source_file"] = filename
+    # Sorted by number, so row-group min/max stats let DuckDB skip most of a file on number filters
+    df = df.sort_values(["caller_key" if kind == "cdr" else "subscriber_key", "start_time"], kind="stable")
+    path = os.path.join(directory, f"{os.path.splitext(filename)[0]}.parquet")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+def cdr_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=lambda c: CDR_COLUMNS.get(str(c).strip().lower(), c))[list(CDR_COLUMNS.values())]
+    df = df.dropna(subset=["caller", "callee", "start_time"]).copy()
+    df["caller"], df["callee"], df["tower_id"] = (df[c].astype(str).str.strip() for c in ("caller", "callee", "tower_id"))
+    df["start_time"] = pd.to_datetime(df["start_time"], errors="coerce")
+    df["end_time"] = pd.to_datetime(df["end_time"], errors="coerce")
+    df["duration_s"] = (df["end_time"] - df["start_time"]).dt.total_seconds()
+    df["caller_key"], df["callee_key"] = _key_column(df["caller"]), _key_column(df["callee"])
+    return df
+
+
+def ipdr_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=lambda c: IPDR_COLUMNS.get(str(c).strip().lower(), c))[list(IPDR_COLUMNS.values())]
+    df = df.dropna(subset=["subscriber", "start_time"]).copy()
+    df["subscriber"], df["apn"] = df["subscriber"].astype(str).str.strip(), df["apn"].astype(str).str.strip()
+    df["start_time"] = pd.to_datetime(df["start_time"], errors="coerce")
+    df["end_time"] = pd.to_datetime(df["end_time"], errors="coerce")
+    df["bytes"] = pd.to_numeric(df["bytes"], errors="coerce").astype("Int64")
+    df["subscriber_key"] = _key_column(df["subscriber"])
+    return df
+
+
+def parse_ipdr_text(text: str) -> pd.DataFrame:
+    rows = [match.groupdict() for match in map(IPDR_ROW.match, (line.strip() for line in text.splitlines())) if match]
+    return pd.DataFrame(rows, columns=["subscriber", "start", "end", "bytes", "apn"]).rename(
+        columns={"subscriber": "subscriberID", "start": "sessionStart", "end": "sessionEnd",
+                 "bytes": "bytesTransferred", "apn": "APN"})
+
+
+def telecom_kind(columns) -> Optional[str]:
+    names = {str(c).strip().lower() for c in columns}
+    if set(CDR_COLUMNS) <= names:
+        return "cdr"
+    if set(IPDR_COLUMNS) <= names:
+        return "ipdr"
+    return None
+
+
+def load_telecom_file(file_path: str, filename: str) -> Optional[Dict]:
+    """
+    Load CDR spreadsheets and IPDR tables (spreadsheet or PDF) into the
+    columnar store. Returns {"kind", "rows"}, or None for other files.
+    """
+    lowered = filename.lower()
+    if lowered.endswith((".xlsx", ".csv")):
+        df = pd.read_excel(file_path) if lowered.endswith(".xlsx") else pd.read_csv(file_path)
+    elif lowered.endswith(".pdf"):
+        from app.model.text_extractor_model import iter_pdf_pages
+
+        pages = iter_pdf_pages(file_path)
+        _, first = next(pages, (0, ""))
+        # Only parse the rest when the first page carries the IPDR header
+        if telecom_kind(first.split()) != "ipdr":
+            return None
+        df = parse_ipdr_text("\n".join([first] + [text for _, text in pages]))
+    else:
+        return None
+
+    kind = telecom_kind(df.columns)
+    if kind is None:
+        return None
+    df = cdr_frame(df) if kind == "cdr" else ipdr_frame(df)
+    with _lock:
+        _write(kind, filename, df)
+    logger.info(f"Loaded {len(df)} {kind.upper()} rows from {filename} into the telecom store")
+    return {"kind": kind, "rows": len(df)}
+
+
+def query(sql: str, params: Optional[Dict] = None, kinds=("cdr", "ipdr")) -> List[Dict]:
+    """Run SQL over the `cdr` and `ipdr` views (empty results when nothing is loaded)."""
+    views = [kind for kind in kinds if _has_rows(kind)]
+    if any(re.search(rf"\b{kind}\b", sql) for kind in set(kinds) - set(views)):
+        return []
+    cursor = _conn.cursor()
+    try:
+        for kind in views:
+            cursor.execute(f"CREATE OR REPLACE TEMP VIEW {kind} AS SELECT * FROM read_parquet('{_dataset(kind)}')")
+        frame = cursor.execute(sql, params or {}).df()
+    finally:
+        cursor.close()
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+
+def contact_frequency(number: str, limit: int = 10) -> List[Dict]:
+    """Numbers called by or calling `number`, most frequent first."""
+    return query(
+        """
+        SELECT contact, count(*) AS calls, sum(outgoing)::BIGINT AS outgoing,
+               (count(*) - sum(outgoing))::BIGINT AS incoming, sum(duration_s) AS total_duration_s,
+               min(start_time) AS first_call, max(start_time) AS last_call
+        FROM (
+            SELECT callee AS contact, 1 AS outgoing, duration_s, start_time FROM cdr WHERE caller_key = $key
+            UNION ALL
+            SELECT caller AS contact, 0 AS outgoing, duration_s, start_time FROM cdr WHERE callee_key = $key
+        )
+        GROUP BY contact ORDER BY calls DESC, total_duration_s DESC LIMIT $limit
+        """, {"key": number_key(number), "limit": limit}, kinds=("cdr",))
+
+
+def tower_calls(tower_id: Optional[str] = None, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> List[Dict]:
+    """Calls per tower (or for one tower) with distinct callers and talk time."""
+    return query(
+        """
+        SELECT tower_id, count(*) AS calls, count(DISTINCT caller_key) AS distinct_callers,
+               sum(duration_s) AS total_duration_s, min(start_time) AS first_call, max(start_time) AS last_call
+        FROM cdr
+        WHERE ($tower IS NULL OR upper(tower_id) = upper($tower))
+          AND ($start IS NULL OR start_time >= $start) AND ($end IS NULL OR start_time < $end)
+        GROUP BY tower_id ORDER BY calls DESC
+        """, {"tower": tower_id, "start": start, "end": end}, kinds=("cdr",))
+
+
+def tower_timeline(number: str, limit: int = 200) -> List[Dict]:
+    """Towers a number made or received calls through, in time order, consecutive calls on one tower merged."""
+    return query(
+        """
+        WITH calls AS (
+            SELECT tower_id, start_time, end_time FROM cdr WHERE caller_key = $key OR callee_key = $key
+        ), marked AS (
+            SELECT *, CASE WHEN tower_id = lag(tower_id) OVER (ORDER BY start_time) THEN 0 ELSE 1 END AS new_stay
+            FROM calls
+        ), stays AS (
+            SELECT *, sum(new_stay) OVER (ORDER BY start_time) AS stay FROM marked
+        )
+        SELECT tower_id, min(start_time) AS first_seen, max(end_time) AS last_seen, count(*) AS calls
+        FROM stays GROUP BY stay, tower_id ORDER BY first_seen LIMIT $limit
+        """, {"key": number_key(number), "limit": limit}, kinds=("cdr",))
+
+
+def session_overlap(number: Optional[str] = None, min_overlap_s: int = 0, limit: int = 50) -> List[Dict]:
+    """
+    Pairs of subscribers with IPDR sessions open at the same time. With a
+    number, only its sessions are joined (subscriber_a is that number).
+    """
+    return query(
+        """
+        WITH mine AS (SELECT * FROM ipdr WHERE $key IS NULL OR subscriber_key = $key)
+        SELECT a.subscriber AS subscriber_a, b.subscriber AS subscriber_b, count(*) AS overlapping_sessions,
+               sum(epoch(least(a.end_time, b.end_time)) - epoch(greatest(a.start_time, b.start_time))) AS overlap_s,
+               min(greatest(a.start_time, b.start_time)) AS first_overlap,
+               count(*) FILTER (WHERE a.apn = b.apn) AS same_apn
+        FROM mine a JOIN ipdr b
+          ON a.start_time < b.end_time AND b.start_time < a.end_time
+         AND (CASE WHEN $key IS NULL THEN a.subscriber_key < b.subscriber_key
+                   ELSE a.subscriber_key <> b.subscriber_key END)
+        GROUP BY subscriber_a, subscriber_b
+        HAVING overlap_s >= $min_overlap
+        ORDER BY overlap_s DESC LIMIT $limit
+        """, {"key": number_key(number) if number else None, "min_overlap": min_overlap_s, "limit": limit},
+        kinds=("ipdr",))
+
+
+def subscriber_sessions(number: str) -> List[Dict]:
+    return query(
+        """
+        SELECT apn, count(*) AS sessions, sum(bytes)::BIGINT AS bytes, min(start_time) AS first_session,
+               max(end_time) AS last_session
+        FROM ipdr WHERE subscriber_key = $key GROUP BY apn ORDER BY bytes DESC
+        """, {"key": number_key(number)}, kinds=("ipdr",))
+
+
+def get_stats() -> Dict[str, int]:
+    stats = {}
+    for kind in ("cdr", "ipdr"):
+        rows = query(f"SELECT count(*) AS n, count(DISTINCT source_file) AS files FROM {kind}", kinds=(kind,))
+        stats[f"{kind}_rows"] = rows[0]["n"] if rows else 0
+        stats[f"{kind}_files"] = rows[0]["files"] if rows else 0
+    return stats
@@ -1,9 +1,10 @@
-from vectorstore_model import add_to_vectorstore
+from app.model.embedding_model import EMBEDDING_DIM
+from app.model.vectorstore_model import add_to_vectorstore
 
 # Sample test: Add a dummy document
 add_to_vectorstore(
     doc_id="test-doc",
-    embedding=[0.1] * 768,  # Ensure this matches your embedding model's vector size
+    embedding=[0.1] * EMBEDDING_DIM,  # The store rejects vectors that don't match the embedding model
     metadata={"type": "test"},
     document_text="This is a sample test document for ChromaDB."
 )
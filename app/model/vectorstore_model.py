@@ -1,30 +1,444 @@
 import os
-from chromadb import Client
-from chromadb.config import Settings
-from typing import List, Dict
-from chromadb import PersistentClient
+import re
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional
 
+from app.model import lexical_index_model
+from app.model.embedding_model import EMBEDDING_DIM, EMBEDDING_MODEL_ID
+from app.model.roster_model import ROSTER_FILES
+
+logger = logging.getLogger(__name__)
+
+# "chroma" (persistent Chroma collections) or "mmap" (in-process NumPy matrix, see mmap_vectorstore_model)
+VECTORSTORE_BACKEND = os.getenv("VECTORSTORE_BACKEND", "chroma").lower()
 
 # Set absolute path for chroma_db folder relative to this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CHROMA_DB_DIR = os.path.join(BASE_DIR, "../../chroma_db")
+CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", os.path.join(BASE_DIR, "../../chroma_db"))
 CHROMA_DB_DIR = os.path.abspath(CHROMA_DB_DIR)
 
-print(f"📂 Chroma DB will be stored at: {CHROMA_DB_DIR}")
-os.makedirs(CHROMA_DB_DIR, exist_ok=True)  # Create folder if it doesn't exist
+# Opt-in per-write diagnostics; keep off for bulk ingestion
+VECTORSTORE_DEBUG = os.getenv("VECTORSTORE_DEBUG", "false").lower() == "true"
+DEFAULT_MAX_BATCH_SIZE = 5000
+
+# Values of the doc_type chunk metadata that searches filter on
+DOC_TYPES = ("chat", "roster", "cdr", "ipdr", "fir", "document")
+
+# One collection per doc_type ("documents_chat", ...); false keeps every chunk in "documents"
+VECTORSTORE_SHARDING = os.getenv("VECTORSTORE_SHARDING", "true").lower() == "true"
+# Chunks stored before sharding stay in "documents" and are still searched; true moves them into the shards at startup
+VECTORSTORE_MIGRATE_LEGACY = os.getenv("VECTORSTORE_MIGRATE_LEGACY", "false").lower() == "true"
+LEGACY_COLLECTION = "documents"
+# Threads searching shards at once; 1 searches them one after another
+# Searches skip empty shards; an empty one is recounted after this long, in case another worker wrote to it
+VECTORSTORE_EMPTY_RECHECK_SECONDS = float(os.getenv("VECTORSTORE_EMPTY_RECHECK_SECONDS", "5"))
+VECTORSTORE_SEARCH_WORKERS = int(os.getenv("VECTORSTORE_SEARCH_WORKERS", str(min(len(DOC_TYPES) + 1, os.cpu_count() or 1))))
+
+# HNSW graph settings (Chroma's defaults). M (max_neighbors) and ef_construction are fixed
+# when a shard is created; ef_search is applied on every start. Per-shard overrides:
+# HNSW_M_CHAT, HNSW_EF_CONSTRUCTION_ROSTER, HNSW_EF_SEARCH_CDR, ...
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+
+
+def hnsw_config(shard: str) -> Dict[str, int]:
+    suffix = shard.upper()
+    return {
+        "max_neighbors": int(os.getenv(f"HNSW_M_{suffix}", HNSW_M)),
+        "ef_construction": int(os.getenv(f"HNSW_EF_CONSTRUCTION_{suffix}", HNSW_EF_CONSTRUCTION)),
+        "ef_search": int(os.getenv(f"HNSW_EF_SEARCH_{suffix}", HNSW_EF_SEARCH)),
+    }
+
+
+def infer_doc_type(metadata: Dict) -> str:
+    """doc_type of a chunk from its type and source file name (CDR_Set1.xlsx -> "cdr")."""
+    if metadata.get("type") == "chat":
+        return "chat"
+    filename = os.path.basename(metadata.get("original_file") or "")
+    if filename in ROSTER_FILES:
+        return "roster"
+    prefix = re.match(r"[a-z]+", filename.lower())
+    if prefix and prefix.group(0) in DOC_TYPES:
+        return prefix.group(0)
+    return "document"
+
+
+def check_dimensions(embeddings: List[List[float]], dim: Optional[int] = EMBEDDING_DIM):
+    """Reject vectors that don't match the embedding model before they reach an index."""
+    for embedding in embeddings:
+        if dim and len(embedding) != dim:
+            raise ValueError(f"Embedding has {len(embedding)} dimensions; {EMBEDDING_MODEL_ID} produces {dim}")
+
+
+def query_result(hits: List[tuple], include_embeddings: bool = False) -> Dict:
+    """Shape (distance, id, document, metadata, embedding) hits like chromadb's collection.query output."""
+    results = {
+        "ids": [[hit[1] for hit in hits]],
+        "documents": [[hit[2] for hit in hits]],
+        "metadatas": [[hit[3] for hit in hits]],
+        "distances": [[hit[0] for hit in hits]],
+    }
+    if include_embeddings:
+        results["embeddings"] = [[hit[4] for hit in hits]]
+    return results
+
+
+class VectorStoreBackend(ABC):
+    """Storage and nearest-neighbour search for chunk embeddings, their text and metadata."""
+
+    name = "base"
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict], documents: List[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(self, embedding: List[float], top_k: int, include_embeddings: bool = False,
+              where: Optional[Dict] = None, where_document: Optional[Dict] = None) -> Dict:
+        """Nearest chunks by squared L2 distance, shaped like collection.query; Chroma filter syntax."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, ids: List[str], include_embeddings: bool = False) -> Dict:
+        """{"ids", "documents", "metadatas", "embeddings"} for the ids found, in the order requested."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_pages(self, page_size: int = 1000, include_documents: bool = False) -> Iterator[Dict]:
+        """Pages of {"ids", "metadatas"[, "documents"]} covering every stored chunk."""
+        raise NotImplementedError
+
+    def page(self, limit: int, offset: int) -> Dict:
+        docs = {"ids": [], "metadatas": []}
+        skipped = 0
+        for page in self.iter_pages(page_size=limit):
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                if skipped < offset:
+                    skipped += 1
+                elif len(docs["ids"]) < limit:
+                    docs["ids"].append(doc_id)
+                    docs["metadatas"].append(metadata)
+            if len(docs["ids"]) >= limit:
+                break
+        return docs
+
+    def max_batch_size(self) -> int:
+        return DEFAULT_MAX_BATCH_SIZE
+
+    def migrate_legacy(self) -> int:
+        return 0
+
+    def get_stats(self) -> Dict:
+        return {"backend": self.name, "chunks": self.count()}
+
+
+class ChromaBackend(VectorStoreBackend):
+    """
+    Persistent Chroma collections, one per doc_type, each with its own HNSW
+    settings. Searches fan out over the shards a filter can match.
+    """
+
+    name = "chroma"
+
+    def __init__(self, path: str = CHROMA_DB_DIR, sharded: bool = VECTORSTORE_SHARDING):
+        from chromadb import PersistentClient
+
+        print(f"📂 Chroma DB will be stored at: {path}")
+        os.makedirs(path, exist_ok=True)  # Create folder if it doesn't exist
+        # Initialize Chroma client with persistence
+        self.path = path
+        self.client = PersistentClient(path=path)
+        # The unsharded collection: every chunk when sharding is off, older chunks otherwise
+        self.collection = self.open_collection(LEGACY_COLLECTION, hnsw_config("legacy"))
+        self.shards = {doc_type: self.open_collection(f"{LEGACY_COLLECTION}_{doc_type}", hnsw_config(doc_type))
+                       for doc_type in DOC_TYPES} if sharded else {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # Collection name -> (holds chunks, when counted); set on upsert, dropped on delete
+        self._has_chunks: Dict[str, tuple] = {}
+
+    def open_collection(self, name: str, config: Dict[str, int]):
+        """Create a collection with the given HNSW settings, or retune ef_search on an existing one."""
+        created = self.client.get_or_create_collection(name=name, configuration={"hnsw": {"space": "l2", **config}})
+        current = (created.configuration or {}).get("hnsw") or {}
+        if current.get("ef_search") != config["ef_search"]:
+            created.modify(configuration={"hnsw": {"ef_search": config["ef_search"]}})
+        fixed = [key for key in ("max_neighbors", "ef_construction") if current.get(key) not in (None, config[key])]
+        if fixed:
+            logger.warning(f"Collection {name} was built with {', '.join(f'{k}={current[k]}' for k in fixed)}; "
+                           f"rebuild it to apply the configured values")
+        return created
+
+    def shard_for(self, metadata: Dict):
+        """Collection a chunk is written to."""
+        if not self.shards:
+            return self.collection
+        return self.shards.get(metadata.get("doc_type") or infer_doc_type(metadata), self.shards["document"])
+
+    def collections(self) -> List:
+        """Every collection holding chunks, shards first."""
+        return list(self.shards.values()) + [self.collection]
+
+    @staticmethod
+    def _doc_types_in(where: Optional[Dict]) -> Optional[List[str]]:
+        """
+        doc_types the doc_type conditions of a where filter (top level or in
+        its $and) allow, None when unrestricted. Those conditions are not sent
+        to the shards, so an operator that can't be mapped to shards is an error.
+        """
+        allowed = None
+        for condition in where.get("$and", [where]) if where else []:
+            if "doc_type" not in condition:
+                continue
+            value = condition["doc_type"]
+            for operator, operand in (value if isinstance(value, dict) else {"$eq": value}).items():
+                if operator == "$eq":
+                    matched = {operand}
+                elif operator == "$in":
+                    matched = set(operand)
+                elif operator == "$ne":
+                    matched = set(DOC_TYPES) - {operand}
+                elif operator == "$nin":
+                    matched = set(DOC_TYPES) - set(operand)
+                else:
+                    raise ValueError(f"Unsupported doc_type filter operator: {operator}")
+                allowed = matched if allowed is None else allowed & matched
+        return None if allowed is None else sorted(allowed)
+
+    @staticmethod
+    def _without_doc_type(where: Optional[Dict]) -> Optional[Dict]:
+        """The filter a shard still needs: its doc_type condition is implied by the shard itself."""
+        conditions = [c for c in (where.get("$and", [where]) if where else []) if "doc_type" not in c]
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def holds_chunks(self, target) -> bool:
+        """Whether a collection has chunks, counting it only when the cached answer may be stale."""
+        cached = self._has_chunks.get(target.name)
+        if cached and (cached[0] or time.monotonic() - cached[1] < VECTORSTORE_EMPTY_RECHECK_SECONDS):
+            return cached[0]
+        holds = target.count() > 0
+        self._has_chunks[target.name] = (holds, time.monotonic())
+        return holds
+
+    def search_targets(self, where: Optional[Dict]) -> List:
+        """Non-empty shards the filter can match, plus the legacy collection while it still holds chunks."""
+        doc_types = self._doc_types_in(where)
+        targets = [shard for doc_type, shard in self.shards.items()
+                   if (doc_types is None or doc_type in doc_types) and self.holds_chunks(shard)]
+        if not self.shards or self.holds_chunks(self.collection):
+            targets.append(self.collection)
+        return targets
+
+    def _fan_out(self, run, targets: List) -> List:
+        """run(collection) on every target in parallel, results in target order."""
+        if len(targets) <= 1 or VECTORSTORE_SEARCH_WORKERS <= 1:
+            return [run(target) for target in targets]
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=VECTORSTORE_SEARCH_WORKERS, thread_name_prefix="shard")
+        return list(self._pool.map(run, targets))
 
-# Initialize Chroma client with persistence
-client = PersistentClient(path=CHROMA_DB_DIR)
-# Create or get the collection
-collection = client.get_or_create_collection(name="documents")
+    def max_batch_size(self) -> int:
+        try:
+            return self.client.get_max_batch_size()
+        except Exception:
+            return DEFAULT_MAX_BATCH_SIZE
 
-def log_stored_documents():
+    def upsert(self, ids: List[str], embeddings: List, metadatas: List[Dict], documents: List[str]):
+        groups: Dict[str, tuple] = {}
+        for position, metadata in enumerate(metadatas):
+            target = self.shard_for(metadata)
+            groups.setdefault(target.name, (target, []))[1].append(position)
+        for target, positions in groups.values():
+            target.upsert(
+                ids=[ids[p] for p in positions],
+                embeddings=[embeddings[p] for p in positions],
+                metadatas=[metadatas[p] for p in positions],
+                documents=[documents[p] for p in positions]
+            )
+            self._has_chunks[target.name] = (True, time.monotonic())
+        # A file stored before sharding is being re-ingested: drop its old copies
+        if self.shards and self.holds_chunks(self.collection):
+            self.collection.delete(ids=ids)
+            self._has_chunks.pop(self.collection.name, None)
+
+    def query(self, embedding: List[float], top_k: int, include_embeddings: bool = False,
+              where: Optional[Dict] = None, where_document: Optional[Dict] = None) -> Dict:
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        shard_where = self._without_doc_type(where)
+
+        def run(target):
+            # A shard's doc_type filter would only force Chroma's slower filtered search
+            return target.query(query_embeddings=[embedding], n_results=top_k, include=include,
+                                where=(where if target is self.collection else shard_where) or None,
+                                where_document=where_document or None)
+
+        hits = []
+        for results in self._fan_out(run, self.search_targets(where)):
+            embeddings = results.get("embeddings") if include_embeddings else None
+            embeddings = embeddings[0] if embeddings is not None and len(embeddings) else None
+            if embeddings is None:
+                embeddings = [None] * len(results["ids"][0])
+            hits.extend(zip(results["distances"][0], results["ids"][0], results["documents"][0],
+                            results["metadatas"][0], embeddings))
+        return query_result(sorted(hits, key=lambda hit: hit[0])[:top_k], include_embeddings)
+
+    def get(self, ids: List[str], include_embeddings: bool = False) -> Dict:
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        found = self._fan_out(lambda target: target.get(ids=ids, include=include), self.search_targets(None))
+        by_id = {}
+        for part in found:
+            found_ids = part.get("ids", [])
+            embeddings = part.get("embeddings")
+            if embeddings is None:
+                embeddings = [None] * len(found_ids)
+            for doc_id, doc, meta, emb in zip(found_ids, part.get("documents", []), part.get("metadatas", []),
+                                              embeddings):
+                by_id.setdefault(doc_id, (doc, meta, emb))
+        ordered = [doc_id for doc_id in ids if doc_id in by_id]
+        return {
+            "ids": ordered,
+            "documents": [by_id[doc_id][0] for doc_id in ordered],
+            "metadatas": [by_id[doc_id][1] for doc_id in ordered],
+            "embeddings": [by_id[doc_id][2] for doc_id in ordered],
+        }
+
+    def delete(self, ids: List[str]):
+        for target in self.collections():
+            target.delete(ids=ids)
+            # May have removed the last chunk: recount on the next search
+            self._has_chunks.pop(target.name, None)
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        # Only unsharded chunks are retagged in place; shards hold their doc_type from the start
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def count(self) -> int:
+        return sum(target.count() for target in self.collections())
+
+    def iter_pages(self, page_size: int = 1000, include_documents: bool = False) -> Iterator[Dict]:
+        include = ["metadatas"] + (["documents"] if include_documents else [])
+        for target in self.collections():
+            offset = 0
+            while True:
+                page = target.get(limit=page_size, offset=offset, include=include)
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+                yield page
+
+    def page(self, limit: int, offset: int) -> Dict:
+        docs = {"ids": [], "metadatas": []}
+        skip = offset
+        for target in self.collections():
+            if len(docs["ids"]) >= limit:
+                break
+            size = target.count()
+            if skip >= size:
+                skip -= size
+                continue
+            page = target.get(limit=limit - len(docs["ids"]), offset=skip, include=["metadatas"])
+            docs["ids"] += page["ids"]
+            docs["metadatas"] += page["metadatas"]
+            skip = 0
+        return docs
+
+    def migrate_legacy(self, page_size: int = 500) -> int:
+        """Move chunks from the unsharded collection into their shards."""
+        if not self.shards:
+            return 0
+        moved = 0
+        while True:
+            # Always the first page: moved chunks are deleted from the legacy collection
+            page = self.collection.get(limit=page_size, include=["documents", "metadatas", "embeddings"])
+            if not page["ids"]:
+                break
+            metadatas = [{**metadata, "doc_type": metadata.get("doc_type") or infer_doc_type(metadata)}
+                         for metadata in page["metadatas"]]
+            self.upsert(page["ids"], page["embeddings"], metadatas, page["documents"])
+            moved += len(page["ids"])
+        if moved:
+            print(f"✅ Moved {moved} chunks from {LEGACY_COLLECTION} into per-source shards")
+        return moved
+
+    def get_stats(self) -> Dict:
+        collections = {}
+        for target in self.collections():
+            hnsw = (target.configuration or {}).get("hnsw") or {}
+            collections[target.name] = {"chunks": target.count(),
+                                        **{key: hnsw.get(key) for key in ("max_neighbors", "ef_construction",
+                                                                          "ef_search")}}
+        return {"backend": self.name, "sharded": bool(self.shards), "collections": collections}
+
+
+_backend: Optional[VectorStoreBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_backend() -> VectorStoreBackend:
+    if VECTORSTORE_BACKEND == "mmap":
+        from app.model.mmap_vectorstore_model import MmapVectorStore
+
+        return MmapVectorStore(dim=EMBEDDING_DIM)
+    if VECTORSTORE_BACKEND != "chroma":
+        raise ValueError(f"Unknown VECTORSTORE_BACKEND: {VECTORSTORE_BACKEND}")
+    return ChromaBackend()
+
+
+def get_backend() -> VectorStoreBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend: Optional[VectorStoreBackend]):
+    """Swap the store (benchmarks, tests); None goes back to the configured one on next use."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def get_max_batch_size() -> int:
+    return get_backend().max_batch_size()
+
+
+def count() -> int:
+    return get_backend().count()
+
+
+def log_stored_documents(limit: int = 100, offset: int = 0) -> Dict:
+    """Print and return one page of stored document ids and metadata."""
     try:
-        docs = collection.get()
-        print("✅ Stored Document IDs:", docs.get("ids", []))
+        docs = get_backend().page(limit, offset)
+        print(f"✅ Stored Document IDs [{offset}:{offset + limit}] of {count()}:", docs.get("ids", []))
         print("🧠 Metadata:", docs.get("metadatas", []))
+        return docs
     except Exception as e:
         print("⚠️ Failed to retrieve stored documents:", e)
+        return {}
 
 def add_to_vectorstore(
     doc_id: str,
@@ -33,22 +447,115 @@ def add_to_vectorstore(
     document_text: str = ""
 ):
     try:
-        collection.add(
-            ids=[doc_id],
-            embeddings=[embedding],
-            metadatas=[metadata],
-            documents=[document_text]
-        )
-        print(f"✅ Added to ChromaDB: {doc_id}")
-        log_stored_documents()
+        check_dimensions([embedding])
+        metadata = {**metadata, "doc_type": metadata.get("doc_type") or infer_doc_type(metadata)}
+        get_backend().upsert([doc_id], [embedding], [metadata], [document_text])
+        lexical_index_model.index_documents([doc_id], [document_text], [metadata])
+        print(f"✅ Added to vector store: {doc_id}")
+        if VECTORSTORE_DEBUG:
+            log_stored_documents(limit=10)
     except Exception as e:
-        print(f"❌ Failed to add {doc_id} to ChromaDB:", e)
+        print(f"❌ Failed to add {doc_id} to vector store:", e)
+
+def add_many_to_vectorstore(
+    ids: List[str],
+    embeddings: List[List[float]],
+    metadatas: List[Dict],
+    documents: List[str],
+    batch_size: Optional[int] = None
+) -> List[Dict]:
+    """
+    Upsert chunks in batches no larger than the store's max batch size.
+    Returns one {"ids": [...], "error": str} entry per failed batch.
+    """
+    backend = get_backend()
+    batch_size = min(batch_size or backend.max_batch_size(), backend.max_batch_size())
+    failures = []
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        try:
+            check_dimensions(embeddings[start:end])
+            backend.upsert(ids[start:end], embeddings[start:end], metadatas[start:end], documents[start:end])
+            # Keep the BM25 index in step with the collection
+            lexical_index_model.index_documents(ids[start:end], documents[start:end], metadatas[start:end])
+        except Exception as e:
+            print(f"❌ Failed to upsert batch {start}-{end} to the vector store:", e)
+            failures.append({"ids": ids[start:end], "error": str(e)})
+    print(f"✅ Upserted {len(ids) - sum(len(f['ids']) for f in failures)} chunks to the vector store")
+    if VECTORSTORE_DEBUG:
+        log_stored_documents(limit=10)
+    return failures
 
-def search_vectorstore(query_embedding: List[float], top_k: int = 5):
+def search_vectorstore(query_embedding: List[float], top_k: int = 5, include_embeddings: bool = False,
+                       where: Optional[Dict] = None, where_document: Optional[Dict] = None):
+    """Nearest chunks; where / where_document are Chroma-style filters applied inside the index search."""
     try:
-        results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
-        print("🔍 Query Results:", results)
+        check_dimensions([query_embedding])
+        results = get_backend().query(query_embedding, top_k, include_embeddings=include_embeddings,
+                                      where=where, where_document=where_document)
+        if VECTORSTORE_DEBUG:
+            print("🔍 Query Results:", results)
         return results
     except Exception as e:
         print("❌ Vector search failed:", e)
         return {}
+
+def get_from_vectorstore(ids: List[str], include_embeddings: bool = False) -> Dict:
+    """Fetch stored chunks by id, returned in the order requested."""
+    try:
+        return get_backend().get(ids, include_embeddings=include_embeddings)
+    except Exception as e:
+        print("❌ Failed to fetch chunks from the vector store:", e)
+        return {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+
+def delete_from_vectorstore(ids: List[str]):
+    try:
+        backend = get_backend()
+        batch_size = backend.max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            backend.delete(ids[start:start + batch_size])
+            lexical_index_model.delete_documents(ids[start:start + batch_size])
+        print(f"🗑️ Deleted {len(ids)} chunks from the vector store")
+    except Exception as e:
+        print("❌ Failed to delete chunks from the vector store:", e)
+        raise
+
+def get_stats() -> Dict:
+    return get_backend().get_stats()
+
+def backfill_lexical_index(page_size: int = 1000) -> int:
+    """Index chunks stored before the BM25 index existed; no-op once it is populated."""
+    if lexical_index_model.get_stats()["documents"] or not count():
+        return 0
+    indexed = 0
+    for page in get_backend().iter_pages(page_size, include_documents=True):
+        lexical_index_model.index_documents(page["ids"], page["documents"], page["metadatas"])
+        indexed += len(page["ids"])
+    print(f"✅ Backfilled BM25 index with {indexed} chunks")
+    return indexed
+
+
+def backfill_doc_types(page_size: int = 1000) -> int:
+    """Tag chunks stored before doc_type existed, in the vector store and the BM25 filter columns."""
+    if not lexical_index_model.get_stats()["untyped"]:
+        return 0
+    backend = get_backend()
+    updated = 0
+    for page in backend.iter_pages(page_size):
+        stale = [(doc_id, {**metadata, "doc_type": infer_doc_type(metadata)})
+                 for doc_id, metadata in zip(page["ids"], page["metadatas"]) if "doc_type" not in (metadata or {})]
+        if stale:
+            ids, metadatas = [doc_id for doc_id, _ in stale], [metadata for _, metadata in stale]
+            backend.update_metadatas(ids, metadatas)
+            lexical_index_model.update_filter_fields(ids, metadatas)
+            updated += len(stale)
+    if updated:
+        print(f"✅ Tagged {updated} chunks with doc_type")
+    return updated
+
+
+def migrate_legacy_collection() -> int:
+    """Move chunks stored before sharding into their shards (VECTORSTORE_MIGRATE_LEGACY)."""
+    if not VECTORSTORE_MIGRATE_LEGACY:
+        return 0
+    return get_backend().migrate_legacy()
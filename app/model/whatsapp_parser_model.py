@@ -0,0 +1,157 @@
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+# Android: "12/06/2025, 10:15 - Sender: text"  /  "6/12/25, 9:05 pm - Sender: text"
+ANDROID_LINE = re.compile(
+    r"^(?P<date>\d{1,2}[/.\-]\d{1,2}[/.\-]\d{2,4}),?\s+"
+    r"(?P<time>\d{1,2}:\d{2}(?::\d{2})?(?:\s?[APap]\.?[Mm]\.?)?)\s+[-–]\s+"
+    r"(?P<rest>.*)$"
+)
+# iOS: "[12/06/2025, 10:15:32] Sender: text"  /  "[6/12/25, 9:05:11 PM] Sender: text"
+IOS_LINE = re.compile(
+    r"^\[(?P<date>\d{1,2}[/.\-]\d{1,2}[/.\-]\d{2,4}),?\s+"
+    r"(?P<time>\d{1,2}:\d{2}(?::\d{2})?(?:\s?[APap]\.?[Mm]\.?)?)\]\s+"
+    r"(?P<rest>.*)$"
+)
+# WhatsApp sprinkles direction / no-break marks around iOS lines
+INVISIBLE_MARKS = "\u200e\u200f\u202a\u202c\ufeff"
+
+
+@dataclass
+class ChatMessage:
+    timestamp: Optional[datetime]
+    sender: Optional[str]  # None for system lines ("Messages are end-to-end encrypted")
+    text: str
+    line_offset: int  # 0-based line where the message starts
+
+
+@dataclass
+class ChatChunk:
+    text: str
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    first_line: int
+    last_line: int
+    message_count: int
+    senders: List[str] = field(default_factory=list)
+
+
+def _parse_timestamp(date_str: str, time_str: str, dayfirst: bool) -> Optional[datetime]:
+    first, second, year = re.split(r"[/.\-]", date_str)
+    if len(year) == 2:
+        year = "20" + year
+    day, month = (first, second) if dayfirst else (second, first)
+    if int(month) > 12:  # export is the other way round
+        day, month = month, day
+
+    time_str = time_str.replace(".", "").replace("\u202f", " ").replace("\u00a0", " ").strip().upper()
+    meridiem = time_str[-2:] if time_str.endswith(("AM", "PM")) else ""
+    clock = time_str[:-2].strip() if meridiem else time_str
+    parts = [int(p) for p in clock.split(":")]
+    hour, minute = parts[0], parts[1]
+    second_ = parts[2] if len(parts) > 2 else 0
+    if meridiem == "PM" and hour != 12:
+        hour += 12
+    elif meridiem == "AM" and hour == 12:
+        hour = 0
+    try:
+        return datetime(int(year), int(month), int(day), hour, minute, second_)
+    except ValueError:
+        return None
+
+
+def _match_header(line: str):
+    return IOS_LINE.match(line) or ANDROID_LINE.match(line)
+
+
+def iter_messages(lines: Iterable[str], dayfirst: bool = True) -> Iterator[ChatMessage]:
+    """
+    Yield messages from WhatsApp export lines (Android or iOS format).
+    Lines that don't start a new message are appended to the previous one.
+    """
+    current: Optional[ChatMessage] = None
+    for line_no, raw in enumerate(lines):
+        line = raw.rstrip("\r\n").strip(INVISIBLE_MARKS)
+        match = _match_header(line)
+        if match is None:
+            if current is not None:
+                current.text += "\n" + line
+            continue
+
+        if current is not None:
+            yield current
+        rest = match.group("rest").strip(INVISIBLE_MARKS)
+        sender, sep, text = rest.partition(": ")
+        if not sep:
+            sender, text = None, rest
+        current = ChatMessage(
+            timestamp=_parse_timestamp(match.group("date"), match.group("time"), dayfirst),
+            sender=sender.strip(INVISIBLE_MARKS) if sender else None,
+            text=text,
+            line_offset=line_no,
+        )
+    if current is not None:
+        yield current
+
+
+def parse_chat_file(file_path: str, dayfirst: bool = True) -> Iterator[ChatMessage]:
+    """Stream messages from an export on disk in constant memory."""
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        yield from iter_messages(f, dayfirst=dayfirst)
+
+
+def is_whatsapp_export(file_path: str, probe_lines: int = 20) -> bool:
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for i, line in enumerate(f):
+            if i >= probe_lines:
+                break
+            if _match_header(line.strip().strip(INVISIBLE_MARKS)):
+                return True
+    return False
+
+
+def format_message(message: ChatMessage) -> str:
+    stamp = message.timestamp.strftime("%Y-%m-%d %H:%M") if message.timestamp else "unknown time"
+    if message.sender:
+        return f"[{stamp}] {message.sender}: {message.text}"
+    return f"[{stamp}] {message.text}"
+
+
+def _build_chunk(window: List[ChatMessage]) -> ChatChunk:
+    times = [m.timestamp for m in window if m.timestamp]
+    senders = list(dict.fromkeys(m.sender for m in window if m.sender))
+    last = window[-1]
+    return ChatChunk(
+        text="\n".join(format_message(m) for m in window),
+        start_time=min(times) if times else None,
+        end_time=max(times) if times else None,
+        first_line=window[0].line_offset,
+        last_line=last.line_offset + last.text.count("\n"),
+        message_count=len(window),
+        senders=senders,
+    )
+
+
+def chunk_messages(messages: Iterable[ChatMessage], window: int = 20, overlap: int = 5) -> Iterator[ChatChunk]:
+    """
+    Group messages into windows of `window` messages, each sharing
+    `overlap` messages with the previous one. Holds one window in memory.
+    """
+    if window <= 0 or not 0 <= overlap < window:
+        raise ValueError("window must be positive and 0 <= overlap < window")
+
+    buffer: deque = deque()
+    fresh = 0  # messages in the buffer not yet emitted in any chunk
+    for message in messages:
+        buffer.append(message)
+        fresh += 1
+        if len(buffer) == window:
+            yield _build_chunk(list(buffer))
+            for _ in range(window - overlap):
+                buffer.popleft()
+            fresh = 0
+    if fresh:
+        yield _build_chunk(list(buffer))
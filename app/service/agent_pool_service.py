@@ -0,0 +1,153 @@
+# app/service/agent_pool_service.py
+
+import os
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+# Agent calls (boto3, Chroma, LangChain) are blocking; they run on this many
+# threads so the event loop stays free. Up to AGENT_QUEUE_LIMIT more requests
+# may wait for a thread; beyond that requests are refused with 503.
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "16"))
+AGENT_QUEUE_LIMIT = int(os.getenv("AGENT_QUEUE_LIMIT", "64"))
+
+_DONE = object()
+
+
+class AgentPoolBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class AgentPool:
+    """
+    Bounded thread pool for the blocking agent controllers with admission
+    control: a request holds a slot from admission until its answer (or its
+    last streamed token) is produced.
+    """
+
+    def __init__(self, workers: int = AGENT_WORKERS, queue_limit: int = AGENT_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent")
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "rejected": 0, "completed": 0, "failed": 0, "in_flight": 0}
+
+    def _admit(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise AgentPoolBusy(f"{self.workers} agent workers busy and {self.queue_limit} requests waiting")
+        with self._lock:
+            self.stats["admitted"] += 1
+            self.stats["in_flight"] += 1
+
+    def _release(self, ok: bool):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+            self.stats["completed" if ok else "failed"] += 1
+        self._slots.release()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run a blocking call on the pool; raises AgentPoolBusy when full."""
+        self._admit()
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+            ok = True
+            return result
+        finally:
+            self._release(ok)
+
+    def stream(self, fn: Callable, *args, **kwargs) -> "PooledStream":
+        """
+        Admit now (raising AgentPoolBusy when full) and return an async
+        iterator that pulls each item of the blocking generator on the pool.
+        """
+        self._admit()
+        return PooledStream(self, fn, args, kwargs)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "workers": self.workers, "queue_limit": self.queue_limit}
+
+
+class PooledStream:
+    """
+    Async iterator over a blocking generator run on an AgentPool. It holds
+    the pool slot taken at admission until it is exhausted, fails, is
+    cancelled or closed, or is garbage-collected without ever being
+    iterated (a client gone before the response started). Closing it also
+    closes the blocking generator, once any item being produced is done.
+    """
+
+    def __init__(self, pool: AgentPool, fn: Callable, args, kwargs):
+        self._pool = pool
+        self._start = lambda: iter(fn(*args, **kwargs))
+        self._iterator = None
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise StopAsyncIteration
+        try:
+            if self._iterator is None:
+                self._iterator = await self._on_pool(self._start)
+            item = await self._on_pool(next, self._iterator, _DONE)
+        except BaseException:
+            # Errors and cancellation (client disconnects) alike
+            self._finish(ok=False)
+            raise
+        if item is _DONE:
+            self._finish(ok=True)
+            raise StopAsyncIteration
+        return item
+
+    async def _on_pool(self, fn: Callable, *args):
+        # Kept so a close can wait for the call still running on the worker thread
+        self._pending = self._pool.executor.submit(fn, *args)
+        return await asyncio.wrap_future(self._pending)
+
+    async def aclose(self):
+        self._finish(ok=False)
+
+    def __del__(self):
+        self._finish(ok=False)
+
+    def _finish(self, ok: bool):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        iterator, pending = self._iterator, self._pending
+        if ok or iterator is None or not hasattr(iterator, "close"):
+            self._pool._release(ok)
+            return
+
+        def close(_=None):
+            try:
+                iterator.close()
+            except Exception:
+                pass
+            finally:
+                self._pool._release(False)
+
+        # A generator can't be closed while a worker is inside next(); close it right after
+        if pending is not None and not pending.done():
+            pending.add_done_callback(close)
+            return
+        try:
+            # Its cleanup may block, so not on the event loop
+            self._pool.executor.submit(close)
+        except RuntimeError:  # executor already shut down
+            close()
+
+
+agent_pool = AgentPool()
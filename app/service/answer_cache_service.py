@@ -0,0 +1,115 @@
+# app/service/answer_cache_service.py
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.model.embedding_cache_model import normalize_text
+from app.model.local_store_model import local_path
+
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "900"))
+ANSWER_CACHE_MAX_ITEMS = int(os.getenv("ANSWER_CACHE_MAX_ITEMS", "1024"))
+
+# Touched whenever ingestion changes the collection; shared by all uvicorn workers
+VERSION_MARKER = "collection.version"
+
+
+def bump_collection_version():
+    with open(local_path(VERSION_MARKER), "w") as f:
+        f.write(f"{time.time_ns()}-{os.getpid()}")
+
+
+def collection_version() -> str:
+    try:
+        with open(local_path(VERSION_MARKER)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+class AnswerCache:
+    """
+    TTL + LRU cache of agent answers keyed by agent, normalized query and
+    the ids of the retrieved chunks. Entries written before the last
+    collection change are treated as misses.
+    """
+
+    def __init__(self, ttl: float = ANSWER_CACHE_TTL_SECONDS, max_items: int = ANSWER_CACHE_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0,
+                      "stale_writes": 0}
+        self.agent_stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(agent: str, query: str, chunk_ids: List[str], extra: str = "") -> str:
+        raw = "\x00".join([agent, normalize_text(query).lower(), ",".join(sorted(chunk_ids)), extra])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, agent: str, outcome: str):
+        self.stats[outcome] += 1
+        counters = self.agent_stats.setdefault(agent, {"hits": 0, "misses": 0})
+        counters["hits" if outcome == "hits" else "misses"] += 1
+
+    def get(self, agent: str, query: str, chunk_ids: List[str], extra: str = "") -> Optional[str]:
+        key = self.make_key(agent, query, chunk_ids, extra)
+        version = collection_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count(agent, "misses")
+                return None
+            answer, stored_at, stored_version = entry
+            if stored_version != version or time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self._count(agent, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(agent, "hits")
+            return answer
+
+    def put(self, agent: str, query: str, chunk_ids: List[str], answer: str, extra: str = "",
+            version: Optional[str] = None):
+        """
+        Store an answer under `version`, the collection_version() read before
+        retrieval; skipped when an ingest has changed the collection since.
+        """
+        key = self.make_key(agent, query, chunk_ids, extra)
+        current = collection_version()
+        with self._lock:
+            if version is not None and version != current:
+                self.stats["stale_writes"] += 1
+                return
+            self._entries[key] = (answer, time.time(), current)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self):
+        """Drop every entry here and mark other workers' entries stale."""
+        bump_collection_version()
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "capacity": self.max_items,
+                "ttl_seconds": self.ttl,
+                "by_agent": {agent: dict(counts) for agent, counts in self.agent_stats.items()},
+            }
+
+
+answer_cache = AnswerCache()
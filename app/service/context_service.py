@@ -0,0 +1,214 @@
+# app/service/context_service.py
+
+import os
+import re
+import math
+import logging
+import threading
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from app.model.chunker_model import count_tokens
+from app.model.embedding_cache_model import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Input-token budget for the document context of each agent's prompt
+CONTEXT_TOKEN_BUDGETS = {
+    "Chat Agent": int(os.getenv("CONTEXT_BUDGET_CHAT", "3000")),
+    "Task Agent": int(os.getenv("CONTEXT_BUDGET_TASK", "3000")),
+    "User Agent": int(os.getenv("CONTEXT_BUDGET_USER", "4000")),
+}
+CONTEXT_DEFAULT_BUDGET = int(os.getenv("CONTEXT_BUDGET_DEFAULT", "3000"))
+# No single chunk may take more than this, so one oversized chunk can't crowd out the rest
+CONTEXT_MAX_CHUNK_TOKENS = int(os.getenv("CONTEXT_MAX_CHUNK_TOKENS", "1024"))
+# Chunks retrieved per chunk finally packed, leaving room for dedup and MMR
+CONTEXT_CANDIDATE_MULTIPLIER = int(os.getenv("CONTEXT_CANDIDATE_MULTIPLIER", "3"))
+
+# A chunk whose word 5-shingles are this much contained in an earlier chunk is dropped
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 5
+# MMR trade-off between relevance (1.0) and diversity (0.0)
+MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Below this many tokens left, a partial chunk is not worth adding
+MIN_PARTIAL_TOKENS = 64
+
+SEPARATOR = "\n\n---\n\n"
+
+
+@dataclass
+class PackedContext:
+    text: str
+    chunk_ids: List[str] = field(default_factory=list)
+    tokens: int = 0
+    candidates: int = 0
+    duplicates: int = 0
+    truncated: int = 0
+
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    words = re.findall(r"\w+", normalize_text(text).lower())
+    if len(words) <= size:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def containment(a: Set[int], b: Set[int]) -> float:
+    """Share of the smaller shingle set found in the other; catches chunks nested in others."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def mmr_order(count: int, similarity, limit: int, lambda_: float = MMR_LAMBDA) -> List[int]:
+    """
+    Maximal marginal relevance over candidates already sorted best first;
+    relevance is taken from that rank since fused RRF scores aren't comparable.
+    """
+    relevance = [1.0 - i / count for i in range(count)]
+    selected: List[int] = []
+    remaining = list(range(count))
+    while remaining and len(selected) < limit:
+        best = max(remaining, key=lambda i: lambda_ * relevance[i] - (1 - lambda_) * max(
+            (similarity(i, j) for j in selected), default=0.0))
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def source_tag(metadata: Dict) -> str:
+    """Tag header naming the source file and chunk the text came from."""
+    parts = [f"Document Type: {metadata.get('type', 'Unknown')}",
+             f"Source: {metadata.get('original_file', 'N/A')}"]
+    if "chunk_index" in metadata:
+        total = metadata.get("total_chunks")
+        parts.append(f"Chunk: {metadata['chunk_index'] + 1}/{total}" if total else f"Chunk: {metadata['chunk_index'] + 1}")
+    if metadata.get("first_line") is not None:
+        parts.append(f"Lines: {metadata['first_line']}-{metadata.get('last_line')}")
+    if metadata.get("start_time"):
+        parts.append(f"From: {metadata['start_time']} To: {metadata.get('end_time')}")
+    return f"({', '.join(parts)})"
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep whole lines while they fit; a first line that doesn't fit is cut on words."""
+    kept, used = [], 0
+    for line in text.split("\n"):
+        tokens = count_tokens(line) + 1
+        if used + tokens > max_tokens:
+            if not kept:
+                words, line_used = [], 0
+                for word in line.split(" "):
+                    line_used += count_tokens(word) + 1
+                    if line_used > max_tokens:
+                        break
+                    words.append(word)
+                kept.append(" ".join(words))
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept)
+
+
+def build_context(search_results: Dict, agent_name: str, top_k: int = 5,
+                  budget: Optional[int] = None) -> PackedContext:
+    """
+    Turn Chroma-shaped search results into the prompt's document context:
+    drop near-duplicate chunks, order by MMR, skip lines already included
+    (overlapping windows, repeated forwards) and trim to the agent's budget.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGETS.get(agent_name, CONTEXT_DEFAULT_BUDGET)
+    ids = search_results.get("ids", [[]])[0]
+    documents = search_results.get("documents", [[]])[0]
+    metadatas = search_results.get("metadatas", [[]])[0]
+    embeddings = (search_results.get("embeddings") or [[None] * len(ids)])[0]
+
+    # 1. Near-duplicate suppression, best ranked copy wins
+    kept, kept_shingles, duplicates = [], [], 0
+    for i, doc in enumerate(documents):
+        doc_shingles = shingles(doc or "")
+        if not doc_shingles or any(containment(doc_shingles, other) >= NEAR_DUPLICATE_THRESHOLD
+                                   for other in kept_shingles):
+            duplicates += 1
+            continue
+        kept.append(i)
+        kept_shingles.append(doc_shingles)
+
+    # 2. MMR over the survivors; embedding cosine when available, shingle overlap otherwise
+    @lru_cache(maxsize=None)
+    def similarity(a: int, b: int) -> float:
+        ea, eb = embeddings[kept[a]], embeddings[kept[b]]
+        if ea is not None and eb is not None:
+            return cosine(ea, eb)
+        return jaccard(kept_shingles[a], kept_shingles[b])
+
+    order = [kept[i] for i in mmr_order(len(kept), similarity, top_k)]
+
+    # 3. Pack within the budget, skipping lines an earlier block already carries
+    blocks, chunk_ids, seen_lines, used, truncated = [], [], set(), 0, 0
+    for i in order:
+        tag = source_tag(metadatas[i] or {})
+        lines, chunk_lines = [], set()
+        for line in documents[i].strip().split("\n"):
+            key = normalize_text(line).lower()
+            if key and (key in seen_lines or key in chunk_lines):
+                continue
+            chunk_lines.add(key)
+            lines.append(line)
+        body = "\n".join(lines).strip()
+        if not body:
+            duplicates += 1
+            continue
+
+        tag_tokens = count_tokens(tag) + count_tokens(SEPARATOR)
+        room = min(CONTEXT_MAX_CHUNK_TOKENS, budget - used - tag_tokens)
+        if room < MIN_PARTIAL_TOKENS:
+            break
+        if count_tokens(body) > room:
+            body = trim_to_tokens(body, room) + "\n[...truncated]"
+            truncated += 1
+        seen_lines.update(normalize_text(line).lower() for line in body.split("\n"))
+        blocks.append(f"{tag}\n{body}")
+        chunk_ids.append(ids[i])
+        used += tag_tokens + count_tokens(body)
+
+    packed = PackedContext(text=SEPARATOR.join(blocks), chunk_ids=chunk_ids, tokens=used,
+                           candidates=len(documents), duplicates=duplicates, truncated=truncated)
+    logger.info(f"{agent_name} context: {len(chunk_ids)}/{len(documents)} chunks, ~{used} tokens "
+                f"(budget {budget}, {duplicates} duplicates, {truncated} truncated)")
+    with _lock:
+        stats = _stats.setdefault(agent_name, {"queries": 0, "candidates": 0, "packed": 0,
+                                               "duplicates": 0, "truncated": 0, "tokens": 0})
+        stats["queries"] += 1
+        stats["candidates"] += packed.candidates
+        stats["packed"] += len(chunk_ids)
+        stats["duplicates"] += duplicates
+        stats["truncated"] += truncated
+        stats["tokens"] += used
+    return packed
+
+
+def get_context_stats() -> Dict[str, Dict]:
+    """Per-agent context packing counters, with average prompt context tokens."""
+    with _lock:
+        return {
+            agent: {**stats, "avg_tokens": round(stats["tokens"] / stats["queries"], 1) if stats["queries"] else 0.0}
+            for agent, stats in _stats.items()
+        }
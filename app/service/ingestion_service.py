@@ -0,0 +1,490 @@
+# app/service/ingestion_service.py
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.ingestion.uploader import upload_file_to_s3
+from app.model.local_store_model import connect
+from app.model.text_extractor_model import extract_pdf_text, extract_word_text, extract_excel_text, iter_pdf_pages
+from app.model.embedding_model import EMBEDDING_MODEL_ID, EMBEDDING_SOURCE_ID, get_embeddings
+from app.model.vectorstore_model import add_many_to_vectorstore, delete_from_vectorstore, infer_doc_type
+from app.model import manifest_model, task_index_model
+from app.model.metadata_model import save_metadata
+from app.model.roster_model import load_roster_file
+from app.model.telecom_store_model import load_telecom_file
+from app.service.answer_cache_service import answer_cache
+from app.service.task_extraction_service import extract_chat_tasks, retry_failed_extractions
+from app.model.chunker_model import chunk_budget, chunk_document, chunk_stream, count_tokens
+from app.model.whatsapp_parser_model import ChatChunk, is_whatsapp_export, parse_chat_file, chunk_messages
+
+logger = logging.getLogger(__name__)
+
+# Files processed in parallel, and chunks embedded/stored per progress step
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+# WhatsApp exports are chunked into windows of N messages sharing an overlap
+CHAT_WINDOW_MESSAGES = int(os.getenv("CHAT_WINDOW_MESSAGES", "20"))
+CHAT_WINDOW_OVERLAP = int(os.getenv("CHAT_WINDOW_OVERLAP", "5"))
+
+# CDR/IPDR rows go to the columnar telecom store; set true to also embed them as text
+TELECOM_EMBED_ROWS = os.getenv("TELECOM_EMBED_ROWS", "false").lower() == "true"
+
+# Archive ingested originals to S3 under their content hash (off by default so ingest works offline)
+S3_UPLOAD_ENABLED = os.getenv("S3_UPLOAD_ENABLED", "false").lower() == "true"
+
+SUPPORTED_EXTENSIONS = (".json", ".txt", ".pdf", ".docx", ".xlsx")
+
+# Ingested files live at DATASET_DIR/<filename> (rosters are reloaded from there at startup);
+# uploads wait under UPLOAD_DIR/<upload id>/ so a re-upload never rewrites a file being read
+DATASET_DIR = "dataset"
+UPLOAD_DIR = os.path.join(DATASET_DIR, "uploads")
+
+
+def extract_json_text(file_bytes):
+    """Extract text from JSON file bytes."""
+    try:
+        data = json.loads(file_bytes.decode('utf-8'))
+        return json.dumps(data, indent=2)  # Convert JSON to string
+    except Exception as e:
+        logger.error(f"Error extracting JSON text: {str(e)}")
+        return ""
+
+def extract_txt_text(file_path):
+    """Extract text from text file."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except Exception as e:
+        logger.error(f"Error extracting text from {file_path}: {str(e)}")
+        return ""
+
+def extract_file_text(filename: str, file_path: str) -> str:
+    """Extract text based on file type."""
+    if filename.endswith(".json"):
+        with open(file_path, "rb") as f:
+            return extract_json_text(f.read())
+    elif filename.endswith(".txt"):
+        return extract_txt_text(file_path)
+    elif filename.endswith(".pdf"):
+        return extract_pdf_text(file_path)
+    elif filename.endswith(".docx"):
+        return extract_word_text(file_path)
+    elif filename.endswith(".xlsx"):
+        return extract_excel_text(file_path)
+    raise ValueError("Unsupported file type")
+
+
+class JobStore:
+    """
+    Persistent job / file / chunk progress for background ingestion.
+    A chunk marked done is never re-embedded when a job is resumed.
+    """
+
+    def __init__(self, db_name: str = "ingestion_jobs.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = connect(db_name)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                chunks_total INTEGER,
+                chunks_done INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, filename)
+            );
+            CREATE TABLE IF NOT EXISTS job_chunks (
+                job_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                PRIMARY KEY (job_id, filename, chunk_index)
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_files_status ON job_files(status);
+            """
+        )
+        self._conn.commit()
+
+    def create_job(self, files: List[Tuple[str, str]]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT INTO jobs VALUES (?, 'queued', ?, ?)", (job_id, now, now))
+            self._conn.executemany(
+                "INSERT INTO job_files (job_id, filename, file_path, status, updated_at) VALUES (?, ?, ?, 'queued', ?)",
+                [(job_id, filename, file_path, now) for filename, file_path in files],
+            )
+            self._conn.commit()
+        return job_id
+
+    def update_file(self, job_id: str, filename: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE job_files SET {assignments} WHERE job_id = ? AND filename = ?",
+                (*fields.values(), job_id, filename),
+            )
+            self._refresh_job_status(job_id)
+            self._conn.commit()
+
+    def _refresh_job_status(self, job_id: str):
+        statuses = [row[0] for row in self._conn.execute(
+            "SELECT status FROM job_files WHERE job_id = ?", (job_id,))]
+        if any(s in ("queued", "processing") for s in statuses):
+            status = "processing" if any(s != "queued" for s in statuses) else "queued"
+        elif all(s == "completed" for s in statuses):
+            status = "completed"
+        elif any(s in ("completed", "completed_with_errors") for s in statuses):
+            status = "completed_with_errors"
+        else:
+            status = "failed"
+        self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                           (status, time.time(), job_id))
+
+    def done_chunks(self, job_id: str, filename: str) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT chunk_index FROM job_chunks WHERE job_id = ? AND filename = ? AND status = 'done'",
+                (job_id, filename))}
+
+    def record_chunks(self, job_id: str, filename: str, outcomes: List[Tuple[int, str, Optional[str]]]):
+        """Store (chunk_index, status, error) rows and bump the file's done counter."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_chunks VALUES (?, ?, ?, ?, ?)",
+                [(job_id, filename, index, status, error) for index, status, error in outcomes],
+            )
+            self._conn.execute(
+                "UPDATE job_files SET chunks_done = (SELECT COUNT(*) FROM job_chunks "
+                "WHERE job_id = ? AND filename = ? AND status = 'done'), updated_at = ? "
+                "WHERE job_id = ? AND filename = ?",
+                (job_id, filename, time.time(), job_id, filename),
+            )
+            self._conn.commit()
+
+    def pending_files(self) -> List[Tuple[str, str, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT job_id, filename, file_path FROM job_files "
+                "WHERE status IN ('queued', 'processing') ORDER BY updated_at"
+            ).fetchall()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT job_id, status, created_at, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            files = self._conn.execute(
+                "SELECT filename, status, chunks_total, chunks_done, error FROM job_files "
+                "WHERE job_id = ? ORDER BY filename", (job_id,)
+            ).fetchall()
+            failed_chunks = self._conn.execute(
+                "SELECT filename, chunk_index, error FROM job_chunks "
+                "WHERE job_id = ? AND status = 'failed' ORDER BY filename, chunk_index", (job_id,)
+            ).fetchall()
+
+        failures: Dict[str, List[Dict]] = {}
+        for filename, chunk_index, error in failed_chunks:
+            failures.setdefault(filename, []).append({"chunk_index": chunk_index, "error": error})
+        return {
+            "job_id": job[0],
+            "status": job[1],
+            "created_at": job[2],
+            "updated_at": job[3],
+            "files": [
+                {
+                    "filename": filename,
+                    "status": status,
+                    "chunks_total": chunks_total,
+                    "chunks_done": chunks_done,
+                    "error": error,
+                    "failed_chunks": failures.get(filename, []),
+                }
+                for filename, status, chunks_total, chunks_done, error in files
+            ],
+        }
+
+
+job_store = JobStore()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+    return _executor
+
+
+def _file_lock(filename: str) -> threading.Lock:
+    """Per-filename lock: uploads of one name share chunk ids and a manifest entry, so they run in turn."""
+    with _file_locks_lock:
+        return _file_locks.setdefault(filename, threading.Lock())
+
+
+def upload_path(upload_id: str, filename: str) -> str:
+    return os.path.abspath(os.path.join(UPLOAD_DIR, upload_id, filename))
+
+
+def dataset_path(filename: str) -> str:
+    return os.path.abspath(os.path.join(DATASET_DIR, filename))
+
+
+def publish_upload(filename: str, file_path: str):
+    """Move an ingested upload to DATASET_DIR/<filename>, replacing the previous version."""
+    target = dataset_path(filename)
+    if os.path.abspath(file_path) == target or not os.path.exists(file_path):
+        return
+    os.replace(file_path, target)
+    try:
+        os.rmdir(os.path.dirname(file_path))
+    except OSError:
+        pass
+
+
+def chat_chunk_metadata(chunk: ChatChunk) -> Dict:
+    metadata = {
+        "type": "chat",
+        "senders": ", ".join(chunk.senders),
+        "first_line": chunk.first_line,
+        "last_line": chunk.last_line,
+        "message_count": chunk.message_count,
+    }
+    # Chroma metadata values must be scalars, so times go in as ISO text plus epoch seconds
+    if chunk.start_time:
+        metadata["start_time"] = chunk.start_time.isoformat()
+        metadata["start_ts"] = int(chunk.start_time.timestamp())
+    if chunk.end_time:
+        metadata["end_time"] = chunk.end_time.isoformat()
+        metadata["end_ts"] = int(chunk.end_time.timestamp())
+    return metadata
+
+
+def iter_file_chunks(filename: str, file_path: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (chunk_text, extra_metadata) for a file; WhatsApp exports are streamed."""
+    if filename.endswith(".txt") and is_whatsapp_export(file_path):
+        messages = parse_chat_file(file_path)
+        max_tokens = chunk_budget(EMBEDDING_MODEL_ID)
+        for chunk in chunk_messages(messages, window=CHAT_WINDOW_MESSAGES, overlap=CHAT_WINDOW_OVERLAP):
+            metadata = chat_chunk_metadata(chunk)
+            if count_tokens(chunk.text) <= max_tokens:
+                yield chunk.text, metadata
+            else:
+                # A window of unusually long messages: split it on message lines
+                for piece in chunk_document(chunk.text, EMBEDDING_MODEL_ID, mode="lines", overlap_tokens=0):
+                    yield piece, metadata
+        return
+
+    if filename.endswith(".pdf"):
+        # Pages arrive in order from the extraction pool; chunks go out before the last page is parsed
+        pages = (text for _, text in iter_pdf_pages(file_path))
+        for chunk in chunk_stream(pages, EMBEDDING_MODEL_ID, mode="text"):
+            yield chunk, {"type": "document"}
+        return
+
+    text = extract_file_text(filename, file_path)
+    if not text:
+        return
+    if filename.endswith(".xlsx"):
+        chunks = chunk_document(text, EMBEDDING_MODEL_ID, mode="lines", header_row=True)
+    elif filename.endswith(".json"):
+        chunks = chunk_document(text, EMBEDDING_MODEL_ID, mode="lines")
+    else:
+        chunks = chunk_document(text, EMBEDDING_MODEL_ID, mode="text")
+    for chunk in chunks:
+        yield chunk, {"type": "document", "total_chunks": len(chunks)}
+
+
+def store_chunk_batch(job_id: str, filename: str, file_path: str, batch: List[Tuple[int, str, Dict]]):
+    """Embed and upsert one batch of (chunk_index, text, extra_metadata) and record outcomes."""
+    results = get_embeddings([chunk for _, chunk, _ in batch])
+
+    outcomes = []
+    ids, embeddings, metadatas, documents = [], [], [], []
+    for (i, chunk, extra), result in zip(batch, results):
+        if not result.ok:
+            logger.error(f"Failed to embed chunk {i} of {filename}: {result.error}")
+            outcomes.append((i, "failed", result.error))
+            continue
+        ids.append(f"{filename}_chunk_{i}")
+        embeddings.append(result.embedding)
+        metadatas.append({
+            "path": dataset_path(filename),
+            "original_file": filename,
+            "chunk_index": i,
+            **extra
+        })
+        documents.append(chunk)
+
+    failures = add_many_to_vectorstore(ids, embeddings, metadatas, documents)
+    answer_cache.invalidate()
+    failed = {doc_id: failure["error"] for failure in failures for doc_id in failure["ids"]}
+    chat_chunks = []
+    for doc_id, metadata, chunk in zip(ids, metadatas, documents):
+        if doc_id in failed:
+            outcomes.append((metadata["chunk_index"], "failed", failed[doc_id]))
+        else:
+            outcomes.append((metadata["chunk_index"], "done", None))
+            if metadata.get("type") == "chat":
+                chat_chunks.append((doc_id, filename, chunk))
+    job_store.record_chunks(job_id, filename, outcomes)
+
+    # Tasks are extracted once per chat chunk text, so /task can answer from the index
+    if chat_chunks:
+        counts = extract_chat_tasks(chat_chunks)
+        logger.info(f"Task index for {filename}: {counts['extracted']} chunks extracted, "
+                    f"{counts['cached']} cached, {counts['failed']} failed")
+
+
+def finish_file(filename: str, file_path: str, content_hash: str, doc_type: str, chunk_ids: List[str]):
+    """Record a fully stored file: drop stale chunks, update the manifest, archive and save metadata."""
+    # Replace the previous version: drop chunk ids the new content no longer produces
+    previous = manifest_model.get_entry(filename)
+    if previous:
+        stale = sorted(set(previous["chunk_ids"]) - set(chunk_ids))
+        if stale:
+            delete_from_vectorstore(stale)
+            task_index_model.unlink_chunks(stale)
+            answer_cache.invalidate()
+    manifest_model.record_file(filename, content_hash, EMBEDDING_SOURCE_ID, chunk_ids)
+    s3_path = None
+    if S3_UPLOAD_ENABLED:
+        try:
+            # The manifest hash is the key, so a HEAD skips content already archived
+            s3_path = upload_file_to_s3(file_path, content_hash=content_hash)
+        except Exception as e:
+            logger.error(f"S3 upload of {filename} failed: {e}")
+    # Buffered: written with other files' entries in one batch, off the ingest path
+    save_metadata(filename, doc_type, s3_path=s3_path, content_hash=content_hash)
+    publish_upload(filename, file_path)
+
+
+def process_file(job_id: str, filename: str, file_path: str):
+    """Extract, chunk, embed and store one file, skipping chunks already done."""
+    with _file_lock(filename):
+        _process_file(job_id, filename, file_path)
+
+
+def _process_file(job_id: str, filename: str, file_path: str):
+    try:
+        job_store.update_file(job_id, filename, status="processing", error=None)
+
+        # Roster JSONs also feed the structured /users tables
+        if load_roster_file(file_path, filename):
+            answer_cache.invalidate()
+        # CDR/IPDR rows feed the columnar store behind the call-record analytics
+        telecom = load_telecom_file(file_path, filename)
+        if telecom:
+            answer_cache.invalidate()
+
+        content_hash = manifest_model.hash_file(file_path)
+        if manifest_model.is_unchanged(filename, content_hash, EMBEDDING_SOURCE_ID):
+            logger.info(f"File {filename} unchanged since last ingest, skipping")
+            publish_upload(filename, file_path)
+            job_store.update_file(job_id, filename, status="completed", error=None)
+            return
+
+        if telecom and not TELECOM_EMBED_ROWS:
+            finish_file(filename, file_path, content_hash, telecom["kind"], [])
+            job_store.update_file(job_id, filename, status="completed", chunks_total=0, error=None)
+            logger.info(f"Stored {telecom['rows']} {telecom['kind'].upper()} rows from {filename}")
+            return
+
+        done = job_store.done_chunks(job_id, filename)
+        if done:
+            logger.info(f"Resuming {filename}: {len(done)} chunks already stored")
+
+        total = 0
+        batch = []
+        doc_type = "document"
+        for i, (chunk, extra) in enumerate(iter_file_chunks(filename, file_path)):
+            # doc_type is what searches filter on (chat, roster, cdr, ipdr, fir, document)
+            extra = {**extra, "doc_type": telecom["kind"] if telecom else
+                     infer_doc_type({"original_file": filename, **extra})}
+            if i == 0:
+                doc_type = extra["doc_type"]
+                if "total_chunks" in extra:
+                    job_store.update_file(job_id, filename, chunks_total=extra["total_chunks"])
+            total = i + 1
+            if i in done:
+                continue
+            batch.append((i, chunk, extra))
+            if len(batch) >= INGEST_BATCH_SIZE:
+                store_chunk_batch(job_id, filename, file_path, batch)
+                batch = []
+        if batch:
+            store_chunk_batch(job_id, filename, file_path, batch)
+
+        if total == 0:
+            logger.warning(f"No text extracted from {filename}")
+            job_store.update_file(job_id, filename, status="failed", error="No text extracted")
+            return
+        job_store.update_file(job_id, filename, chunks_total=total)
+
+        failed_count = total - len(job_store.done_chunks(job_id, filename))
+        status = "completed" if failed_count == 0 else "completed_with_errors"
+        if failed_count == 0:
+            finish_file(filename, file_path, content_hash, doc_type,
+                        [f"{filename}_chunk_{i}" for i in range(total)])
+        job_store.update_file(job_id, filename, status=status,
+                              error=f"{failed_count} chunks failed" if failed_count else None)
+        logger.info(f"Processed and added {filename} to vector store")
+
+    except Exception as e:
+        logger.error(f"Failed to process {filename}: {str(e)}")
+        job_store.update_file(job_id, filename, status="failed", error=str(e))
+
+
+def enqueue_job(files: List[Tuple[str, str]]) -> str:
+    """Record a job for the given (filename, file_path) pairs and hand the files to the worker pool."""
+    job_id = job_store.create_job(files)
+    executor = _get_executor()
+    for filename, file_path in files:
+        executor.submit(process_file, job_id, filename, file_path)
+    return job_id
+
+
+def resume_pending_jobs() -> int:
+    """Requeue files left queued/processing by a previous worker; returns how many."""
+    pending = job_store.pending_files()
+    executor = _get_executor()
+    for job_id, filename, file_path in pending:
+        logger.info(f"Resuming ingestion of {filename} for job {job_id}")
+        executor.submit(process_file, job_id, filename, file_path)
+    return len(pending)
+
+
+def retry_task_extractions():
+    """Queue a retry of failed chat task extractions on the ingest workers (they call the LLM)."""
+    _get_executor().submit(retry_failed_extractions)
+
+
+def get_job_status(job_id: str) -> Optional[Dict]:
+    return job_store.get_job(job_id)
@@ -10,28 +10,281 @@
 # app/service/langstream_service.py
 
 import os
-from langchain_aws.chat_models import ChatBedrock
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, NamedTuple, Optional, Union
 from langchain_core.runnables import RunnableLambda
 from langchain_core.tracers import LangChainTracer
 from langchain_core.messages import HumanMessage
+from app.model.chunker_model import count_tokens
+from app.model.provider_model import create_chat_model
+
+logger = logging.getLogger(__name__)
 
 # LangSmith setup
 os.environ["LANGCHAIN_TRACING_V2"] = "true"
 os.environ["LANGCHAIN_PROJECT"] = "AP-Police-Analyst"
 
-# Initialize Bedrock Claude model
-claude_model = ChatBedrock(
+# Initialize Bedrock Claude model (a local scripted stand-in with CHAT_PROVIDER=scripted)
+claude_model = create_chat_model(
     model_id="anthropic.claude-3-5-sonnet-20240620-v1:0",
     region_name="us-east-1",
     temperature=0.5,
     max_tokens=1024
 )
 
-def run_traced_claude_task(prompt: str,agent_name: str = "Default Agent") -> str:
+# Static instruction prefixes get a Bedrock prompt-cache checkpoint. Claude
+# only caches prefixes of at least ~1024 tokens, so shorter ones are sent plain.
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+_prompt_cache_active = PROMPT_CACHE_ENABLED
+
+
+class CacheablePrompt(NamedTuple):
+    """A prompt split into a static instruction prefix and the per-request suffix."""
+    prefix: str
+    suffix: str
+
+
+Prompt = Union[str, CacheablePrompt]
+
+# A call that just finished is reused for this long, so back-to-back
+# identical prompts (e.g. a log line followed by a return) cost one call
+SINGLE_FLIGHT_REUSE_SECONDS = float(os.getenv("SINGLE_FLIGHT_REUSE_SECONDS", "5"))
+SINGLE_FLIGHT_RECENT_MAX = 256
+
+_flight_lock = threading.Lock()
+_inflight: Dict[str, Future] = {}
+_recent: "OrderedDict[str, tuple]" = OrderedDict()
+_agent_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _stats_for(agent_name: str) -> Dict[str, float]:
+    return _agent_stats.setdefault(agent_name, {
+        "requests": 0, "llm_calls": 0, "coalesced": 0, "errors": 0,
+        "input_tokens": 0, "output_tokens": 0,
+        "latency_total_s": 0.0, "latency_max_s": 0.0,
+        "streams": 0, "ttft_total_s": 0.0, "ttft_max_s": 0.0,
+        "cache_read_tokens": 0, "cache_write_tokens": 0,
+    })
+
+
+def _token_usage(response) -> tuple:
+    """(input, output, cache read, cache write) tokens reported for a response or chunk."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return (usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+                details.get("cache_read", 0) or 0, details.get("cache_creation", 0) or 0)
+    meta = (getattr(response, "response_metadata", None) or {}).get("usage", {}) or {}
+    return (meta.get("prompt_tokens", meta.get("input_tokens", 0)),
+            meta.get("completion_tokens", meta.get("output_tokens", 0)),
+            meta.get("cache_read_input_tokens", 0) or 0, meta.get("cache_creation_input_tokens", 0) or 0)
+
+
+def _record_usage(stats: Dict[str, float], usage: tuple):
+    input_tokens, output_tokens, cache_read, cache_write = usage
+    stats["input_tokens"] += input_tokens
+    stats["output_tokens"] += output_tokens
+    stats["cache_read_tokens"] += cache_read
+    stats["cache_write_tokens"] += cache_write
+
+
+def _prompt_key(prompt: Prompt) -> str:
+    text = prompt if isinstance(prompt, str) else f"{prompt.prefix}\x00{prompt.suffix}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _prompt_message(prompt: Prompt) -> HumanMessage:
+    """
+    Plain prompts go as one text block. Cacheable prompts send the prefix as
+    its own block ending in a cache checkpoint, so Bedrock can reuse it.
+    """
+    if isinstance(prompt, str):
+        return HumanMessage(content=prompt)
+    prefix_block = {"type": "text", "text": prompt.prefix}
+    if _prompt_cache_active and count_tokens(prompt.prefix) >= PROMPT_CACHE_MIN_TOKENS:
+        prefix_block["cache_control"] = {"type": "ephemeral"}
+    return HumanMessage(content=[prefix_block, {"type": "text", "text": prompt.suffix}])
+
+
+def _cache_rejected(error: Exception, prompt: Prompt) -> bool:
+    """Models without prompt caching refuse checkpoints; switch them off and retry once."""
+    global _prompt_cache_active
+    if not _prompt_cache_active or isinstance(prompt, str) or "cach" not in str(error).lower():
+        return False
+    _prompt_cache_active = False
+    logger.warning(f"Prompt caching rejected by {claude_model.model_id}, sending prompts without checkpoints: {error}")
+    return True
+
+
+def _invoke_with_fallback(prompt: Prompt):
+    try:
+        return claude_model.invoke([_prompt_message(prompt)])
+    except Exception as e:
+        if not _cache_rejected(e, prompt):
+            raise
+        return claude_model.invoke([_prompt_message(prompt)])
+
+
+def _stream_with_fallback(prompt: Prompt):
+    started = False
+    try:
+        for chunk in claude_model.stream([_prompt_message(prompt)]):
+            started = True
+            yield chunk
+    except Exception as e:
+        if started or not _cache_rejected(e, prompt):
+            raise
+        yield from claude_model.stream([_prompt_message(prompt)])
+
+
+def _invoke_claude(prompt: Prompt, agent_name: str) -> str:
     tracer = LangChainTracer()
-    chain = RunnableLambda(lambda x: claude_model.invoke([HumanMessage(content=x)]))
+    chain = RunnableLambda(_invoke_with_fallback)
     chain = chain.with_config({"run_name": agent_name})  # ✅ Add LangSmith run label
-    response = chain.invoke(prompt)
+
+    start = time.perf_counter()
+    try:
+        response = chain.invoke(prompt)
+    except Exception:
+        with _flight_lock:
+            _stats_for(agent_name)["errors"] += 1
+        raise
+    elapsed = time.perf_counter() - start
+
+    usage = _token_usage(response)
+    with _flight_lock:
+        stats = _stats_for(agent_name)
+        stats["llm_calls"] += 1
+        _record_usage(stats, usage)
+        stats["latency_total_s"] += elapsed
+        stats["latency_max_s"] = max(stats["latency_max_s"], elapsed)
 
     # Extract content from AIMessage and return as string
     return response.content.strip()
+
+
+def _remember(key: str, result: str):
+    with _flight_lock:
+        _recent[key] = (time.monotonic(), result)
+        _recent.move_to_end(key)
+        while len(_recent) > SINGLE_FLIGHT_RECENT_MAX:
+            _recent.popitem(last=False)
+
+
+def run_traced_claude_task(prompt: Prompt, agent_name: str = "Default Agent") -> str:
+    """
+    Run a prompt through Claude. Identical prompts already in flight (or
+    finished within SINGLE_FLIGHT_REUSE_SECONDS) share one Bedrock call.
+    """
+    key = _prompt_key(prompt)
+    now = time.monotonic()
+    with _flight_lock:
+        stats = _stats_for(agent_name)
+        stats["requests"] += 1
+        recent = _recent.get(key)
+        if recent and now - recent[0] <= SINGLE_FLIGHT_REUSE_SECONDS:
+            stats["coalesced"] += 1
+            return recent[1]
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+        else:
+            stats["coalesced"] += 1
+
+    if not leader:
+        return future.result()
+
+    try:
+        result = _invoke_claude(prompt, agent_name)
+    except Exception as e:
+        future.set_exception(e)
+        with _flight_lock:
+            _inflight.pop(key, None)
+        raise
+
+    with _flight_lock:
+        _inflight.pop(key, None)
+    _remember(key, result)
+    future.set_result(result)
+    return result
+
+
+def stream_traced_claude_task(prompt: Prompt, agent_name: str = "Default Agent",
+                              on_complete: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+    """
+    Yield Claude's answer as text deltas while it is generated. Time to
+    first token is recorded per agent; on_complete gets the full answer.
+    """
+    key = _prompt_key(prompt)
+    reused = None
+    with _flight_lock:
+        stats = _stats_for(agent_name)
+        stats["requests"] += 1
+        recent = _recent.get(key)
+        if recent and time.monotonic() - recent[0] <= SINGLE_FLIGHT_REUSE_SECONDS:
+            stats["coalesced"] += 1
+            reused = recent[1]
+    if reused is not None:
+        yield reused
+        return
+
+    chain = RunnableLambda(_stream_with_fallback).with_config({"run_name": agent_name})
+
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = [0, 0, 0, 0]
+    try:
+        for chunk in chain.stream(prompt):
+            usage = [total + used for total, used in zip(usage, _token_usage(chunk))]
+            text = chunk.content if isinstance(chunk.content, str) else \
+                "".join(block.get("text", "") for block in chunk.content if isinstance(block, dict))
+            if not text:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter() - start
+            parts.append(text)
+            yield text
+    except Exception:
+        with _flight_lock:
+            _stats_for(agent_name)["errors"] += 1
+        raise
+    elapsed = time.perf_counter() - start
+
+    with _flight_lock:
+        stats = _stats_for(agent_name)
+        stats["llm_calls"] += 1
+        stats["streams"] += 1
+        _record_usage(stats, tuple(usage))
+        stats["latency_total_s"] += elapsed
+        stats["latency_max_s"] = max(stats["latency_max_s"], elapsed)
+        ttft = first_token_at if first_token_at is not None else elapsed
+        stats["ttft_total_s"] += ttft
+        stats["ttft_max_s"] = max(stats["ttft_max_s"], ttft)
+
+    result = "".join(parts).strip()
+    _remember(key, result)
+    if on_complete is not None:
+        on_complete(result)
+
+
+def get_llm_stats() -> Dict[str, Dict[str, float]]:
+    """Per-agent Claude call counts, coalesced requests, tokens (incl. prompt cache), latency and TTFT."""
+    with _flight_lock:
+        report = {}
+        for agent_name, stats in _agent_stats.items():
+            calls = stats["llm_calls"]
+            report[agent_name] = {
+                **stats,
+                "latency_avg_s": round(stats["latency_total_s"] / calls, 4) if calls else 0.0,
+                "ttft_avg_s": round(stats["ttft_total_s"] / stats["streams"], 4) if stats["streams"] else 0.0,
+            }
+        return report
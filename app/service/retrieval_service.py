@@ -0,0 +1,265 @@
+# app/service/retrieval_service.py
+
+import re
+import logging
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, List, Optional, Tuple
+
+from app.model import lexical_index_model
+from app.model.embedding_model import get_embeddings
+from app.model.roster_model import GROUP_ID_PATTERN
+from app.model.vectorstore_model import DOC_TYPES, search_vectorstore, get_from_vectorstore
+
+logger = logging.getLogger(__name__)
+
+# Reciprocal rank fusion constant (Cormack et al.)
+RRF_K = 60
+# Candidates pulled from each ranker before fusion, as a multiple of top_k
+CANDIDATE_MULTIPLIER = 4
+
+# GRP001, TWR003, mem_014, +91-9876543210, GRP_BANDOBST_NORTH
+IDENTIFIER_TOKEN = re.compile(r"^(?:\+?[\w\-]*\d[\w\-]*|[A-Z0-9]+(?:_[A-Z0-9]+)+)$")
+
+# Query words that name a source type; FIR/CDR/IPDR only count written in capitals
+DOC_TYPE_WORDS = [
+    ("chat", re.compile(r"\b(whats\s?app|chats?|chat logs?)\b", re.IGNORECASE)),
+    ("fir", re.compile(r"\bFIRs?\b")),
+    ("cdr", re.compile(r"\bCDRs?\b")),
+    ("ipdr", re.compile(r"\bIPDRs?\b")),
+]
+FILE_NAME = re.compile(r"\b[\w\-]+\.(?:txt|json|pdf|docx|xlsx)\b", re.IGNORECASE)
+MONTHS = {name: number for number, names in enumerate(
+    [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+     ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+     ("dec", "december")], start=1) for name in names}
+_MONTH = "(?P<month>" + "|".join(sorted(MONTHS, key=len, reverse=True)) + ")"
+# 2025-06-20, 20/06/2025 (day first, as the chat exports), 20 June 2025, June 20, 2025
+DATE_PATTERNS = [
+    re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b"),
+    re.compile(r"\b(?P<day>\d{1,2})[/.\-](?P<month>\d{1,2})[/.\-](?P<year>\d{4}|\d{2})\b"),
+    re.compile(rf"\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+{_MONTH},?\s+(?P<year>\d{{4}})\b", re.IGNORECASE),
+    re.compile(rf"\b{_MONTH}\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<year>\d{{4}})\b", re.IGNORECASE),
+]
+AFTER_WORDS = re.compile(r"\b(after|since|from)\s*$", re.IGNORECASE)
+BEFORE_WORDS = re.compile(r"\b(before|until|till|up to)\s*$", re.IGNORECASE)
+
+
+@dataclass
+class SearchFilters:
+    """
+    Metadata restrictions pushed down to Chroma (where / where_document)
+    and the BM25 index. Empty fields don't filter; times are epoch seconds
+    matched against the start_ts / end_ts of chat chunks.
+    """
+    doc_types: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+    senders: List[str] = field(default_factory=list)
+    start_ts: Optional[int] = None
+    end_ts: Optional[int] = None
+    contains: List[str] = field(default_factory=list)
+
+    @classmethod
+    def scope(cls, doc_types: str) -> "SearchFilters":
+        """An agent's default scope from a comma-separated doc_type list ("" searches everything)."""
+        return cls(doc_types=[t.strip() for t in doc_types.split(",") if t.strip() in DOC_TYPES])
+
+    @property
+    def is_empty(self) -> bool:
+        return not any(getattr(self, f.name) not in (None, []) for f in fields(self))
+
+    def merge(self, other: "SearchFilters") -> "SearchFilters":
+        """Both sets of restrictions; the other's doc types replace ours when it names any."""
+        return SearchFilters(
+            doc_types=other.doc_types or self.doc_types,
+            files=other.files or self.files,
+            senders=other.senders or self.senders,
+            start_ts=other.start_ts if other.start_ts is not None else self.start_ts,
+            end_ts=other.end_ts if other.end_ts is not None else self.end_ts,
+            contains=list(dict.fromkeys(self.contains + other.contains)),
+        )
+
+    def where(self) -> Optional[Dict]:
+        conditions = []
+        if self.doc_types:
+            conditions.append({"doc_type": {"$in": self.doc_types}})
+        if self.files:
+            conditions.append({"original_file": {"$in": self.files}})
+        # Chunks overlapping the range: ends after its start and starts before its end
+        if self.start_ts is not None:
+            conditions.append({"end_ts": {"$gte": self.start_ts}})
+        if self.end_ts is not None:
+            conditions.append({"start_ts": {"$lte": self.end_ts}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def where_document(self) -> Optional[Dict]:
+        # Senders aren't a list in Chroma metadata, so match their message lines: "] SI Ramesh: ..."
+        conditions = [{"$contains": text} for text in self.contains]
+        if self.senders:
+            by_sender = [{"$contains": f"] {sender}:"} for sender in self.senders]
+            conditions.append(by_sender[0] if len(by_sender) == 1 else {"$or": by_sender})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def lexical(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+def _parse_date(match: re.Match) -> Optional[datetime]:
+    parts = match.groupdict()
+    month = parts["month"]
+    month = int(month) if month.isdigit() else MONTHS[month.lower()]
+    year = int(parts["year"])
+    try:
+        return datetime(year + 2000 if year < 100 else year, month, int(parts["day"]))
+    except ValueError:
+        return None
+
+
+def _date_range(query: str) -> Tuple[Optional[int], Optional[int]]:
+    """Epoch bounds (local time, as chat chunks are stored) of the dates a query mentions."""
+    found, taken = [], []
+    for pattern in DATE_PATTERNS:
+        for match in pattern.finditer(query):
+            if any(start < match.end() and match.start() < end for start, end in taken):
+                continue
+            day = _parse_date(match)
+            if day:
+                taken.append(match.span())
+                found.append((match.start(), day))
+    if not found:
+        return None, None
+    found.sort()
+    days = [day for _, day in found]
+    start, end = min(days), max(days) + timedelta(days=1)
+    if len(days) == 1:
+        before = query[:found[0][0]]
+        if AFTER_WORDS.search(before):
+            return int(start.timestamp()), None
+        if BEFORE_WORDS.search(before):
+            return None, int(start.timestamp()) - 1
+    return int(start.timestamp()), int(end.timestamp()) - 1
+
+
+def _mentioned_senders(query: str) -> List[str]:
+    """Known chat senders the query asks about as senders ("from X", "by X", "X said")."""
+    matched = []
+    for sender in lexical_index_model.distinct_senders():
+        # "SI Ramesh" may be asked for as "Ramesh"
+        names = [sender] + ([sender.split(" ", 1)[1]] if " " in sender else [])
+        for name in names:
+            name = re.escape(name)
+            if re.search(rf"\b(?:from|by)\s+{name}\b|\b{name}\s+(?:said|wrote|posted|sent|asked|told)\b",
+                         query, re.IGNORECASE):
+                matched.append(sender)
+                break
+    return matched
+
+
+def parse_query_filters(query: str) -> SearchFilters:
+    """Filters a question implies: source type words, file names, dates, group IDs and senders."""
+    start_ts, end_ts = _date_range(query)
+    return SearchFilters(
+        doc_types=[doc_type for doc_type, pattern in DOC_TYPE_WORDS if pattern.search(query)],
+        files=list(dict.fromkeys(FILE_NAME.findall(query))),
+        senders=_mentioned_senders(query),
+        start_ts=start_ts,
+        end_ts=end_ts,
+        contains=list(dict.fromkeys(m.group(0).upper() for m in GROUP_ID_PATTERN.finditer(query))),
+    )
+
+
+def is_identifier_query(query: str) -> bool:
+    """True when the query is nothing but one or more identifiers."""
+    tokens = [t for t in re.split(r"[\s,;]+", query.strip()) if t]
+    return bool(tokens) and all(IDENTIFIER_TOKEN.match(t) for t in tokens)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _as_query_result(ids: List[str], fetched: Dict, with_embeddings: bool = False) -> Dict:
+    """Shape results like chromadb's collection.query output (one query)."""
+    result = {"ids": [ids], "documents": [fetched["documents"]], "metadatas": [fetched["metadatas"]]}
+    if with_embeddings:
+        result["embeddings"] = [fetched["embeddings"]]
+    return result
+
+
+def hybrid_search(query: str, top_k: int = 5, with_embeddings: bool = False,
+                  scope: Optional[SearchFilters] = None) -> Dict:
+    """
+    BM25 + vector retrieval fused with RRF, restricted to the agent's scope
+    plus the filters parsed from the query. When the filtered search finds
+    nothing it is retried with the query filters alone, then without the
+    date range (only chat chunks carry times), then unfiltered.
+    with_embeddings adds the stored chunk vectors (for MMR downstream).
+    """
+    parsed = parse_query_filters(query)
+    attempts = [scope.merge(parsed) if scope else parsed, parsed,
+                replace(parsed, start_ts=None, end_ts=None), SearchFilters()]
+    for attempt, filters in enumerate(attempts):
+        if filters in attempts[:attempt]:
+            continue
+        results = search_filtered(query, filters, top_k, with_embeddings)
+        if results["ids"][0] or filters.is_empty:
+            return results
+        logger.info("No chunks match %s, widening the search", filters)
+    return results
+
+
+def search_filtered(query: str, filters: SearchFilters, top_k: int = 5, with_embeddings: bool = False) -> Dict:
+    """
+    One fused search within filters. Pure identifier queries are answered
+    from the lexical index alone, without an embedding call.
+    """
+    candidates = top_k * CANDIDATE_MULTIPLIER
+    lexical_ids = [doc_id for doc_id, _ in lexical_index_model.search(query, top_k=candidates, **filters.lexical())]
+
+    if lexical_ids and is_identifier_query(query):
+        logger.info("Identifier query, answering from lexical index: %s", query)
+        fetched = get_from_vectorstore(lexical_ids[:top_k], include_embeddings=with_embeddings)
+        return _as_query_result(fetched["ids"], fetched, with_embeddings)
+
+    vector_ids: List[str] = []
+    cached: Dict[str, tuple] = {}
+    query_result = get_embeddings([query])[0]
+    if query_result.ok:
+        results = search_vectorstore(query_result.embedding, top_k=candidates, include_embeddings=with_embeddings,
+                                     where=filters.where(), where_document=filters.where_document())
+        if results:
+            vector_ids = results.get("ids", [[]])[0]
+            embeddings = results.get("embeddings") if with_embeddings else None
+            embeddings = embeddings[0] if embeddings is not None and len(embeddings) else None
+            if embeddings is None:
+                embeddings = [None] * len(vector_ids)
+            for doc_id, doc, meta, emb in zip(vector_ids, results.get("documents", [[]])[0],
+                                              results.get("metadatas", [[]])[0], embeddings):
+                cached[doc_id] = (doc, meta, emb)
+    elif not lexical_ids:
+        raise RuntimeError(f"Embedding failed: {query_result.error}")
+    else:
+        logger.warning("Query embedding failed, using lexical results only: %s", query_result.error)
+
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:top_k]
+    missing = [doc_id for doc_id in fused if doc_id not in cached]
+    if missing:
+        fetched = get_from_vectorstore(missing, include_embeddings=with_embeddings)
+        for doc_id, doc, meta, emb in zip(fetched["ids"], fetched["documents"], fetched["metadatas"],
+                                          fetched["embeddings"]):
+            cached[doc_id] = (doc, meta, emb)
+
+    ids = [doc_id for doc_id in fused if doc_id in cached]
+    return _as_query_result(ids, {
+        "documents": [cached[doc_id][0] for doc_id in ids],
+        "metadatas": [cached[doc_id][1] for doc_id in ids],
+        "embeddings": [cached[doc_id][2] for doc_id in ids],
+    }, with_embeddings)
@@ -0,0 +1,156 @@
+# app/service/task_extraction_service.py
+
+import os
+import re
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.model import task_index_model
+from app.model.vectorstore_model import get_from_vectorstore
+from app.service.langstream_service import CacheablePrompt, run_traced_claude_task
+
+logger = logging.getLogger(__name__)
+
+TASK_EXTRACTION_ENABLED = os.getenv("TASK_EXTRACTION_ENABLED", "true").lower() == "true"
+# Chat chunks sent to the LLM concurrently during ingestion
+TASK_EXTRACTION_WORKERS = int(os.getenv("TASK_EXTRACTION_WORKERS", "4"))
+
+# Static instructions, sent first and marked as a prompt-cache checkpoint
+EXTRACTION_PROMPT_PREFIX = """
+You are an AI assistant analyzing AP Police whatsapp chat datasets.
+The chats contain tasks that a senior officer assigns to junior officers (e.g: Situation reports from all circles must be submitted by 11:00 AM, evacuation drill to start in VZM, Confirm PC deployment near Zone-2).
+Extract every task assigned in the messages below.
+
+Return ONLY a JSON array, one object per task, with these keys:
+- "assigner": name of the officer who assigned the task, exactly as it appears before the colon
+- "assignee": officer, rank or unit the task is assigned to ("all" when addressed to everyone)
+- "task": the task in a short sentence
+- "deadline": deadline as written in the message, or null
+- "circle": circle, zone or place the task concerns, or null
+- "source_message": the assigning message text, copied exactly
+
+Return [] when the messages assign no tasks.
+---
+
+"""
+
+EXTRACTION_PROMPT_SUFFIX = """Messages:
+{chunk}
+
+JSON array:
+"""
+
+# Chat chunks are stored as "[YYYY-MM-DD HH:MM] Sender: text" (whatsapp_parser_model.format_message)
+FORMATTED_MESSAGE = re.compile(r"^\[(?P<stamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2})\] (?:(?P<sender>[^:\n]+): )?(?P<text>.*)$")
+
+
+def _chunk_messages(chunk: str) -> List[Tuple[Optional[datetime], Optional[str], str]]:
+    messages = []
+    for line in chunk.split("\n"):
+        match = FORMATTED_MESSAGE.match(line)
+        if match:
+            messages.append((datetime.strptime(match.group("stamp"), "%Y-%m-%d %H:%M"),
+                             match.group("sender"), match.group("text")))
+        elif messages:
+            stamp, sender, text = messages[-1]
+            messages[-1] = (stamp, sender, f"{text}\n{line}")
+    return messages
+
+
+def parse_tasks(answer: str) -> List[Dict]:
+    """The JSON array in the model's answer; tolerates code fences and surrounding prose."""
+    start, end = answer.find("["), answer.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("No JSON array in extraction answer")
+    items = json.loads(answer[start:end + 1])
+    tasks = []
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get("task") or "").strip():
+            continue
+        tasks.append({field: (str(item[field]).strip() if item.get(field) not in (None, "") else None)
+                      for field in task_index_model.TASK_FIELDS})
+    return tasks
+
+
+def _attach_message_times(tasks: List[Dict], chunk: str):
+    """Tie each task to the message it came from, for its time and a trusted assigner."""
+    messages = _chunk_messages(chunk)
+    for task in tasks:
+        source = (task.get("source_message") or "").strip().lower()
+        for stamp, sender, text in messages:
+            if source and (source in text.lower() or text.strip().lower() in source):
+                task["message_time"] = stamp.isoformat() if stamp else None
+                task["message_ts"] = int(stamp.timestamp()) if stamp else None
+                if sender:
+                    task["assigner"] = sender
+                break
+
+
+def extract_tasks(chunk: str) -> List[Dict]:
+    prompt = CacheablePrompt(EXTRACTION_PROMPT_PREFIX, EXTRACTION_PROMPT_SUFFIX.format(chunk=chunk))
+    answer = run_traced_claude_task(prompt, agent_name="Task Extractor")
+    if answer.startswith("❌"):
+        raise RuntimeError(answer)
+    tasks = parse_tasks(answer)
+    _attach_message_times(tasks, chunk)
+    return tasks
+
+
+def extract_chat_tasks(items: List[Tuple[str, str, str]]) -> Dict[str, int]:
+    """
+    Index the tasks in stored chat chunks, given as (doc_id, original_file, text).
+    Chunk texts already extracted are only linked. Failed chunks are linked
+    without a result; retry_failed_extractions picks them up at startup.
+    """
+    if not TASK_EXTRACTION_ENABLED or not items:
+        return {"extracted": 0, "cached": 0, "failed": 0}
+
+    hashed = [(doc_id, filename, text, task_index_model.chunk_hash(text)) for doc_id, filename, text in items]
+    done = task_index_model.extracted_hashes(h for _, _, _, h in hashed)
+    pending = {h: text for _, _, text, h in hashed if h not in done}
+
+    def run(item):
+        hash_, text = item
+        try:
+            task_index_model.record_extraction(hash_, extract_tasks(text))
+            return True
+        except Exception as e:
+            logger.error(f"Task extraction failed for chunk {hash_[:12]}: {type(e).__name__} - {e}")
+            return False
+
+    failed = 0
+    if pending:
+        with ThreadPoolExecutor(max_workers=TASK_EXTRACTION_WORKERS, thread_name_prefix="task-extract") as pool:
+            failed = sum(not ok for ok in pool.map(run, pending.items()))
+
+    task_index_model.link_chunks([(doc_id, h, filename) for doc_id, filename, _, h in hashed])
+    return {"extracted": len(pending) - failed, "cached": len(hashed) - len(pending), "failed": failed}
+
+
+def retry_failed_extractions(page_size: int = 200) -> Dict[str, int]:
+    """
+    Re-run extraction for stored chat chunks whose earlier attempt failed or
+    was made by another chat provider (e.g. scripted before switching back
+    to Bedrock). Their files are already in the manifest, so re-ingesting
+    wouldn't reach them.
+    """
+    totals = {"extracted": 0, "cached": 0, "failed": 0}
+    if not TASK_EXTRACTION_ENABLED:
+        return totals
+    after = ""
+    while True:
+        page = task_index_model.unextracted_chunks(after, page_size)
+        if not page:
+            break
+        after = page[-1][0]
+        files = dict(page)
+        stored = get_from_vectorstore([doc_id for doc_id, _ in page])
+        counts = extract_chat_tasks([(doc_id, files[doc_id], text)
+                                     for doc_id, text in zip(stored["ids"], stored["documents"]) if text])
+        totals = {key: totals[key] + counts[key] for key in totals}
+    if totals["extracted"] or totals["failed"]:
+        logger.info(f"Retried task extraction: {totals['extracted']} chunks extracted, {totals['failed']} failed")
+    return totals
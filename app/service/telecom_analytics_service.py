@@ -0,0 +1,81 @@
+# app/service/telecom_analytics_service.py
+
+import re
+import logging
+from typing import Dict, List, Optional
+
+from app.model import telecom_store_model
+
+logger = logging.getLogger(__name__)
+
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s\-]{8,}\d")
+TOWER_PATTERN = re.compile(r"\bTWR[-_ ]?\d+\b", re.IGNORECASE)
+
+# A phone number alone isn't enough: chat questions mention numbers too, so
+# the question must name the call records (a tower id also counts)
+CALL_RECORD_CUE = re.compile(r"\b(cdrs?|ipdrs?|call (detail )?records?|call logs?|data sessions?|cell towers?|"
+                             r"tower ids?)\b", re.I)
+
+# Question words that pick the aggregation; checked in this order
+INTENTS = [
+    ("overlap", re.compile(r"\b(overlap\w*|same time|simultaneous\w*|concurrent\w*)\b", re.I)),
+    ("timeline", re.compile(r"\b(timeline|movement\w*|moved|where was|cell towers?|tower ids?)\b", re.I)),
+    ("sessions", re.compile(r"\b(sessions?|data usage|internet|ipdrs?|apn|bytes)\b", re.I)),
+    ("contacts", re.compile(r"\b(contacts?|called|spoke|talked|frequen\w*|cdrs?|call (detail )?records?|"
+                            r"call logs?)\b", re.I)),
+]
+
+
+def _phone_numbers(query: str) -> List[str]:
+    return list(dict.fromkeys(m.group(0) for m in PHONE_PATTERN.finditer(query)
+                              if len(re.sub(r"\D", "", m.group(0))) >= 10))
+
+
+def _tower_id(query: str) -> Optional[str]:
+    match = TOWER_PATTERN.search(query)
+    return re.sub(r"[-_ ]", "", match.group(0)).upper() if match else None
+
+
+def _table(rows: List[Dict]) -> str:
+    columns = list(rows[0])
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    lines += ["| " + " | ".join("" if row[c] is None else str(row[c]) for c in columns) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def _answer(title: str, rows: List[Dict]) -> Optional[str]:
+    return f"**{title}** (from CDR/IPDR records)\n\n{_table(rows)}" if rows else None
+
+
+def detect_intent(query: str) -> Optional[Dict]:
+    """The aggregation a CDR/IPDR question asks for, or None when it isn't one."""
+    numbers, tower = _phone_numbers(query), _tower_id(query)
+    if not numbers and not tower:
+        return None
+    if not tower and not CALL_RECORD_CUE.search(query):
+        return None
+    intent = next((name for name, pattern in INTENTS if pattern.search(query)), None)
+    if tower and intent in (None, "contacts", "timeline"):
+        return {"intent": "tower_calls", "tower_id": tower}
+    if not numbers or intent is None:
+        return None
+    return {"intent": intent, "number": numbers[0]}
+
+
+def answer_analytics(query: str) -> Optional[str]:
+    """Answer call-record questions from the columnar store; None to let the caller use retrieval."""
+    detected = detect_intent(query)
+    if detected is None:
+        return None
+    intent = detected["intent"]
+    logger.info(f"Telecom analytics intent: {detected}")
+    if intent == "tower_calls":
+        return _answer(f"Calls through {detected['tower_id']}", telecom_store_model.tower_calls(detected["tower_id"]))
+    number = detected["number"]
+    if intent == "contacts":
+        return _answer(f"Top contacts of {number}", telecom_store_model.contact_frequency(number))
+    if intent == "timeline":
+        return _answer(f"Tower timeline of {number}", telecom_store_model.tower_timeline(number))
+    if intent == "sessions":
+        return _answer(f"Data sessions of {number}", telecom_store_model.subscriber_sessions(number))
+    return _answer(f"Sessions overlapping with {number}", telecom_store_model.session_overlap(number))
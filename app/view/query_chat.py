@@ -1,5 +1,6 @@
+import time
 import streamlit as st
-from app.controller.chat_controller import answer_query  # Ensure this function exists
+from app.controller.chat_controller import answer_query_stream  # Ensure this function exists
 
 def main():
     st.title("🧠 Chat with Uploaded Police Documents")
@@ -7,7 +8,16 @@ def main():
     query_input = st.text_input("💬 Ask a question about the data you uploaded:")
 
     if query_input:
-        with st.spinner("🔍 Searching and reasoning..."):
-            response = answer_query(query_input)
-            st.success("✅ Answer generated")
-            st.markdown(response)
+        started = time.perf_counter()
+        first_token = {}
+
+        def timed_tokens():
+            for token in answer_query_stream(query_input):
+                first_token.setdefault("at", time.perf_counter())
+                yield token
+
+        # Tokens are rendered as Claude generates them instead of after the full answer
+        st.write_stream(timed_tokens())
+        if "at" in first_token:
+            st.caption(f"⏱️ First token after {first_token['at'] - started:.2f}s, "
+                       f"full answer after {time.perf_counter() - started:.2f}s")
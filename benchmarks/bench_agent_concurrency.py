@@ -0,0 +1,109 @@
+"""
+Agent endpoint concurrency benchmark.
+
+In-process mode (default) simulates an agent call as a blocking sleep of
+--latency seconds, the way boto3/Chroma/LangChain block a thread. It fires
+--requests concurrent calls and reports throughput:
+
+  * inline: the blocking call runs directly inside the coroutine, as the
+    endpoints did before; QPS stays flat at ~1/latency whatever the load.
+  * pool N: the call goes through AgentPool with N workers; QPS should
+    scale ~N/latency until the pool is saturated, and requests beyond
+    workers + queue limit are refused (counted as 503).
+
+With --url the same load is sent to a running server instead, e.g. start it
+with AGENT_WORKERS=8 and run
+  python benchmarks/bench_agent_concurrency.py --url http://localhost:8000/query
+
+Usage: python benchmarks/bench_agent_concurrency.py [--workers 1,2,4,8,16] [--requests 64] [--latency 0.2]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import urllib.parse
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.service.agent_pool_service import AgentPool, AgentPoolBusy
+
+
+def fake_agent(latency):
+    time.sleep(latency)  # stands in for a Bedrock round trip
+    return "ok"
+
+
+async def run_inline(requests, latency):
+    async def call():
+        return fake_agent(latency)
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(requests)))
+    return requests, 0, time.perf_counter() - start
+
+
+async def run_pool(requests, latency, workers, queue_limit):
+    pool = AgentPool(workers=workers, queue_limit=queue_limit)
+
+    async def call():
+        try:
+            await pool.run(fake_agent, latency)
+            return True
+        except AgentPoolBusy:
+            return False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    pool.executor.shutdown()
+    return sum(results), results.count(False), elapsed
+
+
+def run_http(url, requests, query):
+    body = urllib.parse.urlencode({"query": query}).encode()
+
+    def call():
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=300) as response:
+                response.read()
+            return 200
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=requests) as clients:
+        codes = list(clients.map(lambda _: call(), range(requests)))
+    return codes.count(200), codes.count(503), time.perf_counter() - start
+
+
+def report(label, ok, rejected, elapsed):
+    print(f"{label:>12} {ok:>6} {rejected:>6} {elapsed:>9.2f} {ok / elapsed:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8,16")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--queue-limit", type=int, default=None,
+                        help="requests allowed to wait for a worker (default: all of them)")
+    parser.add_argument("--url", help="benchmark a running server endpoint instead")
+    parser.add_argument("--query", default="Which tasks were assigned in Zone-2?")
+    args = parser.parse_args()
+
+    print(f"{'mode':>12} {'ok':>6} {'503':>6} {'seconds':>9} {'qps':>8}")
+    if args.url:
+        report("http", *run_http(args.url, args.requests, args.query))
+        return
+
+    report("inline", *asyncio.run(run_inline(args.requests, args.latency)))
+    queue_limit = args.requests if args.queue_limit is None else args.queue_limit
+    for workers in (int(w) for w in args.workers.split(",")):
+        report(f"pool {workers}", *asyncio.run(run_pool(args.requests, args.latency, workers, queue_limit)))
+
+
+if __name__ == "__main__":
+    main()
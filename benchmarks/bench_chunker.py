@@ -0,0 +1,218 @@
+"""
+Chunker benchmark.
+
+1. Checks chunker_model.pack_units on a fixed corpus (the files in datasets/
+   plus a seeded synthetic WhatsApp export): its chunks must be within
+   budget, cover every unit in order with at most the overlap carried over,
+   and equal an independent index-based implementation of the same rule.
+2. Sweeps the target chunk size and reports chunk count, tokens sent to the
+   embedding model (ingest cost), chunking time and retrieval hit rate@k.
+
+Retrieval uses a TF-IDF proxy by default; pass --bedrock to rank with real
+Titan embeddings via get_embeddings (costs Bedrock calls).
+
+Usage: python benchmarks/bench_chunker.py [--sizes 128,256,512,1024,2048,8192] [--k 5]
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.model.chunker_model import count_tokens, iter_units, pack_units, chunk_budget
+from app.model.text_extractor_model import extract_pdf_text, extract_word_text, extract_excel_text
+
+DATASET_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "datasets"))
+MODEL_ID = "amazon.titan-embed-text-v1"
+TITAN_USD_PER_1K_TOKENS = 0.0001
+
+
+def naive_ranges(tokens, budget, overlap_tokens):
+    """
+    The packing rule stated on unit indexes: a chunk [start, end) extends
+    while it fits the budget (at least one unit); the next one starts at the
+    earliest unit after which at most overlap_tokens remain and the unit at
+    `end` still fits. Window sums come from prefix sums, not a running total.
+    """
+    prefix = [0]
+    for t in tokens:
+        prefix.append(prefix[-1] + t)
+    ranges, start = [], 0
+    while start < len(tokens):
+        end = start + 1
+        while end < len(tokens) and prefix[end + 1] - prefix[start] <= budget:
+            end += 1
+        ranges.append((start, end))
+        if end == len(tokens):
+            break
+        start = next(s for s in range(start + 1, end + 1)
+                     if prefix[end] - prefix[s] <= overlap_tokens
+                     and prefix[end] - prefix[s] + tokens[end] <= budget)
+    return ranges
+
+
+def naive_pack(units, max_tokens, overlap_tokens, header=""):
+    units = list(units)
+    budget = max(1, max_tokens - (count_tokens(header) if header else 0))
+    ranges = naive_ranges([t for _, t, _ in units], budget, overlap_tokens)
+    chunks = []
+    for start, end in ranges:
+        body = units[start][0] + "".join(sep + unit for unit, _, sep in units[start + 1:end])
+        chunks.append(f"{header}\n{body}" if header else body)
+    return chunks, ranges
+
+
+def synthetic_chat(messages=3000, seed=7):
+    rng = random.Random(seed)
+    officers = ["SI Ramesh", "CI Kumar", "DSP Rao", "PC Lakshmi", "SP Reddy"]
+    circles = ["VZM", "Zone-2", "Guntur Road", "Port Area", "City Center"]
+    lines = []
+    for i in range(messages):
+        sender = rng.choice(officers)
+        body = rng.choice([
+            f"Situation report from {rng.choice(circles)} to be submitted by {rng.randint(9, 12)}:00 AM.",
+            f"Confirm PC deployment near {rng.choice(circles)}. Case ref CASE00{rng.randint(1, 9)}.",
+            f"Noted sir. Team of {rng.randint(2, 12)} moving to {rng.choice(circles)}.",
+            f"Suspect number +91-9{rng.randint(100000000, 999999999)} last seen at TWR00{rng.randint(1, 9)}.",
+        ])
+        lines.append(f"{1 + i // 400:02d}/06/2025, {8 + (i // 60) % 12}:{i % 60:02d} - {sender}: {body}")
+    return "\n".join(lines)
+
+
+def load_corpus():
+    corpus = [("chat.txt", synthetic_chat(), "lines", False)]
+    for name in sorted(os.listdir(DATASET_DIR)):
+        if name.startswith("~$"):
+            continue
+        path = os.path.join(DATASET_DIR, name)
+        with open(path, "rb") as f:
+            data = f.read()
+        if name.endswith(".pdf"):
+            corpus.append((name, extract_pdf_text(data), "text", False))
+        elif name.endswith(".docx"):
+            corpus.append((name, extract_word_text(data), "text", False))
+        elif name.endswith(".xlsx"):
+            corpus.append((name, extract_excel_text(data), "lines", True))
+    return corpus
+
+
+def chunk(text, mode, header_row, max_tokens, overlap, packer):
+    header = ""
+    if header_row:
+        header, _, text = text.partition("\n")
+    unit_budget = max_tokens - (count_tokens(header) if header else 0)
+    return list(packer(iter_units(text, mode, unit_budget), max_tokens, overlap, header=header))
+
+
+def check_ranges(tokens, ranges, budget, overlap_tokens):
+    """Properties any correct packing has, whatever the algorithm."""
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(tokens), "units dropped at the ends"
+    for start, end in ranges:
+        assert end - start == 1 or sum(tokens[start:end]) <= budget, "chunk over budget"
+    for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+        assert start < next_start <= end < next_end, "units skipped or out of order"
+        assert sum(tokens[next_start:end]) <= overlap_tokens, "overlap above overlap_tokens"
+
+
+def check_reference(corpus, sizes):
+    for name, text, mode, header_row in corpus:
+        header = ""
+        if header_row:
+            header, _, text = text.partition("\n")
+        for size in sizes:
+            max_tokens = chunk_budget(MODEL_ID, size)
+            overlap = min(size // 8, max_tokens // 2)
+            budget = max(1, max_tokens - (count_tokens(header) if header else 0))
+            units = list(iter_units(text, mode, budget))
+            expected, ranges = naive_pack(units, max_tokens, overlap, header=header)
+            check_ranges([t for _, t, _ in units], ranges, budget, overlap)
+            fast = list(pack_units(units, max_tokens, overlap, header=header))
+            assert fast == expected, f"chunker output differs from the naive packing on {name} at {size} tokens"
+    print(f"✅ pack_units matches the naive packing on {len(corpus)} documents x {len(sizes)} sizes")
+
+
+def make_questions(corpus, count=60, seed=11):
+    """Pick random lines/sentences; the query is their rarest words."""
+    rng = random.Random(seed)
+    units = [(name, unit) for name, text, mode, _ in corpus
+             for unit, _, _ in iter_units(text, mode, 10 ** 6) if len(unit.split()) >= 4]
+    df = Counter(w for _, unit in units for w in set(unit.lower().split()))
+    questions = []
+    for name, unit in rng.sample(units, min(count, len(units))):
+        words = sorted(set(unit.lower().split()), key=lambda w: df[w])[:4]
+        questions.append((name, unit, " ".join(words)))
+    return questions
+
+
+def tfidf_rank(chunks, queries, k):
+    docs = [Counter(c.lower().split()) for c in chunks]
+    df = Counter(w for d in docs for w in d)
+    n = len(docs)
+    ranked = []
+    for query in queries:
+        terms = query.lower().split()
+        scores = []
+        for i, d in enumerate(docs):
+            length = sum(d.values()) or 1
+            score = sum((d[t] / length) * math.log(1 + n / (1 + df[t])) for t in terms if t in d)
+            scores.append((score, i))
+        ranked.append([i for _, i in sorted(scores, reverse=True)[:k]])
+    return ranked
+
+
+def bedrock_rank(chunks, queries, k):
+    from app.model.embedding_model import get_embeddings
+    def unit(v):
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+    chunk_vecs = [unit(r.embedding) for r in get_embeddings(chunks)]
+    query_vecs = [unit(r.embedding) for r in get_embeddings(queries)]
+    ranked = []
+    for q in query_vecs:
+        scores = sorted(((sum(a * b for a, b in zip(q, c)), i) for i, c in enumerate(chunk_vecs)), reverse=True)
+        ranked.append([i for _, i in scores[:k]])
+    return ranked
+
+
+def sweep(corpus, sizes, k, use_bedrock):
+    questions = make_questions(corpus)
+    print(f"\n{'target':>8} {'chunks':>8} {'tokens':>10} {'cost $':>9} {'ms':>8} {'hit@' + str(k):>8}")
+    for size in sizes:
+        max_tokens = chunk_budget(MODEL_ID, size)
+        overlap = min(size // 8, max_tokens // 2)
+        start = time.perf_counter()
+        chunks, owners = [], []
+        for name, text, mode, header_row in corpus:
+            for c in chunk(text, mode, header_row, max_tokens, overlap, pack_units):
+                chunks.append(c)
+                owners.append(name)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        tokens = sum(count_tokens(c) for c in chunks)
+
+        rank = bedrock_rank if use_bedrock else tfidf_rank
+        ranked = rank(chunks, [q for _, _, q in questions], k)
+        hits = sum(any(owners[i] == name and unit in chunks[i] for i in top)
+                   for (name, unit, _), top in zip(questions, ranked))
+        print(f"{size:>8} {len(chunks):>8} {tokens:>10} {tokens / 1000 * TITAN_USD_PER_1K_TOKENS:>9.4f} "
+              f"{elapsed_ms:>8.1f} {hits / len(questions):>8.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="128,256,512,1024,2048,8192")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--bedrock", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    corpus = load_corpus()
+    check_reference(corpus, sizes)
+    sweep(corpus, sizes, args.k, args.bedrock)
+
+
+if __name__ == "__main__":
+    main()
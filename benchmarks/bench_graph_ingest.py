@@ -0,0 +1,107 @@
+"""
+Neo4j graph ingest benchmark.
+
+Writes the same synthetic triples (officers, groups, towers, cases linked by
+a handful of relationship types, like those extracted from one chat export)
+two ways against a local Neo4j and reports triples per second:
+
+  * per-triple: one write transaction per triple with three MERGEs, the way
+    graph_model.init_graph used to work;
+  * batched: graph_model.init_graph (entities, then one UNWIND per
+    relationship type and batch).
+
+Only nodes whose name starts with "bench:" are created, and they are removed
+before each run. Connection settings come from NEO4J_URI / NEO4J_USER /
+NEO4J_PASSWORD, as in graph_model.
+
+Usage: python benchmarks/bench_graph_ingest.py [--triples 5000] [--batch-size 1000] [--skip-legacy]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.model import graph_model
+
+RELATIONS = ["reports to", "member of", "assigned task to", "seen at", "called", "mentioned in"]
+
+
+def synthetic_triples(count, seed=3):
+    rng = random.Random(seed)
+    officers = [f"bench:officer_{i}" for i in range(max(10, count // 20))]
+    others = {
+        "member of": [f"bench:GRP{i:03d}" for i in range(25)],
+        "seen at": [f"bench:TWR{i:03d}" for i in range(60)],
+        "mentioned in": [f"bench:CASE{i:03d}" for i in range(80)],
+    }
+    triples = []
+    for _ in range(count):
+        rel = rng.choice(RELATIONS)
+        tail = rng.choice(others.get(rel, officers))
+        triples.append([rng.choice(officers), rel, tail])
+    return triples
+
+
+def clear(session):
+    session.run("MATCH (e:Entity) WHERE e.name STARTS WITH 'bench:' DETACH DELETE e").consume()
+
+
+def legacy_write(tx, head, rel, tail):
+    tx.run(
+        """
+        MERGE (a:Entity {name: $head})
+        MERGE (b:Entity {name: $tail})
+        MERGE (a)-[r:%s]->(b)
+        """ % graph_model.relationship_type(rel),
+        head=head,
+        tail=tail,
+    ).consume()
+
+
+def run_legacy(triples):
+    with graph_model.driver.session() as session:
+        for head, rel, tail in triples:
+            session.execute_write(legacy_write, head, rel, tail)
+
+
+def count_relationships(session):
+    return session.run(
+        "MATCH (a:Entity)-[r]->(:Entity) WHERE a.name STARTS WITH 'bench:' RETURN count(r) AS n"
+    ).single()["n"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--triples", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=graph_model.GRAPH_BATCH_SIZE)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    triples = synthetic_triples(args.triples)
+    graph_model.driver.verify_connectivity()
+    with graph_model.driver.session() as session:
+        graph_model.ensure_constraints(session)
+
+    print(f"{'mode':>12} {'triples':>8} {'edges':>8} {'seconds':>9} {'triples/s':>10}")
+    modes = [("batched", lambda: graph_model.init_graph(triples, batch_size=args.batch_size))]
+    if not args.skip_legacy:
+        modes.insert(0, ("per-triple", lambda: run_legacy(triples)))
+    for label, run in modes:
+        with graph_model.driver.session() as session:
+            clear(session)
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        with graph_model.driver.session() as session:
+            edges = count_relationships(session)
+        print(f"{label:>12} {len(triples):>8} {edges:>8} {elapsed:>9.2f} {len(triples) / elapsed:>10.0f}")
+
+    with graph_model.driver.session() as session:
+        clear(session)
+
+
+if __name__ == "__main__":
+    main()
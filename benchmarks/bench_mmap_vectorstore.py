@@ -0,0 +1,160 @@
+"""
+Vector store backend comparison.
+
+Generates a clustered corpus, stores it in Chroma (one HNSW collection) and
+in the mmap NumPy store as float16 and int8, searched exactly and through
+IVF lists, then reports per backend: build time, bytes on disk, cold start
+(open the store and answer one query in a fresh process), the resident
+memory that adds to the process, recall@k against exact float32 search, and median / p95
+query latency.
+
+Usage: python benchmarks/bench_mmap_vectorstore.py [--chunks 50000] [--dim 1536] [--ivf-lists 256] [--ivf-probes 8,16]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def corpus(rng, chunks, dim, clusters=64):
+    """Unit vectors around random topic centres, like embeddings of related chunks."""
+    centres = rng.normal(size=(clusters, dim))
+    vectors = centres[rng.integers(0, clusters, chunks)] + rng.normal(scale=0.6, size=(chunks, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k):
+    distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def open_backend(spec):
+    """Backend for a {"kind", "path", "dim", ...} spec; also how the cold-start child opens it."""
+    if spec["kind"] == "chroma":
+        from app.model.vectorstore_model import ChromaBackend
+
+        return ChromaBackend(path=spec["path"], sharded=False)
+    from app.model.mmap_vectorstore_model import MmapVectorStore
+
+    return MmapVectorStore(dim=spec["dim"], dtype=spec["dtype"], directory=spec["path"],
+                           ivf_lists=spec.get("ivf_lists", 0), ivf_probes=spec.get("ivf_probes", 8))
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def cold_start(spec, query):
+    """Run in a child process: open the store, answer one query, report timings and RSS growth."""
+    import chromadb  # noqa: F401  imports aren't part of a store's footprint
+    from app.model import mmap_vectorstore_model  # noqa: F401
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    backend = open_backend(spec)
+    opened = time.perf_counter()
+    backend.query(query, 10)
+    answered = time.perf_counter()
+    return {"open_ms": (opened - start) * 1000, "first_query_ms": (answered - opened) * 1000,
+            "rss_mb": rss_mb() - baseline}
+
+
+def run_queries(backend, queries, k):
+    found, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = backend.query(query.tolist(), k)
+        timings.append((time.perf_counter() - start) * 1000)
+        found.append([int(doc_id) for doc_id in results["ids"][0]])
+    return found, statistics.median(timings), sorted(timings)[int(len(timings) * 0.95) - 1]
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def disk_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--ivf-lists", type=int, default=256)
+    parser.add_argument("--ivf-probes", type=int_list, default=[8, 16])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        spec, query = json.loads(args.child)
+        print(json.dumps(cold_start(spec, query)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["LOCAL_DATA_DIR"] = directory  # read when the store modules are imported
+        os.environ["CHROMA_DB_DIR"] = directory
+
+        rng = np.random.default_rng(24)
+        vectors = corpus(rng, args.chunks, args.dim)
+        queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+        queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+        truth = exact_top_k(vectors, queries, args.top_k)
+        ids = [str(i) for i in range(len(vectors))]
+        metadatas = [{"doc_type": "document"} for _ in ids]
+        documents = [""] * len(ids)
+        print(f"{args.chunks:,} chunks x {args.dim} dims, {args.queries} queries, recall@{args.top_k}; "
+              f"float32 matrix {vectors.nbytes / 2 ** 20:.0f} MB")
+
+        specs = [("chroma", {"kind": "chroma"}),
+                 ("float16", {"kind": "mmap", "dtype": "float16"}),
+                 ("int8", {"kind": "mmap", "dtype": "int8"})]
+        specs += [(f"int8 ivf/{probes}", {"kind": "mmap", "dtype": "int8", "ivf_lists": args.ivf_lists,
+                                          "ivf_probes": probes, "store": "int8"})
+                  for probes in args.ivf_probes]
+
+        print(f"{'backend':>13} {'build s':>8} {'disk MB':>8} {'open ms':>8} {'1st q ms':>9} {'+RSS MB':>8} "
+              f"{'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+        built = {}
+        for label, spec in specs:
+            spec = {**spec, "dim": args.dim, "path": os.path.join(directory, spec.get("store", label))}
+            build_seconds = built.get(spec["path"], 0.0)
+            backend = open_backend(spec)
+            if spec["path"] not in built:
+                start = time.perf_counter()
+                batch = backend.max_batch_size()
+                for offset in range(0, len(ids), batch):
+                    end = offset + batch
+                    backend.upsert(ids[offset:end], vectors[offset:end].tolist(), metadatas[offset:end],
+                                   documents[offset:end])
+                build_seconds = built[spec["path"]] = time.perf_counter() - start
+            if spec.get("ivf_lists") and not backend.get_stats()["ivf_lists"]:
+                backend.train_ivf()
+
+            found, p50, p95 = run_queries(backend, queries, args.top_k)
+            child = subprocess.run([sys.executable, __file__, "--child", json.dumps([spec, queries[0].tolist()])],
+                                   capture_output=True, text=True, check=True)
+            cold = json.loads(child.stdout.strip().splitlines()[-1])
+            print(f"{label:>13} {build_seconds:>8.1f} {disk_bytes(spec['path']) / 2 ** 20:>8.0f} "
+                  f"{cold['open_ms']:>8.0f} {cold['first_query_ms']:>9.0f} {cold['rss_mb']:>8.0f} "
+                  f"{recall(found, truth):>7.3f} {p50:>7.2f} {p95:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Pipeline overhead without Bedrock.
+
+Runs ingestion and the Chat Agent end to end on the local provider
+stand-ins (EMBEDDING_PROVIDER=hash, CHAT_PROVIDER=scripted) under a
+temporary LOCAL_DATA_DIR / CHROMA_DB_DIR:
+
+1. ingests a synthetic WhatsApp export (chunking, embedding, vector and
+   BM25 writes, task extraction) and reports chunks per second;
+2. answers --queries questions with an instant provider, which is our own
+   overhead (retrieval, prompt building, tracing, bookkeeping);
+3. answers them again with the simulated provider (--latency-ms to first
+   token, --tokens-per-second) and with --error-rate injected failures,
+   so the provider's share of end-to-end latency can be read off.
+
+Usage: python benchmarks/bench_offline_pipeline.py [--messages 5000] [--queries 100] [--latency-ms 800] [--tokens-per-second 60] [--error-rate 0.05]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+OFFICERS = ["SI Ramesh", "CI Lakshmi", "HC Suresh", "PC Anil", "SI Fatima"]
+PLACES = ["Vijayawada", "Guntur", "Tenali", "Mangalagiri", "Amaravati"]
+
+
+def synthetic_chat(rng, messages):
+    lines = []
+    for i in range(messages):
+        day, minute = 1 + i // 600, i % 600
+        lines.append(f"{day:02d}/06/2025, {9 + minute // 60}:{minute % 60:02d} - {rng.choice(OFFICERS)}: "
+                     f"Checkpoint at {rng.choice(PLACES)} reports vehicle AP{rng.randint(10, 39)}"
+                     f"{rng.randint(1000, 9999)}, please verify and update by {rng.randint(1, 12)} pm")
+    return "\n".join(lines)
+
+
+def percentiles(timings):
+    ordered = sorted(timings)
+    return statistics.median(ordered), ordered[max(0, int(len(ordered) * 0.95) - 1)]
+
+
+def run_queries(answer_query, queries):
+    timings, errors = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        answer = answer_query(query)
+        timings.append((time.perf_counter() - start) * 1000)
+        errors += answer.startswith("❌")
+    return timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Read when the modules are imported
+        os.environ.update(LOCAL_DATA_DIR=directory, CHROMA_DB_DIR=os.path.join(directory, "chroma"),
+                          EMBEDDING_PROVIDER="hash", CHAT_PROVIDER="scripted")
+        logging.disable(logging.INFO)
+        from app.model.provider_model import get_scripted_chat_model
+        from app.service import langstream_service
+        from app.service.ingestion_service import enqueue_job, get_job_status
+        from app.service.answer_cache_service import answer_cache
+        from app.controller.chat_controller import answer_query
+
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"  # langstream_service turns it on at import
+        langstream_service.SINGLE_FLIGHT_REUSE_SECONDS = 0
+        answer_cache.get = lambda *a, **k: None
+        model = get_scripted_chat_model()
+
+        rng = random.Random(25)
+        path = os.path.join(directory, "Bench_Chat.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(synthetic_chat(rng, args.messages))
+        start = time.perf_counter()
+        job_id = enqueue_job([("Bench_Chat.txt", path)])
+        while (status := get_job_status(job_id))["status"] not in ("completed", "failed"):
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        chunks = sum(f["chunks_done"] for f in status["files"])
+        print(f"Ingested {args.messages:,} messages as {chunks} chunks in {elapsed:.1f}s "
+              f"({chunks / elapsed:.0f} chunks/s, {model.calls} extraction calls), job {status['status']}")
+
+        queries = [f"What did {rng.choice(OFFICERS)} report about {rng.choice(PLACES)}?" for _ in range(args.queries)]
+        print(f"{'provider':>28} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        runs = [("instant (our overhead)", 0, 0, 0),
+                (f"{args.latency_ms:.0f} ms + {args.tokens_per_second:.0f} tok/s", args.latency_ms,
+                 args.tokens_per_second, 0),
+                (f"  with {args.error_rate:.0%} errors", args.latency_ms, args.tokens_per_second, args.error_rate)]
+        for label, latency_ms, tokens_per_second, error_rate in runs:
+            model.latency_ms, model.tokens_per_second, model.error_rate = latency_ms, tokens_per_second, error_rate
+            timings, errors = run_queries(answer_query, queries)
+            p50, p95 = percentiles(timings)
+            print(f"{label:>28} {p50:>8.1f} {p95:>8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+PDF extraction benchmark.
+
+Generates IPDR-style PDFs (a session table per page, like datasets/IPDR_*.pdf)
+and reports pages per second for:
+
+  * pdfplumber: every page through pdfplumber's layout analysis, serially,
+    the way text_extractor_model.extract_pdf_text used to work;
+  * pypdf: iter_pdf_pages(tables=False), plain text layer only (one table
+    cell per line);
+  * auto: iter_pdf_pages(), table pages rebuilt row by row with pypdf's
+    layout mode (PDF_TABLE_EXTRACTOR=layout);
+  * auto xN: the same over a process pool of N workers.
+
+It also checks that the auto path returns the same text as pdfplumber and
+reports how long the first page took to arrive (chunking starts then).
+
+Usage: python benchmarks/bench_pdf_extraction.py [--pages 200] [--rows 40] [--workers 4]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pdfplumber
+
+from app.model import text_extractor_model
+from app.model.text_extractor_model import iter_pdf_pages
+
+COLUMNS = [("subscriberID", 40), ("sessionStart", 140), ("sessionEnd", 260), ("bytesTransferred", 380),
+           ("APN", 490)]
+
+
+def ipdr_rows(rng, count):
+    start = datetime(2025, 6, 20)
+    for _ in range(count):
+        begin = start + timedelta(seconds=rng.randint(0, 86_000))
+        end = begin + timedelta(minutes=rng.randint(5, 120))
+        yield [f"+91-{rng.randint(7_000_000_000, 9_999_999_999)}", begin.strftime("%Y-%m-%d %H:%M:%S"),
+               end.strftime("%Y-%m-%d %H:%M:%S"), str(rng.randint(10 ** 5, 2 * 10 ** 7)),
+               rng.choice(["apn.data.net", "apn.mobile.net"])]
+
+
+def write_pdf(path, pages, rows, seed=9):
+    """Minimal PDF writer: one Helvetica table per page."""
+    rng = random.Random(seed)
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for page in range(pages):
+        # Each cell in its own text object, as reportlab tables (and our IPDR exports) draw them
+        lines = ["BT /F1 8 Tf 12 TL ET"]
+        table = [[name for name, _ in COLUMNS]] + list(ipdr_rows(rng, rows))
+        for r, cells in enumerate(table):
+            y = 800 - r * 18
+            for (_, x), cell in zip(COLUMNS, cells):
+                lines.append(f"BT /F1 8 Tf 1 0 0 1 {x} {y} Tm ({cell}) Tj T* ET")
+        stream = "\n".join(lines).encode()
+        content_id, page_id = 4 + 2 * page, 5 + 2 * page
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{k} 0 R" for k in kids).encode(), len(kids))
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for number in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def legacy(path):
+    with pdfplumber.open(path) as pdf:
+        return [(i, page.extract_text() or "") for i, page in enumerate(pdf.pages)]
+
+
+def timed(run):
+    start = time.perf_counter()
+    first, pages = None, []
+    for page in run():
+        if first is None:
+            first = time.perf_counter() - start
+        pages.append(page)
+    return pages, time.perf_counter() - start, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=max(2, text_extractor_model.PDF_WORKERS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "IPDR_bench.pdf")
+        write_pdf(path, args.pages, args.rows)
+        print(f"{args.pages} pages x {args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+        modes = [
+            ("pdfplumber", lambda: legacy(path)),
+            ("pypdf", lambda: iter_pdf_pages(path, tables=False, workers=1)),
+            ("auto", lambda: iter_pdf_pages(path, workers=1)),
+            (f"auto x{args.workers}", lambda: iter_pdf_pages(path, workers=args.workers)),
+        ]
+        results = {}
+        print(f"{'mode':>12} {'seconds':>8} {'pages/s':>8} {'first page':>11}")
+        for label, run in modes:
+            pages, elapsed, first = timed(run)
+            results[label] = pages
+            print(f"{label:>12} {elapsed:>8.2f} {len(pages) / elapsed:>8.1f} {first * 1000:>9.0f}ms")
+
+        expected = results["pdfplumber"]
+        for label in ("auto", f"auto x{args.workers}"):
+            assert results[label] == expected, f"{label} text differs from pdfplumber"
+        assert [n for n, _ in results["pypdf"]] == list(range(args.pages))
+    print("✅ auto extraction matches pdfplumber page for page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Prompt-prefix cache check.
+
+Runs every agent against a local stub chat model (no Bedrock calls) and a
+stub retriever, over a set of different queries and contexts, and checks:
+
+1. the first content block sent to the model (the instruction prefix) is
+   byte-for-byte identical on every call of an agent, so Bedrock can serve
+   it from the prompt cache;
+2. the prefix carries a cache checkpoint exactly when it is long enough
+   to be cached (PROMPT_CACHE_MIN_TOKENS);
+3. only the suffix varies with the query and context.
+
+It then reports prefix/suffix token sizes and the estimated share of input
+token cost saved once the prefix is cached (cache reads are billed at
+CACHE_READ_PRICE of the normal input price).
+
+Usage: python benchmarks/bench_prompt_cache.py [--queries 20]
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.messages import AIMessage
+
+from app.model.chunker_model import count_tokens
+from app.service import langstream_service
+from app.service.answer_cache_service import answer_cache
+from app.controller import chat_controller, task_controller, user_controller, analyst_controller
+
+CACHE_READ_PRICE = 0.1
+
+
+class StubChatModel:
+    """Records the messages it is sent and answers instantly."""
+
+    model_id = "stub"
+
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, messages):
+        self.calls.append(messages[0].content)
+        return AIMessage(content="stub answer")
+
+
+def stub_search(rng):
+    def search(query, top_k=5, with_embeddings=False, scope=None):
+        ids = [f"doc{rng.randint(0, 10 ** 6)}" for _ in range(3)]
+        docs = [f"01/06/2025, 9:{i:02d} - SI Ramesh: report {rng.random()} for {query}" for i in range(3)]
+        metas = [{"type": "chat", "original_file": "Part1.txt", "chunk_index": i} for i in range(3)]
+        return {"ids": [ids], "documents": [docs], "metadatas": [metas]}
+    return search
+
+
+def check(agent, blocks_per_call):
+    prefixes = {blocks[0]["text"] for blocks in blocks_per_call}
+    suffixes = {blocks[1]["text"] for blocks in blocks_per_call}
+    assert len(prefixes) == 1, f"{agent}: prefix bytes changed between calls"
+    assert len(suffixes) == len(blocks_per_call), f"{agent}: suffix did not vary with the query"
+    prefix = blocks_per_call[0][0]
+    expect_checkpoint = count_tokens(prefix["text"]) >= langstream_service.PROMPT_CACHE_MIN_TOKENS
+    assert all(("cache_control" in blocks[0]) == expect_checkpoint for blocks in blocks_per_call), \
+        f"{agent}: cache checkpoint placement is wrong"
+    assert all("cache_control" not in blocks[1] for blocks in blocks_per_call), f"{agent}: suffix has a checkpoint"
+
+    prefix_tokens = count_tokens(prefix["text"])
+    suffix_tokens = sum(count_tokens(blocks[1]["text"]) for blocks in blocks_per_call) / len(blocks_per_call)
+    full = prefix_tokens + suffix_tokens
+    saved = (prefix_tokens * (1 - CACHE_READ_PRICE)) / full if expect_checkpoint else 0.0
+    print(f"{agent:>14} {len(blocks_per_call):>6} {prefix_tokens:>8} {suffix_tokens:>8.0f} "
+          f"{'yes' if expect_checkpoint else 'no':>11} {saved:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"  # langstream_service turns it on at import
+    logging.disable(logging.INFO)
+    rng = random.Random(5)
+    model = StubChatModel()
+    langstream_service.claude_model = model
+    langstream_service.SINGLE_FLIGHT_REUSE_SECONDS = 0
+    answer_cache.get = lambda *a, **k: None
+    answer_cache.put = lambda *a, **k: None
+    for controller in (chat_controller, task_controller, user_controller):
+        controller.hybrid_search = stub_search(rng)
+
+    queries = [f"What did officer {rng.randint(1, 99)} report about zone {i}?" for i in range(args.queries)]
+    agents = {
+        "Chat Agent": lambda q: chat_controller.answer_query(q),
+        "Task Agent": lambda q: task_controller.task_query(q),
+        "User Agent": lambda q: user_controller.user_query(q),
+        "Roster phrase": lambda q: langstream_service.run_traced_claude_task(
+            user_controller.roster_phrase_prompt(q, {"matched_users": [{"name": q}]}), agent_name="User Agent"),
+        "Analyst Agent": lambda q: analyst_controller.run_analyst_agent(f'{{"query": "{q}"}}'),
+    }
+
+    print(f"{'agent':>14} {'calls':>6} {'prefix':>8} {'suffix':>8} {'checkpoint':>11} {'saved':>8}")
+    for agent, run in agents.items():
+        model.calls.clear()
+        for query in queries:
+            answer = run(query)
+            assert answer == "stub answer", f"{agent}: {answer}"
+        check(agent, list(model.calls))
+    print("✅ instruction prefixes are byte-stable across calls")
+
+
+if __name__ == "__main__":
+    main()
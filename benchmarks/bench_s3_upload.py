@@ -0,0 +1,121 @@
+"""
+S3 upload benchmark.
+
+Uploads a batch of synthetic evidence files two ways and reports MB/s:
+
+  * serial: one upload_fileobj per file under a uuid4 key, the way
+    uploader.upload_file_to_s3 used to work;
+  * concurrent: uploader.upload_many (files in parallel, multipart parts
+    in parallel, hashed in the same pass under content-hash keys).
+
+It then checks that every key is the sha256 of the file's bytes and that
+uploading the batch again stores nothing new (HEAD hits only).
+
+Runs against moto's in-process S3 by default, so no AWS account is needed.
+moto has no network latency and moves bytes in memory, so its MB/s only
+show client overhead (the staging copy included); pass --endpoint-url to
+point at a local S3 stand-in (MinIO, LocalStack) for transfer throughput.
+
+Usage: python benchmarks/bench_s3_upload.py [--files 16] [--size-mb 20] [--part-size-mb 8]
+                                             [--concurrency 8] [--workers 4] [--endpoint-url URL]
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+from uuid import uuid4
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import boto3
+
+from app.ingestion import uploader
+
+BUCKET = "bench-evidence"
+
+
+def make_files(directory, count, size_mb, seed=11):
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"evidence_{i:03d}.pdf")
+        with open(path, "wb") as f:
+            f.write(rng.randbytes(int(size_mb * uploader.MB)))
+        paths.append(path)
+    return paths
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(uploader.MB), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run(args, client):
+    client.create_bucket(Bucket=BUCKET)
+    config = uploader.transfer_config(part_size_mb=args.part_size_mb, concurrency=args.concurrency)
+    total_mb = args.files * args.size_mb
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_files(directory, args.files, args.size_mb)
+
+        print(f"{'mode':>12} {'files':>6} {'MB':>7} {'seconds':>8} {'MB/s':>8}")
+        start = time.perf_counter()
+        for path in paths:
+            with open(path, "rb") as f:
+                client.upload_fileobj(f, BUCKET, f"legacy/{uuid4()}_{os.path.basename(path)}")
+        elapsed = time.perf_counter() - start
+        print(f"{'serial':>12} {len(paths):>6} {total_mb:>7.0f} {elapsed:>8.2f} {total_mb / elapsed:>8.1f}")
+
+        start = time.perf_counter()
+        results = uploader.upload_many([(path, None) for path in paths], bucket=BUCKET, client=client,
+                                       config=config, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"{'concurrent':>12} {len(paths):>6} {total_mb:>7.0f} {elapsed:>8.2f} {total_mb / elapsed:>8.1f}")
+
+        errors = [r for r in results if "error" in r]
+        assert not errors, errors
+        for path, result in zip(paths, results):
+            expected = uploader.content_key(sha256(path), path)
+            assert result["s3_path"] == f"s3://{BUCKET}/{expected}", result
+        staging = client.list_objects_v2(Bucket=BUCKET, Prefix=uploader.STAGING_FOLDER).get("KeyCount", 0)
+        assert staging == 0, f"{staging} staging objects left behind"
+
+        start = time.perf_counter()
+        again = uploader.upload_many([(path, r["content_hash"]) for path, r in zip(paths, results)],
+                                     bucket=BUCKET, client=client, config=config, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        assert not any(r.get("uploaded") for r in again), "duplicate content was uploaded again"
+        print(f"{'re-upload':>12} {len(paths):>6} {0:>7.0f} {elapsed:>8.2f} {'(HEAD only)':>8}")
+    print("✅ keys match content hashes and duplicates were skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--part-size-mb", type=int, default=uploader.S3_PART_SIZE_MB)
+    parser.add_argument("--concurrency", type=int, default=uploader.S3_UPLOAD_CONCURRENCY)
+    parser.add_argument("--workers", type=int, default=uploader.S3_UPLOAD_WORKERS)
+    parser.add_argument("--endpoint-url", help="local S3 stand-in; moto is used when omitted")
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        run(args, boto3.client("s3", endpoint_url=args.endpoint_url))
+        return
+
+    from moto import mock_aws
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        run(args, boto3.client("s3", region_name="us-east-1"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+CDR/IPDR analytics benchmark.
+
+Generates synthetic call and data-session records (same columns as
+datasets/CDR_*.xlsx and IPDR_*.pdf), loads them into the Parquet/DuckDB
+telecom store under a temporary LOCAL_DATA_DIR, and reports the median
+latency of each query the agents and /analytics endpoints run.
+
+Usage: python benchmarks/bench_telecom_analytics.py [--cdr-rows 2000000] [--ipdr-rows 500000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+
+
+def phone_numbers(rng, count):
+    return np.array([f"+91-{n}" for n in rng.integers(7_000_000_000, 9_999_999_999, count)])
+
+
+def synthetic_cdr(rng, rows, numbers):
+    start = pd.Timestamp("2025-06-20") + pd.to_timedelta(rng.integers(0, 30 * 86_400, rows), unit="s")
+    return pd.DataFrame({
+        "callerID": numbers[rng.zipf(1.6, rows) % len(numbers)],
+        "calleeID": numbers[rng.integers(0, len(numbers), rows)],
+        "startTime": start,
+        "endTime": start + pd.to_timedelta(rng.integers(30, 3_600, rows), unit="s"),
+        "towerID": np.char.add("TWR", np.char.zfill(rng.integers(1, 500, rows).astype(str), 3)),
+    })
+
+
+def synthetic_ipdr(rng, rows, numbers):
+    start = pd.Timestamp("2025-06-20") + pd.to_timedelta(rng.integers(0, 30 * 86_400, rows), unit="s")
+    return pd.DataFrame({
+        "subscriberID": numbers[rng.integers(0, len(numbers), rows)],
+        "sessionStart": start,
+        "sessionEnd": start + pd.to_timedelta(rng.integers(60, 7_200, rows), unit="s"),
+        "bytesTransferred": rng.integers(10 ** 4, 10 ** 8, rows),
+        "APN": rng.choice(["apn.data.net", "apn.mobile.net", "apn.ims.net"], rows),
+    })
+
+
+def median_ms(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cdr-rows", type=int, default=2_000_000)
+    parser.add_argument("--ipdr-rows", type=int, default=500_000)
+    parser.add_argument("--numbers", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["LOCAL_DATA_DIR"] = directory  # read when the store module is imported
+        from app.model import telecom_store_model as store
+
+        rng = np.random.default_rng(21)
+        numbers = phone_numbers(rng, args.numbers)
+        start = time.perf_counter()
+        store._write("cdr", "bench_cdr.xlsx", store.cdr_frame(synthetic_cdr(rng, args.cdr_rows, numbers)))
+        store._write("ipdr", "bench_ipdr.pdf", store.ipdr_frame(synthetic_ipdr(rng, args.ipdr_rows, numbers)))
+        print(f"Loaded {args.cdr_rows:,} CDR + {args.ipdr_rows:,} IPDR rows in {time.perf_counter() - start:.1f}s")
+
+        # zipf makes numbers[1] the caller on ~45% of all calls: a worst case next to a typical number
+        busy, typical = numbers[1], numbers[1000]
+        queries = [
+            ("contact_frequency", lambda: store.contact_frequency(typical)),
+            ("  (busiest number)", lambda: store.contact_frequency(busy)),
+            ("tower_calls (all)", lambda: store.tower_calls()),
+            ("tower_calls (one)", lambda: store.tower_calls("TWR003")),
+            ("tower_timeline", lambda: store.tower_timeline(typical)),
+            ("  (busiest number)", lambda: store.tower_timeline(busy)),
+            ("subscriber_sessions", lambda: store.subscriber_sessions(numbers[7])),
+            ("session_overlap", lambda: store.session_overlap(numbers[7])),
+        ]
+        print(f"{'query':>20} {'rows':>6} {'median ms':>10}")
+        for label, run in queries:
+            latency, rows = median_ms(run, args.repeat)
+            print(f"{label:>20} {rows:>6} {latency:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Vector search recall / latency sweep.
+
+Generates a clustered corpus split across source types (like chat, roster,
+CDR and FIR chunks), builds it into Chroma once per HNSW M x ef_construction
+pair, both as per-source shards searched by the parallel fan-out in
+vectorstore_model.ChromaBackend.query and as one unsharded collection, then
+sweeps ef_search and reports recall@k against exact search with median and
+p95 query latency. Rows restricted to one source type compare a doc_type
+filter on the unsharded collection ("filtered") with the fan-out, which
+only touches that source's shard ("scoped").
+
+Usage: python benchmarks/bench_vector_shards.py [--chunks 20000] [--dim 256] [--m 8,16,32] [--ef-construction 64,128] [--ef-search 10,20,40,80,160]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from chromadb import PersistentClient
+from chromadb.api.client import SharedSystemClient
+
+SOURCES = ("chat", "roster", "cdr", "fir")
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def corpus(rng, chunks, dim, clusters=64):
+    """Unit vectors around random topic centres; every source covers its own topics."""
+    centres = rng.normal(size=(clusters, dim))
+    topic = rng.integers(0, clusters, chunks)
+    vectors = centres[topic] + rng.normal(scale=0.6, size=(chunks, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    sources = np.array(SOURCES)[topic % len(SOURCES)]
+    return vectors.astype(np.float32), sources
+
+
+def exact_top_k(vectors, queries, k):
+    distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def build(backend, name, config, vectors, sources, sharded):
+    """Point the backend at the collections of one HNSW build and fill them."""
+    from app.model.vectorstore_model import DOC_TYPES
+
+    ids = [str(i) for i in range(len(vectors))]
+    metadatas = [{"doc_type": str(source)} for source in sources]
+    documents = [""] * len(vectors)
+    backend.collection = backend.open_collection(f"{name}_all", config)
+    backend.shards = {doc_type: backend.open_collection(f"{name}_{doc_type}", config)
+                      for doc_type in DOC_TYPES} if sharded else {}
+    batch = backend.max_batch_size()
+    for start in range(0, len(ids), batch):
+        end = start + batch
+        backend.upsert(ids[start:end], vectors[start:end].tolist(), metadatas[start:end], documents[start:end])
+
+
+def set_ef_search(backend, ef_search):
+    """
+    Chroma reads ef_search when a process first loads an index, so after
+    changing it the client is reopened to make the new value take effect.
+    """
+    for target in backend.collections():
+        target.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    SharedSystemClient.clear_system_cache()
+    backend.client = PersistentClient(path=backend.path)
+    backend.shards = {doc_type: backend.client.get_collection(shard.name) for doc_type, shard in backend.shards.items()}
+    backend.collection = backend.client.get_collection(backend.collection.name)
+
+
+def run_queries(backend, queries, k, where=None):
+    found, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        # The backend directly: search_vectorstore only accepts the embedding model's dimensions
+        results = backend.query(query.tolist(), k, where=where)
+        timings.append((time.perf_counter() - start) * 1000)
+        found.append([int(doc_id) for doc_id in results["ids"][0]])
+    return found, statistics.median(timings), sorted(timings)[int(len(timings) * 0.95) - 1]
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--m", type=int_list, default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int_list, default=[64, 128])
+    parser.add_argument("--ef-search", type=int_list, default=[10, 20, 40, 80, 160])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["CHROMA_DB_DIR"] = directory  # read when the store module is imported
+        os.environ["LOCAL_DATA_DIR"] = directory
+        from app.model import vectorstore_model as vs
+
+        backend = vs.ChromaBackend(path=directory, sharded=False)
+
+        rng = np.random.default_rng(23)
+        vectors, sources = corpus(rng, args.chunks, args.dim)
+        queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+        queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+        truth = exact_top_k(vectors, queries, args.top_k)
+        # Scoped questions are about their source, like task questions about the chats
+        scoped = np.flatnonzero(sources == "chat")
+        scoped_queries = vectors[rng.choice(scoped, args.queries, replace=False)]
+        scoped_queries = scoped_queries + rng.normal(scale=0.05, size=scoped_queries.shape).astype(np.float32)
+        scoped_truth = scoped[exact_top_k(vectors[scoped], scoped_queries, args.top_k)]
+        print(f"{args.chunks:,} chunks x {args.dim} dims, {len(SOURCES)} sources, "
+              f"{args.queries} queries, recall@{args.top_k}")
+
+        print(f"{'M':>3} {'ef_c':>5} {'layout':>9} {'build s':>8} {'ef_s':>5} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+        for m in args.m:
+            for ef_construction in args.ef_construction:
+                config = {"max_neighbors": m, "ef_construction": ef_construction, "ef_search": args.ef_search[0]}
+                for layout in ("single", "filtered", "sharded", "scoped"):
+                    if layout in ("single", "sharded"):
+                        start = time.perf_counter()
+                        build(backend, f"m{m}_c{ef_construction}_{layout}", config,
+                              vectors, sources, sharded=layout == "sharded")
+                        build_seconds = time.perf_counter() - start
+                    for ef_search in args.ef_search:
+                        set_ef_search(backend, ef_search)
+                        if layout in ("filtered", "scoped"):
+                            found, p50, p95 = run_queries(backend, scoped_queries, args.top_k,
+                                                         where={"doc_type": {"$in": ["chat"]}})
+                            score = recall(found, scoped_truth)
+                        else:
+                            found, p50, p95 = run_queries(backend, queries, args.top_k)
+                            score = recall(found, truth)
+                        print(f"{m:>3} {ef_construction:>5} {layout:>9} {build_seconds:>8.1f} {ef_search:>5} "
+                              f"{score:>7.3f} {p50:>7.2f} {p95:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()